@@ -30,4 +30,14 @@ def create_app():
     from app.routes import main
     app.register_blueprint(main)
 
+    # Start this worker's job pool now so jobs orphaned by a restarted
+    # worker are resumed at start-up, not on the first /jobs request
+    from app.utils.jobs import get_job_manager
+    get_job_manager()
+
+    # Load embedding models once per worker instead of on the first request
+    if app.config.get('WARMUP_MODELS'):
+        from app.similarity.text_similarity import warm_up_models
+        print("Warm model stats:", warm_up_models())
+
     return app 
\ No newline at end of file
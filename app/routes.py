@@ -1,12 +1,30 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, render_template, request, jsonify, current_app, url_for
 import os
+import time
 import uuid
-from app.similarity.text_similarity import compute_text_similarity
-from app.similarity.handwriting_similarity import compute_handwriting_similarity
-from app.utils.pdf_processor import extract_text_from_pdf, validate_pdf
-from app.utils.report_generator import generate_report
+from app.similarity.model_registry import model_registry
+from app.similarity.embedding_cache import get_embedding_cache
+from app.similarity.vector_index import get_vector_index, search_text
+from app.utils.cache_store import get_cache_store
+from app.utils.comparison import ComparisonError, run_comparison, validate_documents
+from app.utils.document import PDFDocument
+from app.utils.jobs import (
+    BATCH,
+    COMPLETED,
+    FAILED,
+    JobQueueFull,
+    get_job_manager,
+    public_view,
+    stream_events,
+)
+from app.utils.ocr import page_cache_stats
+from app.utils.pdf_processor import extract_text_from_pdf
+from app.utils.ocr_backends import get_ocr_backend
+from app.utils.ocr_engine import get_ocr_engine
 from flask import (
+    Response,
     send_from_directory,
+    stream_with_context,
 )
 from werkzeug.exceptions import NotFound
 
@@ -49,6 +67,8 @@ def compare_pdfs():
             {"error": "Invalid file format. Only PDF files are allowed"}
         ), 400
 
+    filepath1 = filepath2 = None
+    document1 = document2 = None
     try:
         if not os.path.exists(current_app.config["UPLOAD_FOLDER"]):
             os.makedirs(current_app.config["UPLOAD_FOLDER"])
@@ -60,96 +80,240 @@ def compare_pdfs():
         filepath1 = os.path.join(current_app.config["UPLOAD_FOLDER"], filename1)
         filepath2 = os.path.join(current_app.config["UPLOAD_FOLDER"], filename2)
 
-        file1.save(filepath1)
-        file2.save(filepath2)
+        # Fingerprinted while streaming to disk; every cache lookup reuses it
+        document1 = PDFDocument.from_upload(file1, filepath1)
+        document2 = PDFDocument.from_upload(file2, filepath2)
         print(f"Files saved to {filepath1} and {filepath2}")
 
-        if not os.path.exists(filepath1) or not os.path.exists(filepath2):
-            return jsonify({"error": "Error saving files"}), 500
+        validate_documents(document1, document2)
+        weight_text = float(request.form.get("weight_text", 0.5))
+        result = run_comparison(
+            document1, document2, weight_text, names=[file1.filename, file2.filename]
+        )
+        print("Request Completed")
+        return jsonify(result)
 
-        if os.path.getsize(filepath1) == 0 or os.path.getsize(filepath2) == 0:
-            return jsonify({"error": "One or both files are empty"}), 400
+    except ComparisonError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except Exception as e:
+        print(f"Error in compare_pdfs: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        for document in [document1, document2]:
+            if document is not None:
+                document.release_images()
+        for filepath in [filepath1, filepath2]:
+            try:
+                if filepath and os.path.exists(filepath):
+                    os.remove(filepath)
+            except Exception as e:
+                print(f"Error removing file {filepath}: {str(e)}")
 
-        if not validate_pdf(filepath1) or not validate_pdf(filepath2):
-            return jsonify({"error": "Invalid or corrupted PDF file(s)"}), 400
 
-        text1 = extract_text_from_pdf(filepath1)
-        text2 = extract_text_from_pdf(filepath2)
+@main.route("/search", methods=["POST"])
+def search_corpus():
+    """Previously processed documents most similar to an uploaded PDF"""
+    if "file" not in request.files:
+        return jsonify({"error": "A PDF file is required"}), 400
 
-        if not text1 or not text2:
-            return jsonify(
-                {"error": "Could not extract text from one or both files"}
-            ), 400
-        print(f"Extracted text from {filepath1} and {filepath2}")
-        print("Starting text similarity computation")
-        text_analysis = compute_text_similarity(text1, text2)
-        print("Ending text similarity computation")
-        text_similarity = text_analysis["similarity_score"]
-        (
-            handwriting_similarity,
-            feature_scores,
-            anomalies1,
-            anomalies2,
-            variations1,
-            variations2,
-            images1,
-            images2,
-            features1,
-            features2,
-            text_similarities,
-            handwriting_similarities,
-        ) = compute_handwriting_similarity(filepath1, filepath2)
+    upload = request.files["file"]
+    if not allowed_file(upload.filename):
+        return jsonify(
+            {"error": "Invalid file format. Only PDF files are allowed"}
+        ), 400
 
-        weight_text = float(request.form.get("weight_text", 0.5))
-        weight_handwriting = 1 - weight_text
+    filepath = None
+    document = None
+    try:
+        if not os.path.exists(current_app.config["UPLOAD_FOLDER"]):
+            os.makedirs(current_app.config["UPLOAD_FOLDER"])
+        filename = generate_secure_filename(upload.filename)
+        filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
+        document = PDFDocument.from_upload(upload, filepath)
+        validate_documents(document)
+        k = int(request.form.get("k", 10))
 
-        similarity_index = (
-            weight_text * text_similarity + weight_handwriting * handwriting_similarity
-        )
-        print("Starting report generation")
-        report_path = generate_report(
-            text_similarity,
-            handwriting_similarity,
-            similarity_index,
-            text1,
-            text2,
-            feature_scores,
-            anomalies1,
-            anomalies2,
-            variations1,
-            variations2,
-            images1,
-            images2,
-            features1,
-            features2,
-            text_similarities,
-            handwriting_similarities,
-        )
-        print("Ending report generation")
-        print("Request Completed")
+        text = extract_text_from_pdf(document)
+        if not text:
+            raise ComparisonError("Could not extract text from the file")
+        started = time.perf_counter()
+        # The query document itself may already be in the corpus
+        results = search_text(text, k=k, exclude=[document.fingerprint])
         return jsonify(
             {
-                "text_similarity": text_similarity,
-                "text_consistency": text_analysis["consistency_analysis"],
-                "handwriting_similarity": handwriting_similarity,
-                "similarity_index": similarity_index,
-                "feature_scores": feature_scores,
-                "anomalies": {"document1": anomalies1, "document2": anomalies2},
-                "variations": {"document1": variations1, "document2": variations2},
-                "report_url": report_path,
+                "fingerprint": document.fingerprint,
+                "results": results,
+                "search_seconds": time.perf_counter() - started,
             }
         )
 
+    except ComparisonError as e:
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
-        print(f"Error in compare_pdfs: {str(e)}")
+        print(f"Error in search_corpus: {str(e)}")
         return jsonify({"error": str(e)}), 500
     finally:
-        for filepath in [filepath1, filepath2]:
-            try:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            except Exception as e:
-                print(f"Error removing file {filepath}: {str(e)}")
+        if document is not None:
+            document.release_images()
+        try:
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
+        except Exception as e:
+            print(f"Error removing file {filepath}: {str(e)}")
+
+
+@main.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a comparison and return its job id without waiting for it"""
+    if "file1" not in request.files or "file2" not in request.files:
+        return jsonify({"error": "Two PDF files are required"}), 400
+
+    uploads = [request.files["file1"], request.files["file2"]]
+    if not all(allowed_file(f.filename) for f in uploads):
+        return jsonify(
+            {"error": "Invalid file format. Only PDF files are allowed"}
+        ), 400
+
+    try:
+        weight_text = float(request.form.get("weight_text", 0.5))
+        job = get_job_manager().submit(uploads, weight_text)
+    except ComparisonError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        print(f"Error in submit_job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    print(f"Queued job {job['id']} for {[f.filename for f in uploads]}")
+    return job_accepted(job)
+
+
+@main.route("/jobs/batch", methods=["POST"])
+def submit_batch_job():
+    """Queue an all-pairs comparison of every uploaded PDF"""
+    uploads = request.files.getlist("files")
+    if not 2 <= len(uploads) <= current_app.config["BATCH_MAX_DOCUMENTS"]:
+        return jsonify(
+            {
+                "error": "Between 2 and "
+                f"{current_app.config['BATCH_MAX_DOCUMENTS']} PDF files are required"
+            }
+        ), 400
+    if not all(allowed_file(f.filename) for f in uploads):
+        return jsonify(
+            {"error": "Invalid file format. Only PDF files are allowed"}
+        ), 400
+
+    try:
+        weight_text = float(request.form.get("weight_text", 0.5))
+        job = get_job_manager().submit(uploads, weight_text, kind=BATCH)
+    except ComparisonError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        print(f"Error in submit_batch_job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    print(f"Queued batch job {job['id']} for {len(uploads)} files")
+    return job_accepted(job)
+
+
+def job_accepted(job):
+    """202 response pointing at a queued job's status, events and result"""
+    return jsonify(
+        {
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": url_for("main.job_status", job_id=job["id"]),
+            "events_url": url_for("main.job_events", job_id=job["id"]),
+            "result_url": url_for("main.job_result", job_id=job["id"]),
+        }
+    ), 202
+
+
+@main.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    view = public_view(job)
+    view.pop("result", None)
+    return jsonify(view)
+
+
+@main.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """Stage progress of a job as Server-Sent Events, then its result"""
+    manager = get_job_manager()
+    if manager.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    try:
+        start = int(request.headers.get("Last-Event-ID", -1)) + 1
+    except ValueError:
+        start = 0
+    events = stream_events(
+        manager.store,
+        job_id,
+        start,
+        max_seconds=current_app.config["JOB_EVENTS_STREAM_SECONDS"],
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@main.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    """The /compare response of a completed job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == FAILED:
+        return jsonify({"error": job.get("error")}), job.get("status_code", 500)
+    if job["status"] != COMPLETED:
+        return jsonify({"status": job["status"], "error": "Job not finished"}), 409
+    return jsonify(job["result"])
+
+
+@main.route("/stats/jobs")
+def job_stats():
+    return jsonify(get_job_manager().stats())
+
+
+@main.route("/stats/models")
+def model_stats():
+    return jsonify(model_registry.stats())
+
+
+@main.route("/stats/embeddings")
+def embedding_cache_stats():
+    cache = get_embedding_cache()
+    return jsonify(cache.stats() if cache else {"enabled": False})
+
+
+@main.route("/stats/cache")
+def cache_stats():
+    return jsonify(get_cache_store().stats())
+
+
+@main.route("/stats/index")
+def vector_index_stats():
+    return jsonify(get_vector_index().stats())
+
+
+@main.route("/stats/ocr")
+def ocr_stats():
+    return jsonify(
+        {
+            "page_cache": page_cache_stats(),
+            "backend": get_ocr_backend().stats(),
+            "engine": get_ocr_engine().stats(),
+        }
+    )
 
 
 @main.route("/reports/<report_id>")
@@ -0,0 +1,171 @@
+import time
+import warnings
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import AutoModel, AutoTokenizer
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+
+def mean_pool_normalize(
+    token_embeddings: torch.Tensor, attention_mask: torch.Tensor
+) -> torch.Tensor:
+    """Attention-masked mean pooling followed by L2 normalization"""
+    mask_expanded = attention_mask.unsqueeze(-1).to(token_embeddings.dtype)
+    sum_embeddings = torch.sum(token_embeddings * mask_expanded, dim=1)
+    sum_mask = torch.clamp(mask_expanded.sum(dim=1), min=1e-9)
+    return F.normalize(sum_embeddings / sum_mask, p=2, dim=1)
+
+
+class PooledEncoder(torch.nn.Module):
+    """Transformer plus pooling and normalization as a single module"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        # Tuple outputs keep the module traceable
+        outputs = self.model(
+            input_ids=input_ids, attention_mask=attention_mask, return_dict=False
+        )
+        token_embeddings = outputs[0].float()
+        return mean_pool_normalize(token_embeddings, attention_mask)
+
+
+class EmbeddingBackend:
+    """Turns text segments into L2-normalized sentence embeddings.
+
+    Subclasses only decide how a padded batch is executed; tokenization and
+    precision handling are shared.
+    """
+
+    name = "base"
+
+    def __init__(
+        self,
+        model_name: str,
+        max_length: int = 128,
+        precision: str = "fp32",
+        device: Optional[torch.device] = None,
+    ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        start = time.perf_counter()
+        self.model_name = model_name
+        self.max_length = max_length
+        self.device = device or torch.device(
+            "cuda" if torch.cuda.is_available() else "cpu"
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = self._load_model()
+        self.precision = self._apply_precision(precision)
+        self._prepare()
+        self.cold_start_seconds = time.perf_counter() - start
+
+    def _load_model(self) -> torch.nn.Module:
+        model = AutoModel.from_pretrained(self.model_name)
+        model = model.to(self.device)
+        model.eval()  # Set to evaluation mode
+        return model
+
+    def _apply_precision(self, precision: str) -> str:
+        """Convert the loaded fp32 model to the requested inference precision"""
+        if precision == "int8":
+            if self.device.type != "cpu":
+                print("int8 dynamic quantization is CPU-only, keeping fp32")
+                return "fp32"
+            # Linear layers hold nearly all MiniLM weights and FLOPs
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        elif precision == "bf16":
+            self.model = self.model.to(torch.bfloat16)
+        return precision
+
+    def _prepare(self) -> None:
+        """Hook for engines that need to build an optimized graph after loading"""
+
+    def tokenize(self, segments: List[str]):
+        return self.tokenizer(
+            segments,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        )
+
+    def encode(self, segments: List[str]) -> np.ndarray:
+        """Embed one batch of segments"""
+        return self.encode_inputs(self.tokenize(segments))
+
+    def encode_inputs(self, inputs) -> np.ndarray:
+        """Embed an already tokenized and padded batch"""
+        raise NotImplementedError
+
+
+class EagerEmbeddingBackend(EmbeddingBackend):
+    """Plain eager-mode execution of the Hugging Face model"""
+
+    name = "eager"
+
+    def encode_inputs(self, inputs) -> np.ndarray:
+        inputs = inputs.to(self.device)
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+        token_embeddings = outputs.last_hidden_state.float()
+        embeddings = mean_pool_normalize(token_embeddings, inputs["attention_mask"])
+        return embeddings.cpu().numpy()
+
+
+class TorchScriptEmbeddingBackend(EmbeddingBackend):
+    """Traced and frozen graph with pooling and normalization fused in"""
+
+    name = "torchscript"
+
+    def _prepare(self) -> None:
+        example = self.tokenize(
+            ["Trace example sentence.", "A second, somewhat longer trace example."]
+        ).to(self.device)
+        with torch.no_grad(), warnings.catch_warnings():
+            # Shape-dependent Python branches in the model are expected here
+            warnings.simplefilter("ignore", torch.jit.TracerWarning)
+            traced = torch.jit.trace(
+                PooledEncoder(self.model).eval(),
+                (example["input_ids"], example["attention_mask"]),
+                check_trace=False,
+            )
+            self.graph = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+            # The first calls specialise the graph; do them now, not on a request
+            for _ in range(2):
+                self.graph(example["input_ids"], example["attention_mask"])
+
+    def encode_inputs(self, inputs) -> np.ndarray:
+        inputs = inputs.to(self.device)
+        with torch.no_grad():
+            embeddings = self.graph(inputs["input_ids"], inputs["attention_mask"])
+        return embeddings.cpu().numpy()
+
+
+EMBEDDING_BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    backend.name: backend
+    for backend in (EagerEmbeddingBackend, TorchScriptEmbeddingBackend)
+}
+
+
+def create_embedding_backend(
+    engine: str, model_name: str, max_length: int = 128, precision: str = "fp32"
+) -> EmbeddingBackend:
+    try:
+        backend_class = EMBEDDING_BACKENDS[engine]
+    except KeyError:
+        raise ValueError(
+            f"Unknown embedding engine: {engine} "
+            f"(expected one of {', '.join(EMBEDDING_BACKENDS)})"
+        )
+    return backend_class(model_name, max_length=max_length, precision=precision)
@@ -0,0 +1,248 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from config import Config
+
+EMBEDDING_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "cached_data",
+    "embeddings",
+)
+# Bumped when the on-disk layout changes; older caches start over
+INDEX_VERSION = 2
+TAG_BYTES = 20
+
+
+def slot_tag(key: str) -> np.ndarray:
+    """Digest stored next to a slot's vector, naming the key it holds"""
+    return np.frombuffer(hashlib.sha1(key.encode("utf-8")).digest(), dtype=np.uint8)
+
+
+def embedding_key(model_name: str, max_length: int, text: str) -> str:
+    """Content hash identifying one segment embedding"""
+    return hashlib.sha1(
+        f"{model_name}\x00{max_length}\x00{text}".encode("utf-8")
+    ).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk sentence embedding store evicting oldest entries past a byte budget.
+
+    Vectors live in a fixed-capacity memory-mapped array file and are located
+    through a small JSON index mapping key -> slot. Writers take the file
+    lock exclusively and readers share it, so several gunicorn workers
+    never see a half-written slot or index. Each slot also stores a digest
+    of its key in tags.bin, checked on every read, so a slot reused for
+    another key is never returned for the evicted one.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = EMBEDDING_CACHE_DIR,
+        max_bytes: int = 256 * 1024 * 1024,
+        dtype: str = "float16",
+    ):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.vectors_path = os.path.join(cache_dir, "vectors.bin")
+        self.tags_path = os.path.join(cache_dir, "tags.bin")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, ".lock")
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._index: Dict = {}
+        self._index_mtime: Optional[Tuple[int, int]] = None
+        self._vectors: Optional[np.memmap] = None
+        self._tags: Optional[np.memmap] = None
+        self._reload_index()
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload_index(self) -> None:
+        """Pick up index changes written by other processes"""
+        try:
+            stat = os.stat(self.index_path)
+            # replace() gives every version a new inode, even within one
+            # mtime tick
+            mtime = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            self._index = {}
+            self._index_mtime = None
+            self._vectors = self._tags = None
+            return
+
+        if mtime == self._index_mtime:
+            return
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading embedding cache index: {str(e)}")
+            return
+
+        if (
+            index.get("dtype") != self.dtype.name
+            or index.get("version") != INDEX_VERSION
+        ):
+            # Stored with a different precision or layout; start over rather
+            # than mix them
+            index = {}
+        self._index = index
+        self._index_mtime = mtime
+        self._vectors = self._tags = None
+
+    def _open_vectors(self, dim: int, capacity: int) -> Tuple[np.memmap, np.memmap]:
+        """The vector and slot tag arrays, created empty if missing or resized"""
+        if self._vectors is None or self._tags is None:
+            self._vectors = self._open_array(
+                self.vectors_path, self.dtype, (capacity, dim)
+            )
+            self._tags = self._open_array(
+                self.tags_path, np.dtype(np.uint8), (capacity, TAG_BYTES)
+            )
+        return self._vectors, self._tags
+
+    @staticmethod
+    def _open_array(path: str, dtype: np.dtype, shape: Tuple[int, int]) -> np.memmap:
+        expected_size = shape[0] * shape[1] * dtype.itemsize
+        mode = "r+"
+        if not os.path.exists(path) or os.path.getsize(path) != expected_size:
+            mode = "w+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def _write_index(self) -> None:
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._index, file, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+        stat = os.stat(self.index_path)
+        self._index_mtime = (stat.st_ino, stat.st_mtime_ns)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached embeddings for the keys that are present"""
+        found = {}
+        with self._lock, self._file_lock(shared=True):
+            self._reload_index()
+            entries = self._index.get("entries", {})
+            if entries:
+                vectors, tags = self._open_vectors(
+                    self._index["dim"], self._index["capacity"]
+                )
+                for key in keys:
+                    entry = entries.get(key)
+                    # A slot whose tag names another key was reused after
+                    # this index was read; count it as a miss
+                    if entry is not None and np.array_equal(
+                        tags[entry[0]], slot_tag(key)
+                    ):
+                        found[key] = np.asarray(vectors[entry[0]], dtype=np.float32)
+            hits = len(found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """Store embeddings, evicting the least recently written ones when full"""
+        if not items:
+            return
+        dim = len(next(iter(items.values())))
+        with self._lock, self._file_lock():
+            self._reload_index()
+            if self._index.get("dim") != dim:
+                capacity = max(1, self.max_bytes // (dim * self.dtype.itemsize))
+                self._index = {
+                    "version": INDEX_VERSION,
+                    "dim": dim,
+                    "dtype": self.dtype.name,
+                    "capacity": capacity,
+                    "clock": 0,
+                    "entries": {},
+                }
+                self._vectors = self._tags = None
+
+            capacity = self._index["capacity"]
+            entries = self._index["entries"]
+            vectors, tags = self._open_vectors(dim, capacity)
+
+            new_keys = [key for key in items if key not in entries][:capacity]
+            # Slots fill densely and evicted slots are reused immediately
+            free_slots = list(
+                range(len(entries), min(capacity, len(entries) + len(new_keys)))
+            )
+            overflow = len(new_keys) - len(free_slots)
+            if overflow > 0:
+                oldest = sorted(entries, key=lambda k: entries[k][1])[:overflow]
+                for key in oldest:
+                    free_slots.append(entries.pop(key)[0])
+                self.evictions += len(oldest)
+
+            for key, slot in zip(new_keys, free_slots):
+                self._index["clock"] += 1
+                vectors[slot] = items[key]
+                tags[slot] = slot_tag(key)
+                entries[key] = [slot, self._index["clock"]]
+
+            vectors.flush()
+            tags.flush()
+            self._write_index()
+
+    def clear(self) -> None:
+        with self._lock, self._file_lock():
+            self._index = {}
+            self._vectors = self._tags = None
+            for path in (self.index_path, self.vectors_path, self.tags_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._index_mtime = None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index.get("entries", {})),
+            "capacity": self._index.get("capacity"),
+            "dtype": self.dtype.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide embedding cache configured from Config, or None if disabled"""
+    global _shared_cache
+    if not Config.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache(
+                max_bytes=Config.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+                dtype=Config.EMBEDDING_CACHE_DTYPE,
+            )
+        return _shared_cache
@@ -0,0 +1,138 @@
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+# One row per paragraph; the columns paragraph_features_from_annotation
+# produces, with the bounding box flattened
+FEATURE_DTYPE = np.dtype(
+    [
+        ("confidence", np.float64),
+        ("word_count", np.int32),
+        ("symbol_density", np.float64),
+        ("line_breaks", np.int32),
+        ("average_symbol_confidence", np.float64),
+        ("has_box", np.bool_),
+        ("left", np.int32),
+        ("top", np.int32),
+        ("width", np.int32),
+        ("height", np.int32),
+        ("page_number", np.int32),
+    ]
+)
+FEATURE_FIELDS = (
+    "confidence",
+    "word_count",
+    "symbol_density",
+    "line_breaks",
+    "average_symbol_confidence",
+)
+BOX_FIELDS = ("left", "top", "width", "height")
+
+
+class ParagraphFeature:
+    """One paragraph's features as a light object"""
+
+    __slots__ = FEATURE_FIELDS + ("boundingBox", "page_number")
+
+    def __init__(self, row):
+        for name in FEATURE_FIELDS:
+            setattr(self, name, row[name].item())
+        self.boundingBox = (
+            {name: row[name].item() for name in BOX_FIELDS} if row["has_box"] else None
+        )
+        self.page_number = row["page_number"].item()
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class FeatureTable:
+    """Paragraph features of a whole document as one structured array.
+
+    rows holds every paragraph in page order and page_offsets[i] is where
+    page i starts, so page i is rows[page_offsets[i]:page_offsets[i + 1]].
+    Columns are NumPy arrays and are read without building per-paragraph
+    Python objects.
+    """
+
+    __slots__ = ("rows", "page_offsets")
+
+    def __init__(self, rows: np.ndarray, page_offsets: np.ndarray):
+        self.rows = rows
+        self.page_offsets = page_offsets
+
+    @classmethod
+    def from_pages(cls, pages: List[List[Dict]]) -> "FeatureTable":
+        """Build from the JSON shape: a list of paragraph dicts per page"""
+        records = []
+        for page_features in pages:
+            for feature in page_features:
+                box = feature.get("boundingBox") or {}
+                records.append(
+                    tuple(feature.get(name, 0) for name in FEATURE_FIELDS)
+                    + (bool(box),)
+                    + tuple(box.get(name, 0) for name in BOX_FIELDS)
+                    + (feature.get("page_number", 0),)
+                )
+        rows = np.array(records, dtype=FEATURE_DTYPE)
+        page_offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum([len(page) for page in pages], out=page_offsets[1:])
+        return cls(rows, page_offsets)
+
+    def to_pages(self) -> List[List[Dict]]:
+        """The JSON shape: a list of paragraph dicts per page"""
+        return [
+            [ParagraphFeature(row).to_dict() for row in self.page(page_num)]
+            for page_num in range(self.page_count)
+        ]
+
+    @classmethod
+    def from_columns(cls, data: Dict) -> "FeatureTable":
+        """Inverse of to_columns"""
+        page_offsets = np.asarray(data["page_offsets"], dtype=np.int64)
+        rows = np.zeros(int(page_offsets[-1]), dtype=FEATURE_DTYPE)
+        for name in FEATURE_DTYPE.names:
+            rows[name] = data["columns"][name]
+        return cls(rows, page_offsets)
+
+    def to_columns(self) -> Dict:
+        """Compact JSON-serializable form: one list per column"""
+        return {
+            "page_offsets": self.page_offsets.tolist(),
+            "columns": {name: self.rows[name].tolist() for name in FEATURE_DTYPE.names},
+        }
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets) - 1
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def page(self, page_num: int) -> np.ndarray:
+        return self.rows[self.page_offsets[page_num] : self.page_offsets[page_num + 1]]
+
+    def pages(self) -> Iterator[np.ndarray]:
+        for page_num in range(self.page_count):
+            yield self.page(page_num)
+
+    def page_sizes(self) -> np.ndarray:
+        return np.diff(self.page_offsets)
+
+    def column(self, name: str, page_num: Optional[int] = None) -> np.ndarray:
+        """Contiguous copy of one column, for the whole document or one page"""
+        rows = self.rows if page_num is None else self.page(page_num)
+        return np.ascontiguousarray(rows[name])
+
+    def record(self, index: int) -> ParagraphFeature:
+        return ParagraphFeature(self.rows[index])
+
+
+def as_feature_table(features) -> FeatureTable:
+    """Accept either a FeatureTable or the JSON shape"""
+    if isinstance(features, FeatureTable):
+        return features
+    return FeatureTable.from_pages(features or [])
@@ -1,42 +1,25 @@
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import io
 import numpy as np
-from pdf2image import convert_from_path
-import os
-import base64
 import hashlib
-import json
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple, Union
+from config import Config
+from app.similarity.feature_table import FeatureTable, as_feature_table
+from app.similarity.region_similarity import match_page_regions, select_top_k
 from app.similarity.text_similarity import compute_text_similarity
-
-CACHE_DIR = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cached_data"
+from app.utils.cache_store import get_cache_store
+from app.utils.document import PDFDocument, as_document, file_fingerprint
+from app.utils.ocr import (
+    annotate_image,
+    annotate_pages,
+    paragraph_features_from_annotation,
 )
-os.makedirs(CACHE_DIR, exist_ok=True)
 
 
 def get_cache_key(file_path: str) -> str:
-    with open(file_path, "rb") as file:
-        return hashlib.md5(file.read()).hexdigest()
+    return file_fingerprint(file_path)
 
 
 def load_from_cache(cache_key: str):
-    try:
-        cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
-        if os.path.exists(cache_file):
-            with open(cache_file, "r", encoding='utf-8') as file:
-                content = file.read()
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error at position {e.pos}: {e.msg}")
-                    print(f"Problematic content around position {e.pos}: {content[max(0, e.pos-50):min(len(content), e.pos+50)]}")
-                    return None
-        return None
-    except Exception as e:
-        print(f"Error loading from cache: {str(e)}")
-        return None
+    return get_cache_store().get("handwriting", cache_key)
 
 
 def convert_to_native(obj):
@@ -56,228 +39,187 @@ def convert_to_native(obj):
 
 
 def save_to_cache(cache_key: str, data) -> None:
-    try:
-        cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
-        # Convert all numpy types to native Python types before serialization
-        serializable_data = convert_to_native(data)
-        
-        # Pretty print JSON for debugging
-        json_str = json.dumps(serializable_data, indent=2)
-        print(f"Attempting to save cache data (first 100 chars): {json_str[:100]}...")
-        
-        with open(cache_file, "w", encoding='utf-8') as file:
-            file.write(json_str)
-            
-    except Exception as e:
-        print(f"Error saving to cache: {str(e)}")
-        # Continue execution even if caching fails
-        pass
+    # numpy values are converted during serialization
+    get_cache_store().set("handwriting", cache_key, data)
 
 
 def process_image(args: Tuple) -> List[Dict]:
     image, api_key, page_num = args
-    try:
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format="PNG")
-        img_base64 = base64.b64encode(img_byte_arr.getvalue()).decode()
+    return paragraph_features_from_annotation(
+        annotate_image(image, page_num, api_key), page_num
+    )
 
-        url = f"https://vision.googleapis.com/v1/images:annotate?key={api_key}"
-        payload = {
-            "requests": [
+
+def extract_handwriting_features(images: List, api_key: str) -> List:
+    return features_from_annotations(annotate_pages(images, api_key))
+
+
+def features_from_annotations(annotations: List) -> List:
+    return [
+        paragraph_features_from_annotation(annotation, page_num)
+        for page_num, annotation in enumerate(annotations)
+    ]
+
+
+def pair_cache_key(fingerprint1: str, fingerprint2: str) -> str:
+    """Cache key of a document pair, the same in either order"""
+    ordered = "".join(sorted((fingerprint1, fingerprint2)))
+    return hashlib.md5(ordered.encode()).hexdigest()
+
+
+def get_document_artifacts(document: PDFDocument) -> Dict:
+    """Page features, anomalies and variations of one document.
+
+    These depend on the document alone, so they are cached under its
+    fingerprint and reused by every comparison it takes part in. "table"
+    is the columnar FeatureTable the comparison stages read; "features" is
+    the same data in the per-page dict shape the report uses. "complete"
+    is False when a page failed OCR; such artifacts are not cached, so the
+    page is retried next time.
+    """
+    cached = get_cache_store().get("document", document.fingerprint)
+    complete = True
+    if isinstance(cached, dict) and "feature_columns" in cached:
+        table = FeatureTable.from_columns(cached["feature_columns"])
+        anomalies, variations = cached["anomalies"], cached["variations"]
+    else:
+        # Same OCR results that text extraction used; no second Vision call
+        annotations = document.annotations
+        complete = all(annotation is not None for annotation in annotations)
+        table = FeatureTable.from_pages(features_from_annotations(annotations))
+        anomalies, variations = convert_to_native(detect_internal_anomalies(table))
+        if len(table) and complete:
+            get_cache_store().set(
+                "document",
+                document.fingerprint,
                 {
-                    "image": {"content": img_base64},
-                    "features": [{"type": "DOCUMENT_TEXT_DETECTION", "maxResults": 50}],
-                }
-            ]
-        }
+                    "feature_columns": table.to_columns(),
+                    "anomalies": anomalies,
+                    "variations": variations,
+                },
+            )
+    return {
+        "table": table,
+        "features": table.to_pages(),
+        "anomalies": anomalies,
+        "variations": variations,
+        "complete": complete,
+    }
 
-        response = requests.post(url, json=payload, timeout=3000)
-        if response.status_code != 200:
-            print(f"Error {response.status_code}: {response.text}")
-            return []
-
-        result = response.json()
-        page_features = []
-
-        if "responses" in result and result["responses"]:
-            response_data = result["responses"][0]
-            if "fullTextAnnotation" in response_data:
-                text_data = response_data["fullTextAnnotation"]
-
-                for page in text_data.get("pages", []):
-                    for block in page.get("blocks", []):
-                        for paragraph in block.get("paragraphs", []):
-                            words = paragraph.get("words", [])
-                            if words:
-                                # Get bounding box for the paragraph
-                                vertices = paragraph.get("boundingBox", {}).get("vertices", [])
-                                if vertices and len(vertices) == 4:
-                                    boundingBox = {
-                                        'left': min(v.get('x', 0) for v in vertices),
-                                        'top': min(v.get('y', 0) for v in vertices),
-                                        'width': max(v.get('x', 0) for v in vertices) - min(v.get('x', 0) for v in vertices),
-                                        'height': max(v.get('y', 0) for v in vertices) - min(v.get('y', 0) for v in vertices)
-                                    }
-                                else:
-                                    boundingBox = None
-
-                                page_features.append({
-                                    "confidence": paragraph.get("confidence", 0),
-                                    "word_count": len(words),
-                                    "symbol_density": sum(
-                                        1
-                                        for word in words
-                                        for symbol in word.get("symbols", [])
-                                        if not symbol.get("text", "").isalnum()
-                                    )
-                                    / len(words)
-                                    if words
-                                    else 0,
-                                    "line_breaks": sum(
-                                        1
-                                        for word in words
-                                        for symbol in word.get("symbols", [])
-                                        if symbol.get("property", {})
-                                        .get("detectedBreak", {})
-                                        .get("type")
-                                    ),
-                                    "average_symbol_confidence": sum(
-                                        symbol.get("confidence", 0)
-                                        for word in words
-                                        for symbol in word.get("symbols", [])
-                                    )
-                                    / sum(
-                                        1
-                                        for word in words
-                                        for _ in word.get("symbols", [])
-                                    ),
-                                    "boundingBox": boundingBox,
-                                    "page_number": page_num
-                                })
-
-        return page_features
 
-    except Exception as e:
-        print(f"Error processing page {page_num}: {str(e)}")
-        return []
+def compare_documents(features1, features2) -> Dict:
+    """Pairwise results, with region matches as [index1, index2, score] per page.
+
+    Takes FeatureTables or per-page paragraph dicts. Paragraph features
+    carry no text, so text_matches holds an empty list per page.
+    """
+    table1 = as_feature_table(features1)
+    table2 = as_feature_table(features2)
+    text_matches = []
+    handwriting_matches = []
+
+    # Process similarities for each page
+    for page1_rows, page2_rows in zip(table1.pages(), table2.pages()):
+        # Handwriting features of every region pair at once; 80% threshold
+        page_hw_matches = match_page_regions(page1_rows, page2_rows, 0.80)
+
+        text_matches.append([])
+        handwriting_matches.append(
+            [
+                list(match)
+                for match in zip(
+                    page_hw_matches[:, 0].astype(int).tolist(),
+                    page_hw_matches[:, 1].astype(int).tolist(),
+                    page_hw_matches[:, 2].tolist(),
+                )
+            ]
+        )
 
+    similarity, feature_scores = compare_handwriting_features(table1, table2)
+    return {
+        "similarity": float(np.clip(similarity, 0, 1)),
+        "feature_scores": convert_to_native(feature_scores),
+        "text_matches": text_matches,
+        "handwriting_matches": handwriting_matches,
+    }
 
-def extract_handwriting_features(images: List, api_key: str) -> List:
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = [
-            executor.submit(process_image, (image, api_key, i))
-            for i, image in enumerate(images)
+
+def matched_regions(
+    matches: List, features: List, swapped: bool, top_k: Optional[int] = None
+) -> List:
+    """Per-page {'score', 'boundingBox'} of the matched regions in features.
+
+    matches were computed with the documents in fingerprint order; swapped
+    means features belongs to the second of them. top_k keeps only the best
+    matches of each region.
+    """
+    regions = []
+    for page_features, page_matches in zip(features, matches):
+        page_matches = np.array(page_matches, dtype=float).reshape(-1, 3)
+        if swapped:
+            page_matches = page_matches[:, [1, 0, 2]]
+        page_matches = page_matches[
+            np.lexsort((page_matches[:, 1], page_matches[:, 0]))
         ]
-        return [future.result() for future in as_completed(futures)]
+        regions.append(
+            [
+                {
+                    'score': float(score),
+                    'boundingBox': page_features[int(i)]['boundingBox'],
+                }
+                for i, _, score in select_top_k(page_matches, top_k)
+            ]
+        )
+    return regions
 
 
-def compute_handwriting_similarity(pdf_path1: str, pdf_path2: str) -> Tuple:
+def compute_handwriting_similarity(
+    document1: Union[str, PDFDocument], document2: Union[str, PDFDocument]
+) -> Tuple:
     try:
-        images1 = convert_from_path(pdf_path1)
-        images2 = convert_from_path(pdf_path2)
-        api_key = os.environ.get("GOOGLE_CLOUD_API_KEY")
-
-        cache_key = hashlib.md5(
-            (get_cache_key(pdf_path1) + get_cache_key(pdf_path2)).encode()
-        ).hexdigest()
-        
-        # Initialize empty lists for similarities
-        text_similarities = []
-        handwriting_similarities = []
-        
-        if cached := load_from_cache(cache_key):
-            try:
-                return (
-                    float(cached["similarity"]),
-                    convert_to_native(cached["feature_scores"]),
-                    convert_to_native(cached["anomalies1"]),
-                    convert_to_native(cached["anomalies2"]),
-                    convert_to_native(cached["variations1"]),
-                    convert_to_native(cached["variations2"]),
-                    images1,
-                    images2,
-                    convert_to_native(cached["features1"]),
-                    convert_to_native(cached["features2"]),
-                    convert_to_native(cached.get("text_similarities", [])),
-                    convert_to_native(cached.get("handwriting_similarities", []))
-                )
-            except Exception as e:
-                print(f"Error processing cached data: {str(e)}")
-                # Continue with fresh computation if cache processing fails
+        document1 = as_document(document1)
+        document2 = as_document(document2)
+        # Shared with text extraction and the report; rendered only once
+        images1 = document1.images
+        images2 = document2.images
 
-        features1 = extract_handwriting_features(images1, api_key)
-        features2 = extract_handwriting_features(images2, api_key)
+        artifacts1 = get_document_artifacts(document1)
+        artifacts2 = get_document_artifacts(document2)
+        features1 = artifacts1["features"]
+        features2 = artifacts2["features"]
 
         # Ensure features are not empty
-        if not features1 or not features2:
+        if not artifacts1["table"].page_count or not artifacts2["table"].page_count:
             raise Exception("Failed to extract features from one or both documents")
 
-        # Process similarities for each page
-        for page_idx, (page1_features, page2_features) in enumerate(zip(features1, features2)):
-            page_text_sims = []
-            page_hw_sims = []
-            
-            for feat1 in page1_features:
-                for feat2 in page2_features:
-                    if 'boundingBox' in feat1 and 'boundingBox' in feat2:
-                        # Compare text content similarity if text is available
-                        if 'text' in feat1 and 'text' in feat2:
-                            text_sim = compute_text_similarity(feat1['text'], feat2['text'])
-                            if text_sim >= 0.90:  # 90% threshold
-                                page_text_sims.append({
-                                    'score': text_sim,
-                                    'boundingBox': feat1['boundingBox']
-                                })
-                        
-                        # Compare handwriting features similarity
-                        hw_sim = compute_handwriting_region_similarity(feat1, feat2)
-                        if hw_sim >= 0.80:  # 80% threshold
-                            page_hw_sims.append({
-                                'score': hw_sim,
-                                'boundingBox': feat1['boundingBox']
-                            })
-            
-            text_similarities.append(page_text_sims)
-            handwriting_similarities.append(page_hw_sims)
-
-        anomalies1, variations1 = detect_internal_anomalies(features1)
-        anomalies2, variations2 = detect_internal_anomalies(features2)
-
-        similarity, feature_scores = compare_handwriting_features(features1, features2)
-        
-        # Prepare cache data
-        cache_data = {
-            "similarity": float(np.clip(similarity, 0, 1)),
-            "feature_scores": convert_to_native(feature_scores),
-            "anomalies1": convert_to_native(anomalies1),
-            "anomalies2": convert_to_native(anomalies2),
-            "variations1": convert_to_native(variations1),
-            "variations2": convert_to_native(variations2),
-            "features1": convert_to_native(features1),
-            "features2": convert_to_native(features2),
-            "text_similarities": convert_to_native(text_similarities),
-            "handwriting_similarities": convert_to_native(handwriting_similarities)
-        }
-
-        try:
-            json.dumps(cache_data)  # Test serialization
-            save_to_cache(cache_key, cache_data)
-        except Exception as e:
-            print(f"Cache serialization test failed: {str(e)}")
+        # Pair results are stored with the documents in fingerprint order
+        swapped = document1.fingerprint > document2.fingerprint
+        cache_key = pair_cache_key(document1.fingerprint, document2.fingerprint)
+        pair = load_from_cache(cache_key)
+        if not isinstance(pair, dict) or "handwriting_matches" not in pair:
+            tables = (artifacts1["table"], artifacts2["table"])
+            pair = compare_documents(*(tables[::-1] if swapped else tables))
+            if artifacts1["complete"] and artifacts2["complete"]:
+                save_to_cache(cache_key, pair)
 
         return (
-            float(np.clip(similarity, 0, 1)),
-            feature_scores,
-            anomalies1,
-            anomalies2,
-            variations1,
-            variations2,
+            pair["similarity"],
+            pair["feature_scores"],
+            artifacts1["anomalies"],
+            artifacts2["anomalies"],
+            artifacts1["variations"],
+            artifacts2["variations"],
             images1,
             images2,
             features1,
             features2,
-            text_similarities,
-            handwriting_similarities
+            matched_regions(pair["text_matches"], features1, swapped),
+            matched_regions(
+                pair["handwriting_matches"],
+                features1,
+                swapped,
+                Config.HANDWRITING_MATCH_TOP_K,
+            ),
         )
 
     except Exception as e:
@@ -285,36 +227,36 @@ def compute_handwriting_similarity(pdf_path1: str, pdf_path2: str) -> Tuple:
         raise Exception(f"Error computing handwriting similarity: {str(e)}")
 
 
-def compare_handwriting_features(
-    features1: List, features2: List
-) -> Tuple[float, Dict]:
-    if not features1 or not features2 or not features1[0] or not features2[0]:
+def compare_handwriting_features(features1, features2) -> Tuple[float, Dict]:
+    table1 = as_feature_table(features1)
+    table2 = as_feature_table(features2)
+    if (
+        not table1.page_count
+        or not table2.page_count
+        or not table1.page_sizes()[0]
+        or not table2.page_sizes()[0]
+    ):
         return 0.0, {}
 
-    flat_features1 = [f for page_features in features1 for f in page_features]
-    flat_features2 = [f for page_features in features2 for f in page_features]
-
-    if not flat_features1 or not flat_features2:
+    if not len(table1) or not len(table2):
         return 0.0, {}
 
     conf_sim = 1 - abs(
-        np.mean([f["confidence"] for f in flat_features1])
-        - np.mean([f["confidence"] for f in flat_features2])
+        np.mean(table1.column("confidence")) - np.mean(table2.column("confidence"))
     )
 
     symbol_density_sim = 1 - abs(
-        np.mean([f["symbol_density"] for f in flat_features1])
-        - np.mean([f["symbol_density"] for f in flat_features2])
+        np.mean(table1.column("symbol_density"))
+        - np.mean(table2.column("symbol_density"))
     )
 
     line_break_sim = 1 - abs(
-        np.mean([f["line_breaks"] for f in flat_features1])
-        - np.mean([f["line_breaks"] for f in flat_features2])
+        np.mean(table1.column("line_breaks")) - np.mean(table2.column("line_breaks"))
     )
 
     avg_conf_sim = 1 - abs(
-        np.mean([f["average_symbol_confidence"] for f in flat_features1])
-        - np.mean([f["average_symbol_confidence"] for f in flat_features2])
+        np.mean(table1.column("average_symbol_confidence"))
+        - np.mean(table2.column("average_symbol_confidence"))
     )
 
     feature_scores = {
@@ -341,127 +283,157 @@ def compare_handwriting_features(
     return float(np.clip(similarity, 0, 1)), feature_scores
 
 
-def detect_internal_anomalies(features: List) -> Tuple[List, List]:
-    anomalies = []
-    page_variations = []
-
-    if not features or not isinstance(features[0], list):
-        return [], []
+# Document-level features compare_handwriting_features weighs, in order
+HANDWRITING_WEIGHTS = (
+    ("confidence", 0.3),
+    ("symbol_density", 0.3),
+    ("line_breaks", 0.2),
+    ("average_symbol_confidence", 0.2),
+)
 
-    for page_num, page_features in enumerate(features):
-        if not page_features:
-            continue
 
-        page_confidence_mean = np.mean([f["confidence"] for f in page_features])
-        page_symbol_density_mean = np.mean([f["symbol_density"] for f in page_features])
-        page_line_breaks_mean = np.mean([f["line_breaks"] for f in page_features])
+def handwriting_similarity_matrix(tables: List[Optional[FeatureTable]]) -> np.ndarray:
+    """compare_handwriting_features similarity of every pair of documents.
 
-        page_characteristics = {
-            "page_number": page_num + 1,
-            "confidence": page_confidence_mean,
-            "symbol_density": page_symbol_density_mean,
-            "line_breaks": page_line_breaks_mean,
+    One broadcast over the per-document feature means instead of N^2 calls.
+    Documents without features (or None) score 0 against everything, as in
+    the pairwise function.
+    """
+    means = np.zeros((len(tables), len(HANDWRITING_WEIGHTS)))
+    valid = np.zeros(len(tables), dtype=bool)
+    for row, table in enumerate(tables):
+        if table is None or not table.page_count or not len(table):
+            continue
+        valid[row] = bool(table.page_sizes()[0])
+        means[row] = [np.mean(table.column(name)) for name, _ in HANDWRITING_WEIGHTS]
+
+    weights = np.array([weight for _, weight in HANDWRITING_WEIGHTS])
+    similarities = 1 - np.abs(means[:, None, :] - means[None, :, :])
+    matrix = np.clip(similarities @ weights, 0, 1)
+    matrix[~valid, :] = 0.0
+    matrix[:, ~valid] = 0.0
+    return matrix
+
+
+# Paragraph features checked for anomalies and page-to-page variation
+ANOMALY_FEATURES = ("confidence", "symbol_density", "line_breaks")
+ANOMALY_THRESHOLD = 2.0
+VARIATION_THRESHOLD = 0.15
+
+
+def page_statistics(table: FeatureTable) -> Dict[str, np.ndarray]:
+    """Per-page mean and std of ANOMALY_FEATURES in one grouped pass.
+
+    Empty pages are skipped. "values" and "deviations" are per paragraph,
+    "means" and "stds" per non-empty page, all with one column per feature.
+    """
+    sizes = table.page_sizes()
+    nonempty = sizes > 0
+    starts = table.page_offsets[:-1][nonempty]
+    counts = sizes[nonempty][:, None]
+    values = np.column_stack(
+        [table.column(name).astype(np.float64) for name in ANOMALY_FEATURES]
+    )
+    if not len(values):
+        values = np.empty((0, len(ANOMALY_FEATURES)))
+        return {
+            "page_numbers": np.empty(0, dtype=np.int64),
+            "values": values,
+            "deviations": values,
+            "means": values,
+            "stds": values,
         }
+    means = np.add.reduceat(values, starts, axis=0) / counts
+    deviations = values - np.repeat(means, sizes[nonempty], axis=0)
+    stds = np.sqrt(np.add.reduceat(deviations**2, starts, axis=0) / counts)
+    return {
+        "page_numbers": np.flatnonzero(nonempty),
+        "values": values,
+        "deviations": deviations,
+        "means": means,
+        "stds": stds,
+    }
 
-        page_anomalies = detect_page_anomalies(page_features, page_num)
-        anomalies.extend(page_anomalies)
-        page_variations.append(page_characteristics)
 
-    if len(page_variations) > 1:
-        variations = analyze_page_variations(page_variations)
-        return anomalies, variations
+def detect_internal_anomalies(features) -> Tuple[List, List]:
+    table = as_feature_table(features)
+    if not table.page_count:
+        return [], []
 
+    stats = page_statistics(table)
+    anomalies = detect_page_anomalies(table, stats)
+    if len(stats["page_numbers"]) > 1:
+        return anomalies, analyze_page_variations(
+            stats["page_numbers"], stats["means"]
+        )
     return anomalies, []
 
 
-def detect_page_anomalies(features: List, page_num: int) -> List[Dict]:
-    anomalies = []
-    threshold = 2.0
-
-    confidence_mean = np.mean([f["confidence"] for f in features])
-    confidence_std = np.std([f["confidence"] for f in features])
+def detect_page_anomalies(table: FeatureTable, stats: Dict) -> List[Dict]:
+    """Paragraphs more than 2 standard deviations from their page mean.
 
-    symbol_density_mean = np.mean([f["symbol_density"] for f in features])
-    symbol_density_std = np.std([f["symbol_density"] for f in features])
+    Flags every paragraph at once; a page whose std is zero flags nothing.
+    """
+    sizes = table.page_sizes()
+    page_stds = np.repeat(stats["stds"], sizes[sizes > 0], axis=0)
+    page_means = np.repeat(stats["means"], sizes[sizes > 0], axis=0)
+    distances = np.abs(stats["deviations"])
+    flags = (page_stds > 0) & (distances > ANOMALY_THRESHOLD * page_stds)
+    scores = np.divide(
+        distances, page_stds, out=np.zeros_like(distances), where=page_stds > 0
+    )
 
-    line_breaks_mean = np.mean([f["line_breaks"] for f in features])
-    line_breaks_std = np.std([f["line_breaks"] for f in features])
+    page_of_row = np.repeat(np.arange(table.page_count), sizes)
+    paragraph_index = np.arange(len(table)) - table.page_offsets[page_of_row]
+    columns = [table.column(name) for name in ANOMALY_FEATURES]
 
-    for i, feature in enumerate(features):
+    anomalies = []
+    for row in np.flatnonzero(flags.any(axis=1)):
         anomaly = {}
-
-        if abs(feature["confidence"] - confidence_mean) > threshold * confidence_std:
-            anomaly["confidence"] = {
-                "value": feature["confidence"],
-                "mean": confidence_mean,
-                "deviation": abs(feature["confidence"] - confidence_mean)
-                / confidence_std,
-            }
-
-        if (
-            abs(feature["symbol_density"] - symbol_density_mean)
-            > threshold * symbol_density_std
-        ):
-            anomaly["symbol_density"] = {
-                "value": feature["symbol_density"],
-                "mean": symbol_density_mean,
-                "deviation": abs(feature["symbol_density"] - symbol_density_mean)
-                / symbol_density_std,
-            }
-
-        if abs(feature["line_breaks"] - line_breaks_mean) > threshold * line_breaks_std:
-            anomaly["line_breaks"] = {
-                "value": feature["line_breaks"],
-                "mean": line_breaks_mean,
-                "deviation": abs(feature["line_breaks"] - line_breaks_mean)
-                / line_breaks_std,
-            }
-
-        if anomaly:
-            anomaly["paragraph_index"] = i
-            anomaly["page_number"] = page_num + 1
-            anomalies.append(anomaly)
+        for column, name in enumerate(ANOMALY_FEATURES):
+            if flags[row, column]:
+                anomaly[name] = {
+                    "value": columns[column][row].item(),
+                    "mean": page_means[row, column],
+                    "deviation": scores[row, column],
+                }
+        anomaly["paragraph_index"] = int(paragraph_index[row])
+        anomaly["page_number"] = int(page_of_row[row]) + 1
+        anomalies.append(anomaly)
 
     return anomalies
 
 
-def analyze_page_variations(page_characteristics: List[Dict]) -> List[Dict]:
-    variations = []
-    threshold = 0.15
-
-    for i in range(1, len(page_characteristics)):
-        prev_page = page_characteristics[i - 1]
-        curr_page = page_characteristics[i]
+def analyze_page_variations(page_numbers: np.ndarray, means: np.ndarray) -> List[Dict]:
+    """Feature changes above 15% between consecutive non-empty pages"""
+    changes = np.abs(np.diff(means, axis=0))
+    flags = changes > VARIATION_THRESHOLD
 
+    variations = []
+    for i in np.flatnonzero(flags.any(axis=1)):
         variation = {
-            "from_page": prev_page["page_number"],
-            "to_page": curr_page["page_number"],
+            "from_page": int(page_numbers[i]) + 1,
+            "to_page": int(page_numbers[i + 1]) + 1,
             "changes": [],
         }
-
-        changes = {
-            "confidence": abs(curr_page["confidence"] - prev_page["confidence"]),
-            "symbol_density": abs(
-                curr_page["symbol_density"] - prev_page["symbol_density"]
-            ),
-            "line_breaks": abs(curr_page["line_breaks"] - prev_page["line_breaks"]),
-        }
-
-        for change_type, value in changes.items():
-            if value > threshold:
+        for column, change_type in enumerate(ANOMALY_FEATURES):
+            if flags[i, column]:
+                value = changes[i, column]
                 variation["changes"].append(
                     {
                         "type": change_type,
                         "difference": value,
-                        "description": f"{change_type.replace('_', ' ').title()} changed by {(value * 100):.1f}%",
+                        "description": (
+                            f"{change_type.replace('_', ' ').title()} "
+                            f"changed by {(value * 100):.1f}%"
+                        ),
                     }
                 )
-
-        if variation["changes"]:
-            variations.append(variation)
+        variations.append(variation)
 
     return variations
 
+
 def compute_text_region_similarity(region1: Dict, region2: Dict) -> float:
     """Compute text similarity between two regions"""
     # Extract text content from regions and compare
@@ -0,0 +1,151 @@
+"""MinHash signatures of document texts and LSH banding over them, used to
+find the document pairs worth a semantic comparison.
+
+Usage: python -m app.similarity.minhash [--threshold 0.1] [--top 20]
+"""
+import argparse
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import Config
+from app.utils.cache_store import get_cache_store, load_cached_texts
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Shingles hashed against every permutation at once, per chunk
+SHINGLE_CHUNK = 4096
+MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def permutations(num_perm: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Multiply-shift hash functions (a odd) standing in for permutations"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+    return a * np.uint64(2) + np.uint64(1), b
+
+
+def shingle_hashes(text: str, shingle_size: int = 3) -> np.ndarray:
+    """Distinct 32-bit hashes of the text's word shingles.
+
+    Words are lowercased and hashed once; each shingle hash combines the
+    hashes of its shingle_size consecutive words. A text shorter than a
+    shingle is one shingle.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    vocabulary = {token: zlib.crc32(token.encode("utf-8")) for token in set(tokens)}
+    words = np.array([vocabulary[token] for token in tokens], dtype=np.uint64)
+    size = min(shingle_size, len(words))
+    with np.errstate(over="ignore"):
+        count = len(words) - size + 1
+        combined = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            combined = combined * np.uint64(1000003) + words[offset : offset + count]
+    return np.unique((combined ^ (combined >> np.uint64(32))) & MAX_HASH)
+
+
+def minhash_signature(
+    text: str, num_perm: int = 128, shingle_size: int = 3, seed: int = 1
+) -> Optional[np.ndarray]:
+    """num_perm minimum hash values of the text's shingles; None if it has no
+    words. The fraction of equal values between two signatures estimates
+    the Jaccard similarity of the two shingle sets."""
+    hashes = shingle_hashes(text, shingle_size)
+    if not len(hashes):
+        return None
+    a, b = permutations(num_perm, seed)
+    signature = np.full(num_perm, MAX_HASH, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(hashes), SHINGLE_CHUNK):
+            chunk = hashes[start : start + SHINGLE_CHUNK, None]
+            values = (chunk * a + b) >> np.uint64(32)
+            np.minimum(signature, values.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def document_signature(fingerprint: str, text: str) -> Optional[np.ndarray]:
+    """minhash_signature of a document's text, cached under its fingerprint"""
+    params = [Config.MINHASH_PERMUTATIONS, Config.MINHASH_SHINGLE_SIZE]
+    store = get_cache_store()
+    cached = store.get("minhash", fingerprint)
+    if isinstance(cached, dict) and cached.get("params") == params:
+        return np.array(cached["signature"], dtype=np.uint32)
+    signature = minhash_signature(text, *params)
+    if signature is not None:
+        store.set("minhash", fingerprint, {"params": params, "signature": signature})
+    return signature
+
+
+def estimate_jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+    return float(np.mean(signature1 == signature2))
+
+
+def band_layout(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows per band) whose LSH threshold (1/bands)^(1/rows) is the
+    highest one not above threshold, so pairs at the threshold are found
+    with high probability and the signature check drops the extras"""
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def candidate_pairs(
+    signatures: List[Optional[np.ndarray]], threshold: float
+) -> Dict[Tuple[int, int], float]:
+    """{(i, j): estimated Jaccard} of every pair i < j that shares an LSH
+    bucket and whose signatures agree on at least threshold of their
+    values. Documents without a signature are never candidates."""
+    present = [i for i, signature in enumerate(signatures) if signature is not None]
+    if len(present) < 2:
+        return {}
+    stacked = np.vstack([signatures[i] for i in present])
+    bands, rows = band_layout(stacked.shape[1], threshold)
+
+    bucketed: Set[Tuple[int, int]] = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        keys = stacked[:, band * rows : (band + 1) * rows]
+        for position, key in enumerate(keys):
+            buckets[key.tobytes()].append(position)
+        for members in buckets.values():
+            for first, i in enumerate(members):
+                for j in members[first + 1 :]:
+                    bucketed.add((i, j))
+
+    candidates = {}
+    for i, j in sorted(bucketed):
+        estimate = estimate_jaccard(stacked[i], stacked[j])
+        if estimate >= threshold:
+            candidates[(present[i], present[j])] = estimate
+    return candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=Config.MINHASH_THRESHOLD)
+    parser.add_argument("--top", type=int, default=20, help="pairs to print")
+    args = parser.parse_args()
+
+    texts = load_cached_texts()
+    fingerprints = list(texts)
+    signatures = [document_signature(fp, texts[fp]) for fp in fingerprints]
+    candidates = candidate_pairs(signatures, args.threshold)
+    total = len(fingerprints) * (len(fingerprints) - 1) // 2
+    print(f"{len(candidates)} of {total} cached document pairs are candidates")
+    ranked = sorted(candidates.items(), key=lambda item: -item[1])
+    for (i, j), estimate in ranked[: args.top]:
+        print(f"{estimate:.3f}  {fingerprints[i]}  {fingerprints[j]}")
+
+
+if __name__ == "__main__":
+    main()
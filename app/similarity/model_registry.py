@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def get_process_rss() -> Optional[int]:
+    """Resident set size of the current process in bytes, if available"""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_model_footprint(instance: Any) -> int:
+    """Bytes held by the parameters and buffers of any torch modules on instance"""
+    modules = [instance] + list(getattr(instance, "__dict__", {}).values())
+    seen = set()
+    total = 0
+    for module in modules:
+        if not hasattr(module, "parameters") or not hasattr(module, "buffers"):
+            continue
+        try:
+            tensors = list(module.parameters()) + list(module.buffers())
+        except TypeError:
+            continue
+        for tensor in tensors:
+            if id(tensor) in seen:
+                continue
+            seen.add(id(tensor))
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """Process-wide registry that loads each model once and hands out the warm instance"""
+
+    def __init__(self):
+        self._instances: Dict[Hashable, Any] = {}
+        self._stats: Dict[Hashable, Dict] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the instance registered under key, loading it on first use"""
+        instance = self._instances.get(key)
+        if instance is not None:
+            self._stats[key]["hits"] += 1
+            return instance
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so different models can load concurrently
+        with key_lock:
+            instance = self._instances.get(key)
+            if instance is not None:
+                self._stats[key]["hits"] += 1
+                return instance
+
+            rss_before = get_process_rss()
+            start = time.perf_counter()
+            instance = loader()
+            load_seconds = time.perf_counter() - start
+            rss_after = get_process_rss()
+
+            self._stats[key] = {
+                "load_seconds": load_seconds,
+                "model_bytes": get_model_footprint(instance),
+                "rss_delta_bytes": (
+                    rss_after - rss_before
+                    if rss_before is not None and rss_after is not None
+                    else None
+                ),
+                "hits": 0,
+            }
+            self._instances[key] = instance
+            print(
+                f"Loaded model {key} in {load_seconds:.2f}s "
+                f"({self._stats[key]['model_bytes'] / 2**20:.1f} MiB)"
+            )
+            return instance
+
+    def is_loaded(self, key: Hashable) -> bool:
+        return key in self._instances
+
+    def clear(self) -> None:
+        with self._lock:
+            self._instances.clear()
+            self._stats.clear()
+            self._key_locks.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "process_rss_bytes": get_process_rss(),
+            "models": {
+                ":".join(map(str, key)) if isinstance(key, tuple) else str(key): dict(
+                    value
+                )
+                for key, value in self._stats.items()
+            },
+        }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,82 @@
+from typing import Optional
+
+import numpy as np
+
+# Paragraph features compared between regions, as in
+# compute_handwriting_region_similarity
+REGION_FEATURES = ("confidence", "symbol_density", "line_breaks")
+
+
+def feature_matrix(page_features) -> np.ndarray:
+    """(paragraphs, REGION_FEATURES) matrix of one page; NaN where missing.
+
+    page_features is either a page of FeatureTable rows or a list of
+    paragraph dicts.
+    """
+    if isinstance(page_features, np.ndarray):
+        return np.column_stack(
+            [page_features[name].astype(np.float64) for name in REGION_FEATURES]
+        )
+    matrix = np.full((len(page_features), len(REGION_FEATURES)), np.nan)
+    for row, feature in enumerate(page_features):
+        for column, name in enumerate(REGION_FEATURES):
+            if name in feature:
+                matrix[row, column] = feature[name]
+    return matrix
+
+
+def similarity_matrix(matrix1: np.ndarray, matrix2: np.ndarray) -> np.ndarray:
+    """Region similarity of every paragraph pair, broadcast in one pass.
+
+    Matches compute_handwriting_region_similarity: the mean of
+    1 - |a - b| over the features both regions have, 0 if they share none.
+    """
+    similarities = 1 - np.abs(matrix1[:, None, :] - matrix2[None, :, :])
+    present = ~np.isnan(similarities)
+    counts = present.sum(axis=2)
+    totals = np.where(present, similarities, 0.0).sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / np.maximum(counts, 1), 0.0)
+
+
+def threshold_matches(scores: np.ndarray, threshold: float) -> np.ndarray:
+    """(matches, 3) array of [row, column, score] with score >= threshold,
+    in row-major order"""
+    rows, columns = np.nonzero(scores >= threshold)
+    return np.column_stack((rows, columns, scores[rows, columns]))
+
+
+def select_top_k(matches: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """Keep the k best-scoring matches of every row, still in (row, column)
+    order; ties keep the lower column"""
+    if not k or len(matches) == 0:
+        return matches
+    # Best first within each row, then rank every match inside its row
+    order = np.lexsort((matches[:, 1], -matches[:, 2], matches[:, 0]))
+    ranked = matches[order]
+    row_start = np.r_[0, np.flatnonzero(np.diff(ranked[:, 0])) + 1]
+    group_sizes = np.diff(np.r_[row_start, len(ranked)])
+    rank = np.arange(len(ranked)) - np.repeat(row_start, group_sizes)
+    kept = ranked[rank < k]
+    return kept[np.lexsort((kept[:, 1], kept[:, 0]))]
+
+
+def match_page_regions(
+    page_features1,
+    page_features2,
+    threshold: float,
+    top_k: Optional[int] = None,
+) -> np.ndarray:
+    """[index1, index2, score] of paragraph pairs at or above threshold"""
+    if len(page_features1) == 0 or len(page_features2) == 0:
+        return np.empty((0, 3))
+    scores = similarity_matrix(
+        feature_matrix(page_features1), feature_matrix(page_features2)
+    )
+    # Paragraph dicts without a boundingBox entry cannot be shown; table
+    # rows always have one, possibly empty, like paragraph dicts do
+    if not isinstance(page_features1, np.ndarray):
+        scores[[("boundingBox" not in f) for f in page_features1], :] = -np.inf
+    if not isinstance(page_features2, np.ndarray):
+        scores[:, [("boundingBox" not in f) for f in page_features2]] = -np.inf
+    return select_top_k(threshold_matches(scores, threshold), top_k)
@@ -1,11 +1,18 @@
-import torch
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
 from nltk import sent_tokenize, download
 from nltk.corpus import stopwords
 from functools import lru_cache
-from typing import List, Dict, Tuple
-import torch.nn.functional as F
+from typing import List, Dict, Optional, Tuple
+from config import Config
+from app.similarity.model_registry import model_registry
+from app.similarity.embedding_cache import (
+    EmbeddingCache,
+    embedding_key,
+    get_embedding_cache,
+)
+from app.similarity.embedding_backends import PRECISIONS, create_embedding_backend
+
+DEFAULT_MODEL_NAME = "sentence-transformers/paraphrase-MiniLM-L3-v2"
 
 # Download required NLTK data once at module level
 for resource in ["punkt", "stopwords"]:
@@ -15,21 +22,65 @@ for resource in ["punkt", "stopwords"]:
         print(f"Error downloading {resource}: {str(e)}")
 
 
+def plan_token_budget_batches(
+    lengths: List[int], max_batch_tokens: int, max_batch_size: int = 64
+) -> List[List[int]]:
+    """Group segment indices by token length so each padded batch fits the budget.
+
+    Indices are sorted by length, so a batch is padded to its last member and
+    costs len(batch) * length tokens. A single segment longer than the budget
+    still gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current: List[int] = []
+    for index in order:
+        padded_tokens = (len(current) + 1) * lengths[index]
+        if current and (
+            padded_tokens > max_batch_tokens or len(current) >= max_batch_size
+        ):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
 class OptimizedSemanticAnalyzer:
-    def __init__(self, batch_size: int = 8):
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            "sentence-transformers/paraphrase-MiniLM-L3-v2"
-        )
-        self.model = AutoModel.from_pretrained(
-            "sentence-transformers/paraphrase-MiniLM-L3-v2"
+    def __init__(
+        self,
+        batch_size: int = 8,
+        model_name: str = DEFAULT_MODEL_NAME,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        batching: str = "fixed",
+        max_batch_tokens: int = 2048,
+        max_batch_size: int = 64,
+        precision: str = "fp32",
+        engine: str = "eager",
+    ):
+        if batching not in ("fixed", "bucketed"):
+            raise ValueError(f"Unknown batching mode: {batching}")
+        self.model_name = model_name
+        self.max_length = 128  # Limit token length for speed
+        self.embedding_cache = embedding_cache
+        self.batching = batching
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.backend = create_embedding_backend(
+            engine, model_name, max_length=self.max_length, precision=precision
         )
+        self.tokenizer = self.backend.tokenizer
+        self.model = self.backend.model
+        self.device = self.backend.device
+        self.precision = self.backend.precision
         self.stop_words = set(stopwords.words("english"))
         self.batch_size = batch_size
 
-        # Move model to GPU if available
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = self.model.to(self.device)
-        self.model.eval()  # Set to evaluation mode
+        # Reduced-precision embeddings differ slightly, so cache them separately
+        self.cache_namespace = (
+            model_name if self.precision == "fp32" else f"{model_name}@{self.precision}"
+        )
 
     @staticmethod
     @lru_cache(maxsize=1024)
@@ -41,42 +92,85 @@ class OptimizedSemanticAnalyzer:
             segments.extend(sent_tokenize(para))
         return segments
 
-    def get_embeddings_batched(self, segments: List[str]) -> np.ndarray:
-        """Get BERT embeddings for text segments in batches"""
-        embeddings = []
+    def get_embeddings_batched(
+        self, segments: List[str], batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """Get BERT embeddings for text segments, embedding only cache misses"""
+        if self.embedding_cache is None:
+            return self._embed_segments(segments, batch_size)
 
-        for i in range(0, len(segments), self.batch_size):
-            batch = segments[i : i + self.batch_size]
+        keys = [
+            embedding_key(self.cache_namespace, self.max_length, segment)
+            for segment in segments
+        ]
+        cached = self.embedding_cache.get_many(keys)
 
-            # Tokenize batch
-            inputs = self.tokenizer(
-                batch,
-                padding=True,
-                truncation=True,
-                max_length=128,  # Limit token length for speed
-                return_tensors="pt",
-            ).to(self.device)
+        # Embed each distinct missing segment once
+        missing = {}
+        for key, segment in zip(keys, segments):
+            if key not in cached and key not in missing:
+                missing[key] = segment
 
-            # Get embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
+        if missing:
+            fresh = self._embed_segments(list(missing.values()), batch_size)
+            computed = dict(zip(missing.keys(), fresh))
+            self.embedding_cache.put_many(computed)
+            cached.update(computed)
 
-            # Mean pooling with attention mask
-            attention_mask = inputs["attention_mask"]
-            token_embeddings = outputs.last_hidden_state
+        return np.vstack([cached[key] for key in keys]).astype(np.float32)
 
-            # Compute mean pooling efficiently
-            mask_expanded = (
-                attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-            )
-            sum_embeddings = torch.sum(token_embeddings * mask_expanded, dim=1)
-            sum_mask = torch.clamp(mask_expanded.sum(dim=1), min=1e-9)
-            batch_embeddings = (sum_embeddings / sum_mask).cpu().numpy()
+    def _embed_segments(
+        self, segments: List[str], batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """Run the model over segments using the configured batching mode.
+
+        batch_size is the batch length in fixed mode and a cap on it in
+        bucketed mode.
+        """
+        if self.batching == "bucketed":
+            return self._embed_segments_bucketed(segments, batch_size)
+
+        batch_size = batch_size or self.batch_size
+        embeddings = []
 
-            embeddings.append(batch_embeddings)
+        for i in range(0, len(segments), batch_size):
+            batch = segments[i : i + batch_size]
+            embeddings.append(self.backend.encode(batch))
 
         return np.vstack(embeddings)
 
+    def _embed_segments_bucketed(
+        self, segments: List[str], max_batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """Embed segments sorted by token length in batches under a token budget"""
+        max_batch_size = min(max_batch_size or self.max_batch_size, self.max_batch_size)
+        encoded = self.tokenizer(
+            segments, truncation=True, max_length=self.max_length, padding=False
+        )
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        embeddings = np.empty((len(segments), 0), dtype=np.float32)
+
+        for batch_indices in plan_token_budget_batches(
+            lengths, self.max_batch_tokens, max_batch_size
+        ):
+            inputs = self.tokenizer.pad(
+                {
+                    name: [encoded[name][i] for i in batch_indices]
+                    for name in encoded.keys()
+                },
+                padding=True,
+                return_tensors="pt",
+            )
+            batch_embeddings = self.backend.encode_inputs(inputs)
+            if embeddings.shape[1] == 0:
+                embeddings = np.empty(
+                    (len(segments), batch_embeddings.shape[1]), dtype=np.float32
+                )
+            # Scatter back so callers see the original segment order
+            embeddings[batch_indices] = batch_embeddings
+
+        return embeddings
+
     def compute_similarity_matrix(
         self, embeddings1: np.ndarray, embeddings2: np.ndarray
     ) -> np.ndarray:
@@ -93,7 +187,7 @@ class OptimizedSemanticAnalyzer:
         return np.dot(embeddings1_normalized, embeddings2_normalized.T)
 
     def analyze_semantic_consistency(
-        self, text1: str, text2: str
+        self, text1: str, text2: str, batch_size: Optional[int] = None
     ) -> Tuple[float, Dict]:
         """Analyze semantic consistency between two texts"""
         # Preprocess texts
@@ -101,8 +195,8 @@ class OptimizedSemanticAnalyzer:
         segments2 = self.preprocess_text(text2)
 
         # Get embeddings for both texts
-        embeddings1 = self.get_embeddings_batched(segments1)
-        embeddings2 = self.get_embeddings_batched(segments2)
+        embeddings1 = self.get_embeddings_batched(segments1, batch_size)
+        embeddings2 = self.get_embeddings_batched(segments2, batch_size)
 
         # Compute similarity matrix
         similarity_matrix = self.compute_similarity_matrix(embeddings1, embeddings2)
@@ -148,11 +242,45 @@ class OptimizedSemanticAnalyzer:
         return inconsistencies
 
 
-def compute_text_similarity(text1: str, text2: str, batch_size: int = 8) -> Dict:
-    """Compute semantic similarity between two texts"""
-    analyzer = OptimizedSemanticAnalyzer(batch_size=batch_size)
+def get_semantic_analyzer(
+    model_name: str = DEFAULT_MODEL_NAME, precision: Optional[str] = None
+) -> OptimizedSemanticAnalyzer:
+    """Return the process-wide analyzer for model_name, loading it on first use"""
+    precision = precision or Config.EMBEDDING_PRECISION
+    engine = Config.EMBEDDING_ENGINE
+    return model_registry.get(
+        ("semantic_analyzer", model_name, engine, precision),
+        lambda: OptimizedSemanticAnalyzer(
+            model_name=model_name,
+            embedding_cache=get_embedding_cache(),
+            batching=Config.EMBEDDING_BATCHING,
+            max_batch_tokens=Config.EMBEDDING_MAX_BATCH_TOKENS,
+            precision=precision,
+            engine=engine,
+        ),
+    )
+
+
+def warm_up_models(model_names: Optional[List[str]] = None) -> Dict:
+    """Load the embedding models ahead of the first request"""
+    for model_name in model_names or [DEFAULT_MODEL_NAME]:
+        analyzer = get_semantic_analyzer(model_name)
+        # Run one tiny forward pass so lazy kernels are initialised too
+        analyzer.get_embeddings_batched(["Warm up."])
+    return model_registry.stats()
+
+
+def compute_text_similarity(
+    text1: str, text2: str, batch_size: Optional[int] = None
+) -> Dict:
+    """Compute semantic similarity between two texts.
+
+    batch_size caps the embedding batch; by default the analyzer's own
+    batching settings apply.
+    """
+    analyzer = get_semantic_analyzer()
     similarity, consistency_analysis = analyzer.analyze_semantic_consistency(
-        text1, text2
+        text1, text2, batch_size=batch_size
     )
 
     return {
@@ -0,0 +1,668 @@
+"""Persistent nearest-neighbour index over the segment embeddings of processed
+documents.
+
+Usage: python -m app.similarity.vector_index {stats,add-cached,rebuild}
+"""
+import argparse
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+VECTOR_INDEX_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "cached_data",
+    "vector_index",
+)
+# Rows scored per matrix product when scanning without the inverted lists
+SCAN_CHUNK_ROWS = 65536
+# Training sample per inverted list and k-means iterations
+TRAIN_SAMPLE_PER_LIST = 64
+TRAIN_ITERATIONS = 10
+# Rebuild the inverted lists once rows added since the last build exceed
+# this fraction of the indexed rows
+REBUILD_FRACTION = 0.25
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def list_count(rows: int) -> int:
+    """Inverted lists for an index of this many rows: about sqrt(rows)"""
+    return int(np.clip(np.sqrt(rows), 16, 4096))
+
+
+def train_centroids(
+    vectors: np.ndarray, lists: int, iterations: int = TRAIN_ITERATIONS, seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means on a sample of the (normalized) rows"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), lists * TRAIN_SAMPLE_PER_LIST)
+    sample_rows = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+    sample = normalize(vectors[sample_rows])
+    centroids = sample[rng.choice(len(sample), lists, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=lists)
+        # Re-seed lists that lost every member
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_rows(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid of every row, in chunks"""
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_CHUNK_ROWS):
+        chunk = np.asarray(vectors[start : start + SCAN_CHUNK_ROWS], dtype=np.float32)
+        assignment[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignment
+
+
+class VectorIndex:
+    """Append-only, memory-mapped store of normalized segment embeddings
+    with an IVF (inverted file) structure for approximate search.
+
+    vectors.bin holds one row per segment and row_docs.bin the document of
+    each row; documents.jsonl and segments.jsonl hold each document's
+    fingerprint, row range and segment texts. meta.json records how many
+    rows and documents are complete and is replaced last, so other workers
+    never read a half-written document. Once enough rows exist they are
+    clustered with spherical k-means and grouped by nearest centroid in
+    ivf-<rows>.npz; a query then scans only the nprobe closest lists plus rows
+    added since the last build. Writers serialize on a file lock. Adding
+    documents only appends; when the lists fall behind, a background thread
+    clusters a snapshot of the rows without holding the lock and takes it
+    only to publish the new lists.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = VECTOR_INDEX_DIR,
+        dtype: str = "float16",
+        nprobe: int = 8,
+        min_train_rows: int = 4096,
+        background_rebuild: bool = True,
+    ):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported vector index dtype: {dtype}")
+        self.index_dir = index_dir
+        self.dtype = np.dtype(dtype)
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self.background_rebuild = background_rebuild
+        self.meta_path = os.path.join(index_dir, "meta.json")
+        self.vectors_path = os.path.join(index_dir, "vectors.bin")
+        self.row_docs_path = os.path.join(index_dir, "row_docs.bin")
+        self.documents_path = os.path.join(index_dir, "documents.jsonl")
+        self.segments_path = os.path.join(index_dir, "segments.jsonl")
+        self.lock_path = os.path.join(index_dir, ".lock")
+        self.rebuild_lock_path = os.path.join(index_dir, ".rebuild.lock")
+        os.makedirs(index_dir, exist_ok=True)
+
+        self.searches = 0
+        self.rebuilds = 0
+
+        self._lock = threading.Lock()
+        self._meta: Dict = {}
+        self._meta_mtime: Optional[Tuple[int, int]] = None
+        self._documents: List[Dict] = []
+        self._doc_ids: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._row_docs: Optional[np.memmap] = None
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._reload()
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _rebuild_lock(self, wait: bool):
+        """Held while building lists; yields False if another process is
+        already building and wait is False"""
+        with open(self.rebuild_lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload(self) -> None:
+        """Pick up documents and rebuilds written by other processes"""
+        try:
+            stat = os.stat(self.meta_path)
+            # replace() gives every version a new inode
+            mtime = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            self._meta, self._meta_mtime = {}, None
+            self._documents, self._doc_ids = [], {}
+            self._vectors = self._row_docs = self._ivf = None
+            return
+        if mtime == self._meta_mtime:
+            return
+
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            documents = self._read_documents(meta)
+        except (OSError, ValueError) as e:
+            print(f"Error loading vector index: {str(e)}")
+            return
+
+        if meta.get("dtype") != self.dtype.name:
+            raise ValueError(
+                f"Vector index in {self.index_dir} stores {meta.get('dtype')}, "
+                f"not {self.dtype.name}; rebuild it or change VECTOR_INDEX_DTYPE"
+            )
+        self._meta, self._meta_mtime = meta, mtime
+        for doc in documents:
+            self._doc_ids[doc["fingerprint"]] = len(self._documents)
+            self._documents.append(doc)
+        rows = meta["rows"]
+        self._vectors = self._row_docs = None
+        if rows:
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, meta["dim"])
+            )
+            self._row_docs = np.memmap(
+                self.row_docs_path, dtype=np.int32, mode="r", shape=(rows,)
+            )
+        self._ivf = None
+        if meta.get("indexed_rows"):
+            try:
+                with np.load(os.path.join(self.index_dir, meta["ivf"])) as ivf:
+                    self._ivf = {name: ivf[name] for name in ivf.files}
+            except (OSError, ValueError) as e:
+                # Superseded by a newer build; scan everything until reloaded
+                print(f"Error loading vector index lists: {str(e)}")
+
+    def _read_documents(self, meta: Dict) -> List[Dict]:
+        """Document entries added since the loaded meta; everything if the
+        index was cleared and started over in the meantime"""
+        if meta.get("created") != self._meta.get("created"):
+            self._documents, self._doc_ids = [], {}
+        start = self._meta.get("documents_bytes", 0) if self._documents else 0
+        with open(self.documents_path, "rb") as file:
+            file.seek(start)
+            data = file.read(meta["documents_bytes"] - start)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def _write_meta(self, meta: Dict) -> None:
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, self.meta_path)
+
+    def _truncate_to_meta(self, meta: Dict) -> None:
+        """Drop bytes a crashed writer appended after the last complete document"""
+        dim = meta.get("dim", 0)
+        sizes = {
+            self.vectors_path: meta.get("rows", 0) * dim * self.dtype.itemsize,
+            self.row_docs_path: meta.get("rows", 0) * 4,
+            self.segments_path: meta.get("segments_bytes", 0),
+            self.documents_path: meta.get("documents_bytes", 0),
+        }
+        for path, size in sizes.items():
+            with open(path, "ab") as file:
+                if file.tell() != size:
+                    file.truncate(size)
+
+    def __contains__(self, fingerprint: str) -> bool:
+        with self._lock:
+            self._reload()
+            return fingerprint in self._doc_ids
+
+    def add_document(
+        self,
+        fingerprint: str,
+        name: str,
+        segments: List[str],
+        embeddings: np.ndarray,
+        model: str,
+    ) -> bool:
+        """Index one document's segments; False if it is already indexed"""
+        item = (fingerprint, name, segments, embeddings)
+        return self.add_documents([item], model) > 0
+
+    def add_documents(self, items: List[Tuple], model: str) -> int:
+        """Index (fingerprint, name, segments, embeddings) items in one write.
+
+        Documents already indexed or without segments are skipped; returns
+        how many were added. The inverted lists are rebuilt in the background
+        once enough rows were added since the last build.
+        """
+        with self._lock, self._file_lock():
+            self._reload()
+            meta = dict(self._meta)
+            self._truncate_to_meta(meta)
+            added = 0
+            try:
+                vectors = open(self.vectors_path, "ab")
+                row_docs = open(self.row_docs_path, "ab")
+                segment_lines = open(self.segments_path, "ab")
+                document_lines = open(self.documents_path, "ab")
+                with vectors, row_docs, segment_lines, document_lines:
+                    for fingerprint, name, segments, embeddings in items:
+                        if not segments or fingerprint in self._doc_ids:
+                            continue
+                        embeddings = normalize(embeddings)
+                        if not meta:
+                            meta = {
+                                "created": f"{time.time()}-{os.getpid()}",
+                                "dim": embeddings.shape[1],
+                                "dtype": self.dtype.name,
+                                "model": model,
+                                "rows": 0,
+                                "documents": 0,
+                                "indexed_rows": 0,
+                                "segments_bytes": 0,
+                                "documents_bytes": 0,
+                            }
+                        if meta["model"] != model or meta["dim"] != embeddings.shape[1]:
+                            raise ValueError(
+                                f"Vector index holds {meta['dim']}-d {meta['model']} "
+                                f"embeddings, not {embeddings.shape[1]}-d {model}"
+                            )
+
+                        vectors.write(embeddings.astype(self.dtype).tobytes())
+                        doc_ids = np.full(len(segments), meta["documents"], np.int32)
+                        row_docs.write(doc_ids.tobytes())
+                        segment_line = (json.dumps(segments) + "\n").encode("utf-8")
+                        segment_lines.write(segment_line)
+                        document = {
+                            "fingerprint": fingerprint,
+                            "name": name,
+                            "start": meta["rows"],
+                            "end": meta["rows"] + len(segments),
+                            "offset": meta["segments_bytes"],
+                            "length": len(segment_line),
+                            "added": time.time(),
+                        }
+                        document_line = (json.dumps(document) + "\n").encode("utf-8")
+                        document_lines.write(document_line)
+
+                        # Dedupe within the batch too
+                        self._doc_ids.setdefault(fingerprint, -1)
+                        meta["rows"] += len(segments)
+                        meta["documents"] += 1
+                        meta["segments_bytes"] += len(segment_line)
+                        meta["documents_bytes"] += len(document_line)
+                        added += 1
+
+                if added:
+                    self._write_meta(meta)
+            finally:
+                # Drop the placeholder ids; _reload reads the new entries back
+                self._doc_ids = {
+                    fp: doc_id for fp, doc_id in self._doc_ids.items() if doc_id >= 0
+                }
+            self._reload()
+            stale = bool(added) and self._needs_rebuild(meta)
+        if stale and self.background_rebuild:
+            self._start_rebuild()
+        return added
+
+    def _needs_rebuild(self, meta: Dict) -> bool:
+        if meta["rows"] < self.min_train_rows:
+            return False
+        tail = meta["rows"] - meta["indexed_rows"]
+        indexed = meta["indexed_rows"]
+        return not indexed or tail > REBUILD_FRACTION * indexed
+
+    def _build_lists(self, meta: Dict) -> Dict:
+        """Cluster the first meta["rows"] rows and write their inverted lists.
+
+        Rows are only ever appended, so this needs no lock; returns the meta
+        fields that point readers at the new lists.
+        """
+        started = time.perf_counter()
+        rows = meta["rows"]
+        vectors = np.memmap(
+            self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, meta["dim"])
+        )
+        centroids = train_centroids(vectors, list_count(rows))
+        assignment = assign_rows(vectors, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=offsets[1:])
+
+        # A new file per build: readers of the previous meta.json keep
+        # loading the lists that match it
+        filename = f"ivf-{rows}.npz"
+        tmp_path = os.path.join(self.index_dir, f"{filename}.{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, centroids=centroids, offsets=offsets, rows=order)
+        os.replace(tmp_path, os.path.join(self.index_dir, filename))
+        print(
+            f"Vector index built {len(centroids)} lists over {rows} rows "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return {"ivf": filename, "indexed_rows": rows, "lists": len(centroids)}
+
+    def _remove_stale_lists(self, meta: Dict) -> None:
+        for filename in os.listdir(self.index_dir):
+            if filename.startswith("ivf-") and filename != meta.get("ivf"):
+                try:
+                    os.remove(os.path.join(self.index_dir, filename))
+                except OSError:
+                    pass
+
+    def rebuild(self, only_if_needed: bool = False) -> bool:
+        """Rebuild the inverted lists over every row; True if new lists were
+        published.
+
+        With only_if_needed, skip the build when the lists are current
+        enough or another process is already building them.
+        """
+        with self._rebuild_lock(wait=not only_if_needed) as acquired:
+            if not acquired:
+                return False
+            with self._lock:
+                self._reload()
+                snapshot = dict(self._meta)
+            if not snapshot.get("rows"):
+                return False
+            if only_if_needed and not self._needs_rebuild(snapshot):
+                return False
+            built = self._build_lists(snapshot)
+
+            with self._lock, self._file_lock():
+                self._reload()
+                meta = dict(self._meta)
+                if meta.get("created") != snapshot["created"]:
+                    # Cleared while building; drop the orphaned lists
+                    self._remove_stale_lists(meta)
+                    return False
+                meta.update(built)
+                self._write_meta(meta)
+                self._remove_stale_lists(meta)
+                self.rebuilds += 1
+                self._reload()
+            return True
+
+    def _start_rebuild(self) -> None:
+        """Rebuild the lists on a daemon thread unless one is already running"""
+        with self._lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild_in_background, daemon=True
+            )
+            self._rebuild_thread.start()
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            self.rebuild(only_if_needed=True)
+        except Exception as e:
+            print(f"Error rebuilding the vector index: {str(e)}")
+
+    def _candidate_blocks(
+        self, centroid_scores: Optional[np.ndarray], query_count: int, nprobe: int
+    ) -> Iterable[Tuple[np.ndarray, np.ndarray]]:
+        """(query indices, rows) blocks to score: the nprobe nearest lists of
+        each query, then rows added since the last build. Without
+        centroid_scores every row is scanned."""
+        indexed = 0
+        if centroid_scores is not None:
+            indexed = self._meta["indexed_rows"]
+            offsets, list_rows = self._ivf["offsets"], self._ivf["rows"]
+            nprobe = min(nprobe, len(offsets) - 1)
+            probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+            for list_id in np.unique(probes):
+                members = list_rows[offsets[list_id] : offsets[list_id + 1]]
+                if len(members):
+                    yield np.flatnonzero((probes == list_id).any(axis=1)), members
+        queries = np.arange(query_count)
+        rows = self._meta["rows"]
+        for start in range(indexed, rows, SCAN_CHUNK_ROWS):
+            yield queries, np.arange(start, min(rows, start + SCAN_CHUNK_ROWS))
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        model: str,
+        k: int = 10,
+        nprobe: Optional[int] = None,
+        per_segment: int = 20,
+        exclude: Iterable[str] = (),
+        exact: bool = False,
+        matches_per_document: int = 3,
+    ) -> List[Dict]:
+        """Corpus documents most similar to a set of query segment embeddings.
+
+        A document's score is the mean over query segments of the best
+        cosine similarity among its segments, as in /compare, counting
+        only each query segment's per_segment nearest rows found in the
+        probed lists. exact=True scans every row instead.
+        """
+        queries = normalize(embeddings)
+        with self._lock:
+            self._reload()
+            meta, documents = self._meta, self._documents
+            vectors, row_docs, ivf = self._vectors, self._row_docs, self._ivf
+            if not meta.get("rows") or not len(queries):
+                return []
+            if meta["model"] != model:
+                raise ValueError(
+                    f"Vector index holds {meta['model']} embeddings, not {model}"
+                )
+            self.searches += 1
+            excluded = {self._doc_ids[f] for f in exclude if f in self._doc_ids}
+            centroid_scores = None
+            if ivf is not None and not exact:
+                centroid_scores = queries @ ivf["centroids"].T
+            blocks = list(
+                self._candidate_blocks(
+                    centroid_scores, len(queries), nprobe or self.nprobe
+                )
+            )
+
+        hit_queries, hit_rows, hit_scores = [], [], []
+        for query_ids, rows in blocks:
+            scores = queries[query_ids] @ np.asarray(vectors[rows], np.float32).T
+            keep = min(per_segment, len(rows))
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            hit_queries.append(np.repeat(query_ids, keep))
+            hit_rows.append(rows[top].ravel())
+            hit_scores.append(np.take_along_axis(scores, top, axis=1).ravel())
+
+        hit_queries = np.concatenate(hit_queries)
+        hit_rows = np.concatenate(hit_rows)
+        hit_scores = np.concatenate(hit_scores)
+        hit_docs = np.asarray(row_docs[hit_rows], dtype=np.int64)
+        keep = ~np.isin(hit_docs, list(excluded))
+        # Each query segment's per_segment best hits over all blocks, so the
+        # result does not depend on how rows were split into blocks
+        order = np.lexsort((-hit_scores, hit_queries))
+        order = order[keep[order]]
+        sorted_queries = hit_queries[order]
+        group_starts = np.r_[0, np.flatnonzero(np.diff(sorted_queries)) + 1]
+        group_sizes = np.diff(np.r_[group_starts, len(order)])
+        ranks = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+        keep = order[ranks < per_segment]
+        hit_queries, hit_rows = hit_queries[keep], hit_rows[keep]
+        hit_scores, hit_docs = hit_scores[keep], hit_docs[keep]
+        if not len(hit_docs):
+            return []
+
+        # Best hit of every (document, query segment) pair
+        pair_keys = hit_docs * len(queries) + hit_queries
+        order = np.lexsort((-hit_scores, pair_keys))
+        first = order[np.r_[True, np.diff(pair_keys[order]) != 0]]
+        doc_scores = np.bincount(
+            hit_docs[first], weights=hit_scores[first], minlength=len(documents)
+        ) / len(queries)
+
+        top_docs = np.argsort(-doc_scores, kind="stable")[:k]
+        results = []
+        for doc_id in top_docs:
+            if doc_scores[doc_id] <= 0:
+                break
+            best = first[hit_docs[first] == doc_id]
+            best = best[np.argsort(-hit_scores[best], kind="stable")]
+            best = best[:matches_per_document]
+            document = documents[doc_id]
+            segments = self._segments(document)
+            results.append(
+                {
+                    "fingerprint": document["fingerprint"],
+                    "name": document["name"],
+                    "score": float(doc_scores[doc_id]),
+                    "matches": [
+                        {
+                            "query_segment": int(hit_queries[i]),
+                            "segment": segments[int(hit_rows[i]) - document["start"]],
+                            "similarity": float(hit_scores[i]),
+                        }
+                        for i in best
+                    ],
+                }
+            )
+        return results
+
+    def _segments(self, document: Dict) -> List[str]:
+        with open(self.segments_path, "rb") as file:
+            file.seek(document["offset"])
+            return json.loads(file.read(document["length"]))
+
+    def clear(self) -> None:
+        with self._lock, self._file_lock():
+            for path in (
+                self.meta_path,
+                self.vectors_path,
+                self.row_docs_path,
+                self.documents_path,
+                self.segments_path,
+            ):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._remove_stale_lists({})
+            self._reload()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._reload()
+            meta = dict(self._meta)
+        return {
+            "documents": meta.get("documents", 0),
+            "rows": meta.get("rows", 0),
+            "indexed_rows": meta.get("indexed_rows", 0),
+            "lists": meta.get("lists", 0),
+            "dim": meta.get("dim"),
+            "dtype": self.dtype.name,
+            "model": meta.get("model"),
+            "nprobe": self.nprobe,
+            "searches": self.searches,
+            "rebuilds": self.rebuilds,
+        }
+
+
+_shared_index: Optional[VectorIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_vector_index() -> VectorIndex:
+    """Process-wide vector index configured from Config"""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = VectorIndex(
+                index_dir=Config.VECTOR_INDEX_DIR or VECTOR_INDEX_DIR,
+                dtype=Config.VECTOR_INDEX_DTYPE,
+                nprobe=Config.VECTOR_INDEX_NPROBE,
+                min_train_rows=Config.VECTOR_INDEX_MIN_TRAIN_ROWS,
+            )
+        return _shared_index
+
+
+def embed_text(text: str, analyzer=None) -> Tuple[List[str], np.ndarray, str]:
+    """(segments, embeddings, model) of a document text, as /compare embeds it"""
+    from app.similarity.text_similarity import get_semantic_analyzer
+
+    analyzer = analyzer or get_semantic_analyzer()
+    segments = analyzer.preprocess_text(text)
+    if not segments:
+        return [], np.empty((0, 0), dtype=np.float32), analyzer.cache_namespace
+    embeddings = analyzer.get_embeddings_batched(segments)
+    return segments, embeddings, analyzer.cache_namespace
+
+
+def index_texts(items: List[Tuple[str, str, str]], analyzer=None) -> int:
+    """Add processed (fingerprint, name, text) documents to the corpus index
+    in one write; errors are logged, never raised"""
+    if not Config.VECTOR_INDEX_ENABLED:
+        return 0
+    try:
+        index = get_vector_index()
+        batch, model = [], None
+        for fingerprint, name, text in items:
+            if not text or fingerprint in index:
+                continue
+            segments, embeddings, model = embed_text(text, analyzer)
+            batch.append((fingerprint, name, segments, embeddings))
+        return index.add_documents(batch, model) if batch else 0
+    except Exception as e:
+        print(f"Error adding documents to the vector index: {str(e)}")
+        return 0
+
+
+def index_text(fingerprint: str, name: str, text: str, analyzer=None) -> bool:
+    return index_texts([(fingerprint, name, text)], analyzer) > 0
+
+
+def search_text(
+    text: str, k: int = 10, exclude: Iterable[str] = (), analyzer=None
+) -> List[Dict]:
+    """Corpus documents most similar to a document text, with matching segments"""
+    segments, embeddings, model = embed_text(text, analyzer)
+    if not segments:
+        return []
+    results = get_vector_index().search(embeddings, model, k=k, exclude=exclude)
+    for result in results:
+        for match in result["matches"]:
+            match["query_segment"] = segments[match["query_segment"]]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["stats", "add-cached", "rebuild"])
+    args = parser.parse_args()
+
+    index = get_vector_index()
+    if args.command == "add-cached":
+        from app.utils.cache_store import load_cached_texts
+
+        texts = load_cached_texts()
+        added = index_texts([(fp, fp, text) for fp, text in texts.items()])
+        print(f"Indexed {added} cached documents")
+    elif args.command == "rebuild":
+        index.rebuild()
+    print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
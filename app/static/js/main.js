@@ -2,6 +2,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const form = document.getElementById('upload-form');
     const results = document.getElementById('results');
     const reportLink = document.getElementById('report-link');
+    const progressStatus = document.getElementById('progress-status');
 
     // Add drag and drop functionality
     document.querySelectorAll('.upload-box').forEach((box, index) => {
@@ -52,63 +53,155 @@ document.addEventListener('DOMContentLoaded', () => {
 
         try {
             const formData = new FormData(form);
-            const response = await fetch('/compare', {
-                method: 'POST',
-                body: formData
-            });
-
-            if (!response.ok) {
-                const error = await response.json();
-                throw new Error(error.error || 'An error occurred');
-            }
+            const data = await runComparisonJob(formData);
+            renderResults(data);
+        } catch (error) {
+            console.error('Error:', error);
+            alert(error.message || 'An error occurred during analysis');
+        } finally {
+            // Reset button state
+            submitButton.textContent = originalButtonText;
+            submitButton.disabled = false;
+            progressStatus.style.display = 'none';
+        }
+    });
 
-            const data = await response.json();
+    function formatPercent(value) {
+        return `${(value * 100).toFixed(1)}%`;
+    }
 
-            // Update results
-            if (data.text_similarity !== undefined) {
-                document.getElementById('text-similarity').textContent =
-                    `${(data.text_similarity * 100).toFixed(1)}%`;
-            }
+    // Render a full result, or the partial one carried by a stage event
+    function renderResults(data, final = true) {
+        if (data.text_similarity !== undefined) {
+            document.getElementById('text-similarity').textContent =
+                formatPercent(data.text_similarity);
+        }
 
-            if (data.handwriting_similarity !== undefined) {
-                document.getElementById('handwriting-similarity').textContent =
-                    `${(data.handwriting_similarity * 100).toFixed(1)}%`;
-            }
+        if (data.handwriting_similarity !== undefined) {
+            document.getElementById('handwriting-similarity').textContent =
+                formatPercent(data.handwriting_similarity);
+        }
 
-            if (data.similarity_index !== undefined) {
-                document.getElementById('similarity-index').textContent =
-                    `${(data.similarity_index * 100).toFixed(1)}%`;
-            }
+        if (data.similarity_index !== undefined) {
+            document.getElementById('similarity-index').textContent =
+                formatPercent(data.similarity_index);
+        }
 
-            // Update variations
+        // Update variations
+        if (data.variations) {
             updateVariations('variations-doc1', data.variations.document1);
             updateVariations('variations-doc2', data.variations.document2);
+        }
 
-            // Update semantic consistency
+        // Update semantic consistency
+        if (data.text_consistency) {
             updateSemanticConsistency('semantics-doc1', data.text_consistency.doc1);
             updateSemanticConsistency('semantics-doc2', data.text_consistency.doc2);
+        }
 
-            // Update report link
-            if (data.report_url) {
-                reportLink.href = data.report_url;
-                reportLink.style.display = 'block';
-            }
+        // Update report link
+        if (data.report_url) {
+            reportLink.href = data.report_url;
+            reportLink.style.display = 'block';
+        }
 
-            // Show results
-            results.style.display = 'block';
+        // Show results
+        results.style.display = 'block';
 
-            // Scroll to results
+        // Scroll to results
+        if (final) {
             results.scrollIntoView({ behavior: 'smooth' });
+        }
+    }
 
-        } catch (error) {
-            console.error('Error:', error);
-            alert(error.message || 'An error occurred during analysis');
-        } finally {
-            // Reset button state
-            submitButton.textContent = originalButtonText;
-            submitButton.disabled = false;
+    function showProgress(message) {
+        progressStatus.textContent = message;
+        progressStatus.style.display = 'block';
+    }
+
+    const STAGE_LABELS = {
+        job: 'Starting',
+        fingerprinting: 'Fingerprinting',
+        rasterization: 'Rendering pages',
+        ocr: 'Reading text',
+        prefilter: 'Finding overlapping texts',
+        embedding: 'Comparing text',
+        handwriting: 'Comparing handwriting',
+        report: 'Writing report'
+    };
+
+    function describeEvent(event) {
+        const label = STAGE_LABELS[event.stage] || event.stage;
+        const documentLabel = event.document ? ` (document ${event.document})` : '';
+        if (event.status === 'page') {
+            return `${label}${documentLabel}: page ${event.page}`;
         }
-    });
+        return `${label}${documentLabel}: ${event.status}`;
+    }
+
+    // Submit the comparison as a background job, then follow its progress
+    async function runComparisonJob(formData) {
+        const response = await fetch('/jobs', {
+            method: 'POST',
+            body: formData
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'An error occurred');
+        }
+
+        const job = await response.json();
+        showProgress('Queued');
+        if (!window.EventSource) {
+            return pollJobResult(job);
+        }
+        return followJobEvents(job);
+    }
+
+    // Stage events as they happen; partial results are shown right away
+    function followJobEvents(job) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(job.events_url);
+            const onStage = (message) => {
+                const event = JSON.parse(message.data);
+                showProgress(describeEvent(event));
+                if (event.status === 'completed') {
+                    renderResults(event, false);
+                }
+            };
+            Object.keys(STAGE_LABELS).forEach(stage => {
+                source.addEventListener(stage, onStage);
+            });
+            source.addEventListener('result', (message) => {
+                source.close();
+                resolve(JSON.parse(message.data));
+            });
+            source.addEventListener('error', (message) => {
+                // A bare error event is a dropped connection; EventSource
+                // reconnects and resumes after the last event it saw
+                if (!message.data) return;
+                source.close();
+                reject(new Error(JSON.parse(message.data).error || 'An error occurred'));
+            });
+        });
+    }
+
+    // Fallback for browsers without EventSource
+    async function pollJobResult(job) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const result = await fetch(job.result_url);
+            // 409 means the job is still queued or running
+            if (result.status === 409) continue;
+
+            const data = await result.json();
+            if (!result.ok) {
+                throw new Error(data.error || 'An error occurred');
+            }
+            return data;
+        }
+    }
 
     // Function to update variations display
     function updateVariations(elementId, variations) {
@@ -0,0 +1,296 @@
+"""Compare N documents at once: all-pairs similarity matrices and ranked pairs.
+
+Usage: python -m app.utils.batch_comparison a.pdf b.pdf c.pdf [--top 20]
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from app.similarity.handwriting_similarity import (
+    get_document_artifacts,
+    handwriting_similarity_matrix,
+)
+from app.similarity.minhash import candidate_pairs, document_signature
+from app.similarity.text_similarity import get_semantic_analyzer
+from app.similarity.vector_index import index_texts
+from app.utils.comparison import report_progress
+from app.utils.document import PDFDocument
+from app.utils.pdf_processor import extract_text_from_pdf
+
+
+def ingest_document(document: PDFDocument) -> Dict:
+    """Text and handwriting features of one document, OCR'd once"""
+    text = extract_text_from_pdf(document)
+    artifacts = get_document_artifacts(document)
+    return {"text": text, "table": artifacts["table"]}
+
+
+def ingest_documents(
+    documents: List[PDFDocument],
+    max_workers: int = 4,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> List[Dict]:
+    """ingest_document for every document, several at a time.
+
+    Threads share this process's OCR engine, so pages of all documents are
+    batched and rate limited together. A document that fails gets an
+    "error" entry instead of stopping the batch.
+    """
+
+    def ingest(index: int) -> Dict:
+        document = documents[index]
+        try:
+            entry = ingest_document(document)
+            if not entry["text"]:
+                entry["error"] = "Could not extract text"
+        except Exception as e:
+            print(f"Error ingesting {document.file_path}: {str(e)}")
+            entry = {"text": "", "table": None, "error": str(e)}
+        finally:
+            document.release_images()
+        report_progress(
+            progress,
+            "ocr",
+            "completed",
+            document=index + 1,
+            characters=len(entry["text"]),
+            error=entry.get("error"),
+        )
+        return entry
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(ingest, range(len(documents))))
+
+
+def text_similarity_matrix(
+    texts: List[str], analyzer=None, candidates: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """[i, j] is the /compare text similarity of texts i and j.
+
+    That is the mean over segments of i of their best cosine match among
+    the segments of j. Every distinct segment of every text is embedded in
+    one batched call, and each row is one matrix product reduced per
+    document with np.maximum.reduceat. Texts without segments get NaN rows
+    and columns. With a boolean candidates matrix only those entries are
+    computed, and only texts in some candidate pair are embedded; the rest
+    stay NaN.
+    """
+    analyzer = analyzer or get_semantic_analyzer()
+    count = len(texts)
+    matrix = np.full((count, count), np.nan)
+    if candidates is not None:
+        # A text with no candidates besides itself is never embedded
+        candidates = candidates & ~np.eye(count, dtype=bool)
+        candidates |= np.diag(candidates.any(axis=1))
+    segment_lists = [
+        analyzer.preprocess_text(text)
+        if text and (candidates is None or candidates[i].any())
+        else []
+        for i, text in enumerate(texts)
+    ]
+
+    present = [i for i, segments in enumerate(segment_lists) if segments]
+    if not present:
+        return matrix
+
+    # Segments shared between documents are embedded once
+    unique = list(dict.fromkeys(s for i in present for s in segment_lists[i]))
+    position = {segment: row for row, segment in enumerate(unique)}
+    embeddings = analyzer.get_embeddings_batched(unique)
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    rows = [np.array([position[s] for s in segment_lists[i]]) for i in present]
+    if candidates is None:
+        stacked = embeddings[np.concatenate(rows)]
+        sizes = np.array([len(r) for r in rows])
+        starts = np.r_[0, np.cumsum(sizes)[:-1]]
+
+        for i, start, size in zip(present, starts, sizes):
+            similarities = stacked[start : start + size] @ stacked.T
+            best = np.maximum.reduceat(similarities, starts, axis=1)
+            matrix[i, present] = best.mean(axis=0)
+        return matrix
+
+    # Only each row's candidate columns are stacked and scored
+    rows = dict(zip(present, rows))
+    for i in present:
+        columns = [j for j in present if candidates[i, j]]
+        sizes = np.array([len(rows[j]) for j in columns])
+        starts = np.r_[0, np.cumsum(sizes)[:-1]]
+        stacked = embeddings[np.concatenate([rows[j] for j in columns])]
+        similarities = embeddings[rows[i]] @ stacked.T
+        best = np.maximum.reduceat(similarities, starts, axis=1)
+        matrix[i, columns] = best.mean(axis=0)
+    return matrix
+
+
+def lexical_candidates(
+    signatures: List[Optional[np.ndarray]], threshold: float
+) -> Tuple[np.ndarray, Dict[Tuple[int, int], float]]:
+    """Symmetric boolean matrix of the pairs worth a semantic comparison:
+    those whose MinHash signatures estimate a word-shingle Jaccard
+    similarity of at least threshold, found by LSH banding. Also returns
+    the {(i, j): estimate} of those pairs."""
+    pairs = candidate_pairs(signatures, threshold)
+    candidates = np.eye(len(signatures), dtype=bool)
+    for i, j in pairs:
+        candidates[i, j] = candidates[j, i] = True
+    return candidates, pairs
+
+
+def ranked_pairs(
+    names: List[str],
+    text_matrix: np.ndarray,
+    handwriting_matrix: np.ndarray,
+    weight_text: float = 0.5,
+) -> List[Dict]:
+    """Every unordered pair with both scores, most similar first.
+
+    Pairs the lexical pre-filter kept out of the text comparison are still
+    ranked, with text_compared False and their text similarity counted as 0,
+    so they never outrank a compared pair with the same handwriting score.
+    """
+    text_compared = ~np.isnan(text_matrix)
+    index_matrix = (
+        weight_text * np.where(text_compared, text_matrix, 0.0)
+        + (1 - weight_text) * handwriting_matrix
+    )
+    first, second = np.triu_indices(len(names), k=1)
+    scores = index_matrix[first, second]
+    keep = ~np.isnan(scores)
+    first, second, scores = first[keep], second[keep], scores[keep]
+
+    pairs = []
+    for order in np.argsort(-scores, kind="stable"):
+        i, j = int(first[order]), int(second[order])
+        compared = bool(text_compared[i, j])
+        pairs.append(
+            {
+                "document1": names[i],
+                "document2": names[j],
+                "text_similarity": float(text_matrix[i, j]) if compared else None,
+                "text_compared": compared,
+                "handwriting_similarity": float(handwriting_matrix[i, j]),
+                "similarity_index": float(scores[order]),
+            }
+        )
+    return pairs
+
+
+def matrix_to_json(matrix: np.ndarray) -> List[List[Optional[float]]]:
+    return [[None if np.isnan(v) else float(v) for v in row] for row in matrix]
+
+
+def compare_batch(
+    documents: List[PDFDocument],
+    names: Optional[List[str]] = None,
+    weight_text: float = 0.5,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """All-pairs text and handwriting similarity of documents.
+
+    Each document is OCR'd, embedded and feature-extracted exactly once;
+    the N x N matrices then come from vectorized math over those results.
+    Row i, column j of text_similarity equals /compare with document i as
+    file1. pairs lists every pair by similarity_index, highest first.
+    Every document's text is added to the corpus vector index.
+
+    With LEXICAL_PREFILTER_ENABLED, text similarity is only computed for
+    pairs whose MinHash Jaccard estimate reaches MINHASH_THRESHOLD; the
+    others get null text similarity, counted as 0 in similarity_index.
+    """
+    names = names or [os.path.basename(d.file_path) for d in documents]
+    entries = ingest_documents(documents, Config.BATCH_WORKERS, progress)
+    texts = [entry["text"] for entry in entries]
+
+    candidates = None
+    prefilter = {"enabled": Config.LEXICAL_PREFILTER_ENABLED}
+    if Config.LEXICAL_PREFILTER_ENABLED:
+        report_progress(progress, "prefilter", "started")
+        signatures = [
+            document_signature(document.fingerprint, text) if text else None
+            for document, text in zip(documents, texts)
+        ]
+        candidates, estimates = lexical_candidates(
+            signatures, Config.MINHASH_THRESHOLD
+        )
+        prefilter.update(
+            threshold=Config.MINHASH_THRESHOLD,
+            candidate_pairs=len(estimates),
+            total_pairs=len(documents) * (len(documents) - 1) // 2,
+        )
+        report_progress(progress, "prefilter", "completed", **prefilter)
+
+    report_progress(progress, "embedding", "started")
+    text_matrix = text_similarity_matrix(texts, candidates=candidates)
+    index_texts(
+        [
+            (document.fingerprint, name, entry["text"])
+            for name, document, entry in zip(names, documents, entries)
+            if not entry.get("error")
+        ]
+    )
+    report_progress(progress, "embedding", "completed")
+
+    report_progress(progress, "handwriting", "started")
+    failed = [i for i, entry in enumerate(entries) if entry.get("error")]
+    handwriting_matrix = handwriting_similarity_matrix(
+        [entry["table"] for entry in entries]
+    )
+    for matrix in (text_matrix, handwriting_matrix):
+        matrix[failed, :] = np.nan
+        matrix[:, failed] = np.nan
+    report_progress(progress, "handwriting", "completed")
+
+    return {
+        "documents": [
+            {
+                "name": name,
+                "fingerprint": document.fingerprint,
+                "error": entry.get("error"),
+            }
+            for name, document, entry in zip(names, documents, entries)
+        ],
+        "text_similarity": matrix_to_json(text_matrix),
+        "handwriting_similarity": matrix_to_json(handwriting_matrix),
+        "pairs": ranked_pairs(names, text_matrix, handwriting_matrix, weight_text),
+        "prefilter": prefilter,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--weight-text", type=float, default=0.5)
+    parser.add_argument("--top", type=int, default=20, help="pairs to print")
+    parser.add_argument("--output", help="write the full result as JSON here")
+    args = parser.parse_args()
+
+    result = compare_batch(
+        [PDFDocument(path, keep_images=False) for path in args.files],
+        names=args.files,
+        weight_text=args.weight_text,
+    )
+    for document in result["documents"]:
+        if document["error"]:
+            print(f"Skipped {document['name']}: {document['error']}")
+    for pair in result["pairs"][: args.top]:
+        # Pairs the lexical pre-filter skipped have no text score
+        text = f"{pair['text_similarity']:.3f}" if pair["text_compared"] else "-"
+        print(
+            f"{pair['similarity_index']:.3f}  text {text}  "
+            f"handwriting {pair['handwriting_similarity']:.3f}  "
+            f"{pair['document1']}  {pair['document2']}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
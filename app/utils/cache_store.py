@@ -0,0 +1,403 @@
+"""Shared on-disk result cache.
+
+Usage: python -m app.utils.cache_store {stats,migrate} [--remove-legacy]
+"""
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cached_data"
+)
+STORE_DIR = os.path.join(CACHE_DIR, "store")
+# Where each namespace used to keep one pretty-printed JSON file per key
+LEGACY_DIRS = {
+    "text": CACHE_DIR,
+    "handwriting": CACHE_DIR,
+    "pages": os.path.join(CACHE_DIR, "pages"),
+}
+# Re-measure the directory after this many writes even when under budget,
+# since other workers write to it too
+SWEEP_EVERY = 64
+# Evict down to this fraction of the budget so sweeps are not back to back
+LOW_WATERMARK = 0.9
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def to_native(obj):
+    """json.dumps default= hook for numpy scalars and arrays"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class CacheStore:
+    """Size-bounded key/value store for JSON-serializable results.
+
+    Each entry is one compact (optionally gzipped) JSON file under
+    cache_dir/<namespace>/, written to a temporary file and renamed into
+    place so readers in other gunicorn workers never see a partial entry.
+    Reads refresh the file's mtime; when the directory grows past max_bytes
+    a sweep, serialized across processes by a file lock, deletes the least
+    recently used entries. Entries older than ttl_seconds count as misses.
+    Keys missing from the store are looked up in the legacy per-file JSON
+    caches and imported on first use.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = STORE_DIR,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl_seconds: float = 0,
+        compress: bool = True,
+        legacy_dirs: Optional[Dict[str, str]] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.compress = compress
+        self.legacy_dirs = LEGACY_DIRS if legacy_dirs is None else legacy_dirs
+        self.lock_path = os.path.join(cache_dir, ".lock")
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None
+        self._writes_since_sweep = 0
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expired": 0,
+            "migrated": 0,
+        }
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _record(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self._counters[name] += value
+
+    def _path(self, namespace: str, key: str, compressed: bool) -> str:
+        suffix = ".json.gz" if compressed else ".json"
+        return os.path.join(self.cache_dir, namespace, f"{key}{suffix}")
+
+    def _encode(self, value) -> bytes:
+        data = json.dumps(
+            {"created": time.time(), "value": value},
+            separators=(",", ":"),
+            default=to_native,
+        ).encode("utf-8")
+        return gzip.compress(data, compresslevel=6, mtime=0) if self.compress else data
+
+    @staticmethod
+    def _decode(data: bytes) -> Dict:
+        if data[:2] == GZIP_MAGIC:
+            data = gzip.decompress(data)
+        return json.loads(data)
+
+    def _read(self, namespace: str, key: str, touch: bool = True):
+        # Try the current format first; entries written before a
+        # CACHE_COMPRESS change stay readable
+        for compressed in (self.compress, not self.compress):
+            path = self._path(namespace, key, compressed)
+            try:
+                with open(path, "rb") as file:
+                    envelope = self._decode(file.read())
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                print(f"Error reading cache entry {namespace}/{key}: {str(e)}")
+                continue
+
+            age = time.time() - envelope["created"]
+            if self.ttl_seconds and age > self.ttl_seconds:
+                self._record(expired=1)
+                self._remove(path)
+                return None
+            if touch:
+                try:
+                    os.utime(path)  # mark as recently used
+                except OSError:
+                    pass
+            return envelope
+        return None
+
+    def get(self, namespace: str, key: str):
+        """Cached value, or None on a miss"""
+        envelope = self._read(namespace, key)
+        if envelope is not None:
+            self._record(hits=1)
+            return envelope["value"]
+
+        value = self._load_legacy(namespace, key)
+        if value is not None:
+            self._record(hits=1, migrated=1)
+            self.set(namespace, key, value)
+            return value
+
+        self._record(misses=1)
+        return None
+
+    def _load_legacy(self, namespace: str, key: str):
+        legacy_dir = self.legacy_dirs.get(namespace)
+        if not legacy_dir:
+            return None
+        try:
+            with open(
+                os.path.join(legacy_dir, f"{key}.json"), "r", encoding="utf-8"
+            ) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading legacy cache file {key}.json: {str(e)}")
+            return None
+
+    def set(self, namespace: str, key: str, value) -> None:
+        """Store value atomically; failures are logged, never raised"""
+        path = self._path(namespace, key, self.compress)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            data = self._encode(value)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error saving cache entry {namespace}/{key}: {str(e)}")
+            self._remove(tmp_path)
+            return
+        # Drop a copy left in the other format
+        self._remove(self._path(namespace, key, not self.compress))
+
+        with self._lock:
+            self._counters["writes"] += 1
+            self._writes_since_sweep += 1
+            if self._bytes is not None:
+                self._bytes += len(data)
+            needs_sweep = (
+                self._bytes is None
+                or self._bytes > self.max_bytes
+                or self._writes_since_sweep >= SWEEP_EVERY
+            )
+        if needs_sweep:
+            self.sweep()
+
+    def delete(self, namespace: str, key: str) -> None:
+        for compressed in (True, False):
+            self._remove(self._path(namespace, key, compressed))
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def _scan(self) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """(namespace, path, stat) of every entry"""
+        for namespace in os.listdir(self.cache_dir):
+            namespace_dir = os.path.join(self.cache_dir, namespace)
+            if not os.path.isdir(namespace_dir):
+                continue
+            for entry in os.scandir(namespace_dir):
+                if entry.name.endswith((".json", ".json.gz")):
+                    try:
+                        yield namespace, entry.path, entry.stat()
+                    except FileNotFoundError:
+                        continue
+
+    def sweep(self) -> None:
+        """Delete expired entries, then least recently used ones over budget"""
+        with self._file_lock():
+            now = time.time()
+            entries = []
+            expired = 0
+            for _, path, stat in self._scan():
+                # mtime >= creation time, so an idle entry past the TTL is
+                # certainly expired
+                if self.ttl_seconds and now - stat.st_mtime > self.ttl_seconds:
+                    expired += self._remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * LOW_WATERMARK
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    if self._remove(path):
+                        total -= size
+                        evicted += 1
+
+        with self._lock:
+            self._bytes = total
+            self._writes_since_sweep = 0
+            self._counters["evictions"] += evicted
+            self._counters["expired"] += expired
+        if evicted:
+            print(f"Cache store evicted {evicted} entries, {total} bytes remain")
+
+    def items(self, namespace: str) -> Iterator[Tuple[str, object]]:
+        """(key, value) of every live entry in a namespace"""
+        namespace_dir = os.path.join(self.cache_dir, namespace)
+        if not os.path.isdir(namespace_dir):
+            return
+        for filename in sorted(os.listdir(namespace_dir)):
+            for suffix in (".json.gz", ".json"):
+                if filename.endswith(suffix):
+                    key = filename[: -len(suffix)]
+                    envelope = self._read(namespace, key, touch=False)
+                    if envelope is not None:
+                        yield key, envelope["value"]
+                    break
+
+    def clear(self) -> None:
+        with self._file_lock():
+            for _, path, _ in list(self._scan()):
+                self._remove(path)
+        with self._lock:
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        namespaces: Dict[str, Dict[str, int]] = {}
+        for namespace, _, stat in self._scan():
+            usage = namespaces.setdefault(namespace, {"entries": 0, "bytes": 0})
+            usage["entries"] += 1
+            usage["bytes"] += stat.st_size
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(
+            {
+                "entries": sum(usage["entries"] for usage in namespaces.values()),
+                "bytes": sum(usage["bytes"] for usage in namespaces.values()),
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "compress": self.compress,
+                "hit_ratio": stats["hits"] / lookups if lookups else 0.0,
+                "namespaces": namespaces,
+            }
+        )
+        return stats
+
+
+_shared_store: Optional[CacheStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_cache_store() -> CacheStore:
+    """Process-wide cache store configured from Config"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = CacheStore(
+                cache_dir=Config.CACHE_STORE_DIR or STORE_DIR,
+                max_bytes=Config.CACHE_MAX_MB * 1024 * 1024,
+                ttl_seconds=Config.CACHE_TTL_SECONDS,
+                compress=Config.CACHE_COMPRESS,
+            )
+        return _shared_store
+
+
+def legacy_namespace(value) -> Optional[str]:
+    """Which store namespace a legacy cached_data/*.json file belongs to"""
+    if isinstance(value, str):
+        return "text"
+    if isinstance(value, dict) and "similarity" in value:
+        return "handwriting"
+    return None
+
+
+def load_cached_texts(store: Optional[CacheStore] = None) -> Dict[str, str]:
+    """Extracted document texts keyed by file hash, legacy files included"""
+    texts = {}
+    for filename in sorted(os.listdir(CACHE_DIR)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(CACHE_DIR, filename), "r", encoding="utf-8") as file:
+                value = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if isinstance(value, str):
+            texts[filename[: -len(".json")]] = value
+    for key, value in (store or get_cache_store()).items("text"):
+        if isinstance(value, str):
+            texts[key] = value
+    return {key: text for key, text in texts.items() if text.strip()}
+
+
+def migrate_legacy(store: CacheStore, remove: bool = False) -> Dict[str, int]:
+    """Import every legacy JSON cache file into the store"""
+    counts = {"migrated": 0, "skipped": 0, "failed": 0}
+    sources = [(CACHE_DIR, None), (LEGACY_DIRS["pages"], "pages")]
+    for legacy_dir, namespace in sources:
+        if not os.path.isdir(legacy_dir):
+            continue
+        for filename in sorted(os.listdir(legacy_dir)):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(legacy_dir, filename)
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    value = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable {path}: {str(e)}")
+                counts["failed"] += 1
+                continue
+            target = namespace or legacy_namespace(value)
+            if target is None:
+                counts["skipped"] += 1
+                continue
+            store.set(target, filename[: -len(".json")], value)
+            counts["migrated"] += 1
+            if remove:
+                os.remove(path)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["stats", "migrate"])
+    parser.add_argument(
+        "--remove-legacy",
+        action="store_true",
+        help="delete legacy JSON files once imported",
+    )
+    args = parser.parse_args()
+
+    store = get_cache_store()
+    if args.command == "migrate":
+        print("Migrated:", migrate_legacy(store, remove=args.remove_legacy))
+    print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
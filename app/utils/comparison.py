@@ -0,0 +1,180 @@
+import os
+from typing import Callable, Dict, List, Optional
+
+from app.similarity.handwriting_similarity import compute_handwriting_similarity
+from app.similarity.text_similarity import compute_text_similarity
+from app.similarity.vector_index import index_texts
+from app.utils.document import PDFDocument
+from app.utils.pdf_processor import extract_text_from_pdf, validate_pdf
+from app.utils.report_generator import generate_report
+
+
+class ComparisonError(Exception):
+    """A comparison that cannot run, with the HTTP status to report"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def report_progress(
+    progress: Optional[Callable[[Dict], None]], stage: str, status: str, **data
+) -> None:
+    """Send one stage event to a progress callback, if there is one"""
+    if progress is None:
+        return
+    try:
+        progress({"stage": stage, "status": status, **data})
+    except Exception as e:
+        print(f"Error reporting {stage} progress: {str(e)}")
+
+
+def validate_documents(*documents: PDFDocument) -> None:
+    """Cheap checks done before any rendering or OCR"""
+    paths = [document.file_path for document in documents]
+    if not all(os.path.exists(path) for path in paths):
+        raise ComparisonError("Error saving files", 500)
+
+    if any(os.path.getsize(path) == 0 for path in paths):
+        raise ComparisonError("One or both files are empty")
+
+    if not all(validate_pdf(path) for path in paths):
+        raise ComparisonError("Invalid or corrupted PDF file(s)")
+
+
+def run_comparison(
+    document1: PDFDocument,
+    document2: PDFDocument,
+    weight_text: float = 0.5,
+    progress: Optional[Callable[[Dict], None]] = None,
+    names: Optional[List[str]] = None,
+) -> Dict:
+    """The full /compare pipeline: text, handwriting and the PDF report.
+
+    Returns the JSON response body. progress, if given, receives an event
+    dict as each stage (fingerprinting, rasterization, ocr, embedding,
+    handwriting, report) starts and finishes, plus one per rendered and
+    OCR'd page. Partial results ride on the "completed" events, so text
+    similarity is known before the handwriting stage starts. The
+    documents' page images are released once the report has been written.
+    Both texts are added to the corpus vector index under names (the
+    uploaded filenames), reusing the embeddings just computed.
+    """
+    documents = (document1, document2)
+    for index, document in enumerate(documents, 1):
+        if progress is not None:
+            document.progress = lambda event, index=index: progress(
+                {**event, "document": index}
+            )
+        report_progress(
+            progress,
+            "fingerprinting",
+            "completed",
+            document=index,
+            fingerprint=document.fingerprint,
+        )
+
+    try:
+        texts = []
+        for index, document in enumerate(documents, 1):
+            report_progress(progress, "ocr", "started", document=index)
+            texts.append(extract_text_from_pdf(document))
+            report_progress(
+                progress, "ocr", "completed", document=index, characters=len(texts[-1])
+            )
+        text1, text2 = texts
+
+        if not text1 or not text2:
+            raise ComparisonError("Could not extract text from one or both files")
+        print(f"Extracted text from {document1.file_path} and {document2.file_path}")
+        print("Starting text similarity computation")
+        report_progress(progress, "embedding", "started")
+        text_analysis = compute_text_similarity(text1, text2)
+        print("Ending text similarity computation")
+        text_similarity = text_analysis["similarity_score"]
+        report_progress(
+            progress,
+            "embedding",
+            "completed",
+            text_similarity=text_similarity,
+            text_consistency=text_analysis["consistency_analysis"],
+        )
+        names = names or [os.path.basename(d.file_path) for d in documents]
+        index_texts(
+            [
+                (document.fingerprint, name, text)
+                for document, name, text in zip(documents, names, texts)
+            ]
+        )
+
+        report_progress(progress, "handwriting", "started")
+        (
+            handwriting_similarity,
+            feature_scores,
+            anomalies1,
+            anomalies2,
+            variations1,
+            variations2,
+            images1,
+            images2,
+            features1,
+            features2,
+            text_similarities,
+            handwriting_similarities,
+        ) = compute_handwriting_similarity(document1, document2)
+
+        weight_handwriting = 1 - weight_text
+        similarity_index = (
+            weight_text * text_similarity + weight_handwriting * handwriting_similarity
+        )
+        anomalies = {"document1": anomalies1, "document2": anomalies2}
+        variations = {"document1": variations1, "document2": variations2}
+        report_progress(
+            progress,
+            "handwriting",
+            "completed",
+            handwriting_similarity=handwriting_similarity,
+            similarity_index=similarity_index,
+            feature_scores=feature_scores,
+            anomalies=anomalies,
+            variations=variations,
+        )
+
+        print("Starting report generation")
+        report_progress(progress, "report", "started")
+        report_path = generate_report(
+            text_similarity,
+            handwriting_similarity,
+            similarity_index,
+            text1,
+            text2,
+            feature_scores,
+            anomalies1,
+            anomalies2,
+            variations1,
+            variations2,
+            images1,
+            images2,
+            features1,
+            features2,
+            text_similarities,
+            handwriting_similarities,
+        )
+        # The report was the last consumer of the page images
+        del images1, images2
+        print("Ending report generation")
+        report_progress(progress, "report", "completed", report_url=report_path)
+        return {
+            "text_similarity": text_similarity,
+            "text_consistency": text_analysis["consistency_analysis"],
+            "handwriting_similarity": handwriting_similarity,
+            "similarity_index": similarity_index,
+            "feature_scores": feature_scores,
+            "anomalies": anomalies,
+            "variations": variations,
+            "report_url": report_path,
+        }
+    finally:
+        for document in documents:
+            document.progress = None
+            document.release_images()
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+
+# Uploads and files are hashed in chunks of this size, never read whole
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+
+def file_fingerprint(file_path: str) -> str:
+    """md5 of a file's content, read in chunks"""
+    digest = hashlib.md5()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(FINGERPRINT_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_stream(stream: BinaryIO, file_path: str) -> str:
+    """Copy an upload stream to disk, returning the md5 of what was written"""
+    digest = hashlib.md5()
+    with open(file_path, "wb") as file:
+        while chunk := stream.read(FINGERPRINT_CHUNK_SIZE):
+            digest.update(chunk)
+            file.write(chunk)
+    return digest.hexdigest()
+
+
+class PDFDocument:
+    """One uploaded PDF for the lifetime of a request.
+
+    The file is rasterized and OCR'd at most once; text extraction,
+    handwriting feature extraction and report generation all read the same
+    page images and annotations. The images are dropped again with
+    release_images() once the last consumer is done. If progress is set it
+    is called with an event dict as pages are rendered and OCR'd.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        fingerprint: Optional[str] = None,
+        keep_images: bool = True,
+    ):
+        self.file_path = file_path
+        self._fingerprint = fingerprint
+        # Callers that never need page images (text-only extraction) can let
+        # each page go as soon as it has been OCR'd
+        self.keep_images = keep_images
+        self._images: Optional[List] = None
+        self._annotations: Optional[List[Optional[Dict]]] = None
+        self._lock = threading.Lock()
+        self._ocr_lock = threading.Lock()
+        self.progress: Optional[Callable[[Dict], None]] = None
+
+    def _report(self, stage: str, status: str, **data) -> None:
+        if self.progress is not None:
+            try:
+                self.progress({"stage": stage, "status": status, **data})
+            except Exception as e:
+                print(f"Error reporting progress for {self.file_path}: {str(e)}")
+
+    @classmethod
+    def from_upload(cls, upload, file_path: str, **kwargs) -> "PDFDocument":
+        """Save an uploaded file, fingerprinting it while it streams to disk"""
+        fingerprint = save_stream(upload.stream, file_path)
+        return cls(file_path, fingerprint=fingerprint, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"PDFDocument({self.file_path!r})"
+
+    def __enter__(self) -> "PDFDocument":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release_images()
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash used as the cache key for this document"""
+        if self._fingerprint is None:
+            self._fingerprint = file_fingerprint(self.file_path)
+        return self._fingerprint
+
+    @property
+    def images(self) -> List:
+        """Page images, rendered on first access and shared afterwards"""
+        with self._lock:
+            if self._images is None:
+                from app.utils.pdf_processor import convert_pdf_to_images
+
+                self._images = convert_pdf_to_images(self.file_path)
+                print(f"Rasterized {len(self._images)} pages of {self.file_path}")
+                self._report("rasterization", "completed", pages=len(self._images))
+            return self._images
+
+    @property
+    def annotations(self) -> List[Optional[Dict]]:
+        """Raw Vision fullTextAnnotation per page, fetched once per document.
+
+        Both the plain text and the handwriting features are derived from
+        these, so each page goes to the OCR service a single time.
+        """
+        with self._ocr_lock:
+            if self._annotations is None:
+                from app.utils.ocr import annotate_pages
+
+                on_page = self._report_page
+                if self.is_rasterized:
+                    self._annotations = annotate_pages(self._images, on_page=on_page)
+                else:
+                    # Overlap rendering with OCR instead of rendering everything
+                    # first; keep the rendered pages for later consumers
+                    rendered = []
+                    self._annotations = annotate_pages(
+                        self._stream_pages(rendered), on_page=on_page
+                    )
+                    if self.keep_images:
+                        with self._lock:
+                            if self._images is None:
+                                self._images = rendered
+            return self._annotations
+
+    def _report_page(self, page_num: int, annotation: Optional[Dict]) -> None:
+        self._report("ocr", "page", page=page_num + 1, ok=annotation is not None)
+
+    def _stream_pages(self, rendered: List) -> Iterator:
+        from app.utils.pdf_processor import iter_pdf_pages
+
+        page_count = 0
+        for image in iter_pdf_pages(self.file_path):
+            if self.keep_images:
+                rendered.append(image)
+            page_count += 1
+            self._report("rasterization", "page", page=page_count)
+            yield image
+        self._report("rasterization", "completed", pages=page_count)
+
+    @property
+    def is_rasterized(self) -> bool:
+        return self._images is not None
+
+    def release_images(self) -> None:
+        """Drop the page images so their memory can be reclaimed"""
+        with self._lock:
+            if self._images is not None:
+                for image in self._images:
+                    image.close()
+            self._images = None
+
+
+def as_document(
+    document: Union[str, PDFDocument], keep_images: bool = True
+) -> PDFDocument:
+    """Accept either a file path or an existing PDFDocument"""
+    if isinstance(document, PDFDocument):
+        return document
+    return PDFDocument(document, keep_images=keep_images)
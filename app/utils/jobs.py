@@ -0,0 +1,421 @@
+"""Background comparison jobs with state persisted on local disk.
+
+Usage: python -m app.utils.jobs {list,prune}
+"""
+import argparse
+import fcntl
+import functools
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+from app.utils.cache_store import CACHE_DIR, to_native
+
+JOBS_DIR = os.path.join(CACHE_DIR, "jobs")
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+PAIR, BATCH = "pair", "batch"
+FINISHED = (COMPLETED, FAILED)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """One JSON file per job under jobs_dir, plus a directory of its inputs.
+
+    State files are replaced atomically, so every gunicorn worker can
+    answer status requests for jobs another worker is running. A job is
+    claimed by holding an flock on its .lock file; the kernel releases it
+    when the owning process dies, so a crashed job can be picked up again.
+    """
+
+    def __init__(self, jobs_dir: str = JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        # Job ids come from URLs; never let one leave jobs_dir
+        if not job_id or os.path.basename(job_id) != job_id:
+            raise KeyError(job_id)
+        return os.path.join(self.jobs_dir, f"{job_id}{suffix}")
+
+    def input_dir(self, job_id: str) -> str:
+        return self._path(job_id, "")
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (KeyError, FileNotFoundError):
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading job {job_id}: {str(e)}")
+            return None
+
+    def save(self, job: Dict) -> None:
+        path = self._path(job["id"])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(job, file, default=to_native)
+        os.replace(tmp_path, path)
+
+    def update(self, job_id: str, **fields) -> Dict:
+        job = self.get(job_id) or {"id": job_id}
+        job.update(fields)
+        self.save(job)
+        return job
+
+    def jobs(self) -> Iterator[Dict]:
+        for filename in sorted(os.listdir(self.jobs_dir)):
+            if filename.endswith(".json"):
+                job = self.get(filename[: -len(".json")])
+                if job is not None:
+                    yield job
+
+    @contextmanager
+    def claim(self, job_id: str):
+        """Yield True if this thread now owns the job, False if another does"""
+        with open(self._path(job_id, ".lock"), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append_event(self, job_id: str, event: Dict) -> None:
+        """Add one progress event to the job's append-only event log"""
+        line = json.dumps({"time": time.time(), **event}, default=to_native)
+        with open(self._path(job_id, ".events"), "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+    def events(self, job_id: str, start: int = 0) -> List[Dict]:
+        """Complete events from index start on; a line still being written
+        is left for the next read"""
+        try:
+            with open(self._path(job_id, ".events"), "r", encoding="utf-8") as file:
+                lines = file.read().split("\n")
+        except (KeyError, FileNotFoundError):
+            return []
+        # The last element is "" after a complete line, or a partial one
+        return [json.loads(line) for line in lines[start:-1]]
+
+    def remove_inputs(self, job_id: str) -> None:
+        shutil.rmtree(self.input_dir(job_id), ignore_errors=True)
+
+    def delete(self, job_id: str) -> None:
+        self.remove_inputs(job_id)
+        for suffix in (".json", ".events", ".lock"):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except OSError:
+                pass
+
+    def prune(self, ttl_seconds: float) -> int:
+        """Delete finished jobs older than ttl_seconds"""
+        if not ttl_seconds:
+            return 0
+        cutoff = time.time() - ttl_seconds
+        removed = 0
+        for job in list(self.jobs()):
+            if job.get("status") in FINISHED and job.get("finished", 0) < cutoff:
+                self.delete(job["id"])
+                removed += 1
+        return removed
+
+
+def public_view(job: Dict) -> Dict:
+    """Job state as returned by the API, without local file paths"""
+    return {key: value for key, value in job.items() if key not in ("inputs", "owner")}
+
+
+class JobManager:
+    """Runs comparison jobs on a bounded thread pool.
+
+    submit() only saves the uploads and queues the job, so the request
+    returns immediately. At most max_pending jobs wait or run in this
+    process; beyond that submit raises JobQueueFull. Jobs left queued or
+    running by a process that has exited are resumed on start-up.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        max_workers: int = 2,
+        max_pending: int = 16,
+        ttl_seconds: float = 0,
+    ):
+        self.store = store
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.pid = os.getpid()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="compare-job"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "resumed": 0,
+        }
+
+    def _record(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self._counters[name] += value
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, uploads: List, weight_text: float = 0.5, kind: str = PAIR) -> Dict:
+        """Save and validate the uploaded files, then queue a comparison.
+
+        kind is PAIR (two files, the /compare pipeline) or BATCH (any number
+        of files, all-pairs matrices). Invalid uploads raise ComparisonError
+        before anything is queued.
+        """
+        from app.utils.comparison import validate_documents
+        from app.utils.document import PDFDocument
+
+        if not self._reserve():
+            self._record(rejected=1)
+            raise JobQueueFull("Too many comparison jobs in progress, retry later")
+
+        try:
+            job_id = uuid.uuid4().hex
+            input_dir = self.store.input_dir(job_id)
+            os.makedirs(input_dir)
+            documents = [
+                PDFDocument.from_upload(upload, os.path.join(input_dir, f"file{i}.pdf"))
+                for i, upload in enumerate(uploads, 1)
+            ]
+            validate_documents(*documents)
+            inputs = [
+                {"path": document.file_path, "fingerprint": document.fingerprint}
+                for document in documents
+            ]
+            job = {
+                "id": job_id,
+                "kind": kind,
+                "status": QUEUED,
+                "created": time.time(),
+                "filenames": [upload.filename for upload in uploads],
+                "weight_text": weight_text,
+                "inputs": inputs,
+            }
+            self.store.save(job)
+            self._executor.submit(self._run, job_id)
+        except Exception:
+            self.store.remove_inputs(job_id)
+            self._release()
+            raise
+
+        self._record(submitted=1)
+        if self.ttl_seconds:
+            self.store.prune(self.ttl_seconds)
+        return job
+
+    def _run(self, job_id: str) -> None:
+        try:
+            with self.store.claim(job_id) as owned:
+                job = self.store.get(job_id)
+                # Another worker has it, or it finished before a restart
+                if not owned or job is None or job.get("status") in FINISHED:
+                    return
+                self._execute(job)
+        except Exception as e:
+            print(f"Error running job {job_id}: {str(e)}")
+        finally:
+            self._release()
+
+    def _execute(self, job: Dict) -> None:
+        from app.utils.batch_comparison import compare_batch
+        from app.utils.comparison import run_comparison, validate_documents
+        from app.utils.document import PDFDocument
+
+        job_id = job["id"]
+        self.store.update(job_id, status=RUNNING, started=time.time(), owner=self.pid)
+        self.store.append_event(job_id, {"stage": "job", "status": RUNNING})
+        print(f"Job {job_id} started")
+        try:
+            documents = [
+                PDFDocument(item["path"], fingerprint=item["fingerprint"])
+                for item in job["inputs"]
+            ]
+            validate_documents(*documents)
+            progress = functools.partial(self.store.append_event, job_id)
+            if job.get("kind", PAIR) == BATCH:
+                result = compare_batch(
+                    documents, job["filenames"], job["weight_text"], progress
+                )
+            else:
+                result = run_comparison(
+                    *documents,
+                    weight_text=job["weight_text"],
+                    progress=progress,
+                    names=job["filenames"],
+                )
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            self.store.update(
+                job_id,
+                status=FAILED,
+                finished=time.time(),
+                error=str(e),
+                status_code=getattr(e, "status_code", 500),
+            )
+            self.store.append_event(job_id, {"stage": "job", "status": FAILED})
+            self._record(failed=1)
+        else:
+            self.store.update(
+                job_id, status=COMPLETED, finished=time.time(), result=result
+            )
+            self.store.append_event(job_id, {"stage": "job", "status": COMPLETED})
+            self._record(completed=1)
+            print(f"Job {job_id} completed")
+        finally:
+            self.store.remove_inputs(job_id)
+
+    def resume(self) -> int:
+        """Queue unfinished jobs whose owner is gone.
+
+        Every worker does this at start-up; the claim lock makes sure each
+        job still runs once.
+        """
+        resumed = 0
+        for job in self.store.jobs():
+            if job.get("status") in FINISHED:
+                continue
+            with self.store.claim(job["id"]) as owned:
+                if not owned:
+                    continue
+            if not self._reserve():
+                break
+            self._executor.submit(self._run, job["id"])
+            resumed += 1
+        self._record(resumed=resumed)
+        if resumed:
+            print(f"Resumed {resumed} unfinished comparison jobs")
+        return resumed
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    def stats(self) -> Dict:
+        statuses: Dict[str, int] = {}
+        for job in self.store.jobs():
+            status = job.get("status", "unknown")
+            statuses[status] = statuses.get(status, 0) + 1
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pending"] = self._pending
+        stats.update({"max_pending": self.max_pending, "jobs": statuses})
+        return stats
+
+
+def format_sse(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines += [f"event: {event}", f"data: {json.dumps(data, default=to_native)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_events(
+    store: JobStore,
+    job_id: str,
+    start: int = 0,
+    max_seconds: float = 25,
+    poll_interval: float = 0.25,
+) -> Iterator[str]:
+    """Server-Sent Events for a job: its progress events, then the result.
+
+    Each progress event goes out under its stage name with its index in the
+    event log as the SSE id, so a reconnecting EventSource resumes after
+    Last-Event-ID. The stream ends with a "result" (or "error") message once
+    the job finishes, or after max_seconds so a worker thread is not held
+    for the whole job; the browser then reconnects on its own.
+    """
+    yield "retry: 1000\n\n"
+    deadline = time.monotonic() + max_seconds
+    while True:
+        job = store.get(job_id)
+        if job is None:
+            yield format_sse("error", {"error": "Job not found", "status_code": 404})
+            return
+        # Read after the state: every progress event of a finished job is
+        # in the log before its state says so
+        for event in store.events(job_id, start):
+            yield format_sse(event["stage"], event, start)
+            start += 1
+
+        if job.get("status") == COMPLETED:
+            yield format_sse("result", job["result"])
+            return
+        if job.get("status") == FAILED:
+            yield format_sse(
+                "error",
+                {"error": job.get("error"), "status_code": job.get("status_code")},
+            )
+            return
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(poll_interval)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """The job manager of this worker process, resuming orphaned jobs once"""
+    global _manager
+    with _manager_lock:
+        # Threads do not survive a fork; a gunicorn worker needs its own pool
+        if _manager is None or _manager.pid != os.getpid():
+            _manager = JobManager(
+                JobStore(Config.JOBS_DIR or JOBS_DIR),
+                max_workers=Config.JOB_WORKERS,
+                max_pending=Config.JOB_MAX_PENDING,
+                ttl_seconds=Config.JOB_TTL_SECONDS,
+            )
+            _manager.resume()
+        return _manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["list", "prune"])
+    args = parser.parse_args()
+
+    store = JobStore(Config.JOBS_DIR or JOBS_DIR)
+    if args.command == "list":
+        for job in store.jobs():
+            print(job["id"], job.get("status"), job.get("filenames"))
+    else:
+        print("Removed", store.prune(Config.JOB_TTL_SECONDS), "finished jobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+from concurrent.futures import Future
+import os
+import hashlib
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from app.utils.cache_store import get_cache_store
+from app.utils.ocr_backends import get_ocr_backend
+from app.utils.ocr_client import OCRRequestError
+from app.utils.ocr_engine import get_ocr_engine
+from app.utils.page_image import encode_page
+
+# Pages of one document allowed to wait on OCR before rendering pauses
+MAX_PENDING_PAGES = 6
+# images:annotate accepts at most this many images per request
+VISION_MAX_BATCH = 16
+
+_page_cache_stats = {"hits": 0, "misses": 0, "stores": 0}
+_page_cache_stats_lock = threading.Lock()
+
+
+def encode_page_image(image) -> str:
+    return encode_page(image)[0]
+
+
+def rescale_annotation(annotation: Optional[Dict], scale: float) -> Optional[Dict]:
+    """Map coordinates of a page OCR'd at scale back to the rendered page"""
+    if not annotation or scale == 1.0:
+        return annotation
+
+    def rescale_box(element: Dict) -> None:
+        for vertex in element.get("boundingBox", {}).get("vertices", []):
+            for axis in ("x", "y"):
+                if axis in vertex:
+                    vertex[axis] = int(round(vertex[axis] / scale))
+
+    for page in annotation.get("pages", []):
+        for axis in ("width", "height"):
+            if axis in page:
+                page[axis] = int(round(page[axis] / scale))
+        for block in page.get("blocks", []):
+            rescale_box(block)
+            for paragraph in block.get("paragraphs", []):
+                rescale_box(paragraph)
+                for word in paragraph.get("words", []):
+                    rescale_box(word)
+                    for symbol in word.get("symbols", []):
+                        rescale_box(symbol)
+    return annotation
+
+
+def build_page_request(content: str) -> Dict:
+    return {
+        "image": {"content": content},
+        "features": [{"type": "DOCUMENT_TEXT_DETECTION"}],
+    }
+
+
+def annotate_encoded_pages(
+    pages: List[Tuple[int, str]], api_key: Optional[str] = None
+) -> List[Optional[Dict]]:
+    """Send several (page_num, base64 image) pages in one images:annotate call.
+
+    Returns one fullTextAnnotation per page in the same order: an empty dict
+    when the page has no text and None when its OCR failed, so callers can
+    tell the two apart.
+    """
+    api_key = api_key or os.environ.get("GOOGLE_CLOUD_API_KEY")
+    page_label = ", ".join(str(page_num + 1) for page_num, _ in pages)
+    try:
+        payload = {"requests": [build_page_request(content) for _, content in pages]}
+
+        print(f"Processing page {page_label}")
+
+        result = get_ocr_backend().annotate(payload, api_key=api_key)
+        responses = result.get("responses") or []
+
+        annotations = []
+        for index, (page_num, _) in enumerate(pages):
+            response = responses[index] if index < len(responses) else {}
+            if "error" in response:
+                print(f"OCR error on page {page_num+1}: {response['error']}")
+                annotations.append(None)
+                continue
+            if not response:
+                print(f"No text detected on page {page_num+1}")
+            annotations.append(response.get("fullTextAnnotation") or {})
+        return annotations
+
+    except OCRRequestError as e:
+        print(f"OCR failed for page {page_label}: {str(e)}")
+        return [None] * len(pages)
+    except Exception as e:
+        print(f"Error processing page {page_label}: {str(e)}")
+        return [None] * len(pages)
+
+
+def annotate_image(
+    image, page_num: int, api_key: Optional[str] = None
+) -> Optional[Dict]:
+    """Run DOCUMENT_TEXT_DETECTION on one page and return its fullTextAnnotation"""
+    try:
+        content, scale = encode_page(image)
+    except Exception as e:
+        print(f"Error encoding page {page_num+1}: {str(e)}")
+        return None
+    annotation = annotate_encoded_pages([(page_num, content)], api_key)[0]
+    return rescale_annotation(annotation, scale)
+
+
+def get_page_hash(image) -> str:
+    """Hash of the rendered page bitmap, independent of the PDF it came from"""
+    digest = hashlib.sha1(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def load_page_annotation(page_hash: str) -> Optional[Dict]:
+    return get_cache_store().get("pages", page_hash)
+
+
+def save_page_annotation(page_hash: str, annotation: Dict) -> None:
+    get_cache_store().set("pages", page_hash, annotation)
+
+
+def record_page_cache(**counts: int) -> None:
+    with _page_cache_stats_lock:
+        for name, value in counts.items():
+            _page_cache_stats[name] += value
+
+
+def page_cache_stats() -> Dict:
+    with _page_cache_stats_lock:
+        stats = dict(_page_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def annotate_and_store(
+    pages: List[Tuple[str, int, str, float]], api_key: Optional[str] = None
+) -> List[Optional[Dict]]:
+    """OCR a batch of (page_hash, page_num, content, scale), cache the results"""
+    annotations = annotate_encoded_pages(
+        [(page_num, content) for _, page_num, content, _ in pages], api_key
+    )
+    annotations = [
+        rescale_annotation(annotation, page[3])
+        for annotation, page in zip(annotations, pages)
+    ]
+    for (page_hash, _, _, _), annotation in zip(pages, annotations):
+        # Failed pages are retried next time rather than cached
+        if annotation is not None:
+            save_page_annotation(page_hash, annotation)
+            record_page_cache(stores=1)
+    return annotations
+
+
+class PageBatcher:
+    """Packs pages into images:annotate calls under page-count and size caps"""
+
+    def __init__(self, engine, tenant: str, api_key: Optional[str] = None):
+        self.engine = engine
+        self.tenant = tenant
+        self.api_key = api_key
+        self.max_pages = max(1, min(Config.OCR_BATCH_MAX_PAGES, VISION_MAX_BATCH))
+        self.max_bytes = Config.OCR_BATCH_MAX_BYTES
+        self._pages: List[Tuple[str, int, str, float]] = []
+        self._futures: List[Future] = []
+        self._bytes = 0
+
+    def add(
+        self, page_hash: str, page_num: int, content: str, scale: float = 1.0
+    ) -> Future:
+        if self._pages and (
+            len(self._pages) >= self.max_pages
+            or self._bytes + len(content) > self.max_bytes
+        ):
+            self.flush()
+        future: Future = Future()
+        self._pages.append((page_hash, page_num, content, scale))
+        self._futures.append(future)
+        self._bytes += len(content)
+        if len(self._pages) >= self.max_pages:
+            self.flush()
+        return future
+
+    def flush(self) -> None:
+        if not self._pages:
+            return
+        page_futures = self._futures
+        batch_future = self.engine.submit(
+            self.tenant, annotate_and_store, self._pages, self.api_key
+        )
+        self._pages, self._futures, self._bytes = [], [], 0
+
+        def split_results(done: Future) -> None:
+            try:
+                annotations = done.result()
+            except Exception:
+                annotations = [None] * len(page_futures)
+            for page_future, annotation in zip(page_futures, annotations):
+                page_future.set_result(annotation)
+
+        batch_future.add_done_callback(split_results)
+
+
+def submit_page(
+    batcher: PageBatcher,
+    slots: threading.BoundedSemaphore,
+    page_hash: str,
+    page_num: int,
+    image,
+) -> Future:
+    """Future annotation of one page: from the page cache or the batcher"""
+    annotation = load_page_annotation(page_hash)
+    if annotation is not None:
+        record_page_cache(hits=1)
+        future = Future()
+        future.set_result(annotation)
+        return future
+
+    record_page_cache(misses=1)
+    if not slots.acquire(blocking=False):
+        # Never wait on slots held by a batch that is not sent yet
+        batcher.flush()
+        slots.acquire()
+    try:
+        future = batcher.add(page_hash, page_num, *encode_page(image))
+    except Exception as e:
+        print(f"Error encoding page {page_num+1}: {str(e)}")
+        slots.release()
+        future = Future()
+        future.set_result(None)
+    else:
+        future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def annotate_pages(
+    pages: Iterable,
+    api_key: Optional[str] = None,
+    on_page: Optional[Callable[[int, Optional[Dict]], None]] = None,
+) -> List[Optional[Dict]]:
+    """OCR pages as they arrive, returning annotations in page order.
+
+    pages may be a list or a generator that renders one page at a time; each
+    page is handed to the process-wide OCR engine as soon as it exists (in
+    batches of up to OCR_BATCH_MAX_PAGES per call), and only a few pages
+    per call may be outstanding so rendering cannot run far ahead of OCR.
+    Pages whose bitmap has been OCR'd before (in any document) come from
+    the page cache without touching the engine, and identical pages within
+    the document are OCR'd once. on_page(page_num, annotation) is called as
+    each page's result arrives.
+    """
+    # Each call is its own tenant so the engine can interleave requests fairly
+    batcher = PageBatcher(get_ocr_engine(), uuid.uuid4().hex, api_key)
+    # Room for one batch in flight while the next one fills
+    slots = threading.BoundedSemaphore(
+        max(MAX_PENDING_PAGES, 2 * batcher.max_pages)
+    )
+    futures = []
+    by_hash: Dict[str, Future] = {}
+
+    for page_num, image in enumerate(pages):
+        page_hash = get_page_hash(image)
+        future = by_hash.get(page_hash)
+        if future is None:
+            future = by_hash[page_hash] = submit_page(
+                batcher, slots, page_hash, page_num, image
+            )
+        futures.append(future)
+        if on_page is not None:
+            future.add_done_callback(
+                lambda done, page_num=page_num: on_page(page_num, done.result())
+            )
+
+    batcher.flush()
+    return [future.result() for future in futures]
+
+
+def text_from_annotation(annotation: Optional[Dict]) -> Optional[str]:
+    """Plain page text, or None if the page has no usable text"""
+    if not annotation:
+        return None
+    return annotation.get("text", "")
+
+
+def get_bounding_box(paragraph: Dict) -> Optional[Dict]:
+    vertices = paragraph.get("boundingBox", {}).get("vertices", [])
+    if not vertices or len(vertices) != 4:
+        return None
+    xs = [v.get("x", 0) for v in vertices]
+    ys = [v.get("y", 0) for v in vertices]
+    return {
+        "left": min(xs),
+        "top": min(ys),
+        "width": max(xs) - min(xs),
+        "height": max(ys) - min(ys),
+    }
+
+
+def paragraph_features_from_annotation(
+    annotation: Optional[Dict], page_num: int
+) -> List[Dict]:
+    """Paragraph-level handwriting features for one page"""
+    page_features = []
+    if not annotation:
+        return page_features
+
+    for page in annotation.get("pages", []):
+        for block in page.get("blocks", []):
+            for paragraph in block.get("paragraphs", []):
+                words = paragraph.get("words", [])
+                if not words:
+                    continue
+
+                symbols = [
+                    symbol for word in words for symbol in word.get("symbols", [])
+                ]
+                if not symbols:
+                    continue
+
+                page_features.append(
+                    {
+                        "confidence": paragraph.get("confidence", 0),
+                        "word_count": len(words),
+                        "symbol_density": sum(
+                            1
+                            for symbol in symbols
+                            if not symbol.get("text", "").isalnum()
+                        )
+                        / len(words),
+                        "line_breaks": sum(
+                            1
+                            for symbol in symbols
+                            if symbol.get("property", {})
+                            .get("detectedBreak", {})
+                            .get("type")
+                        ),
+                        "average_symbol_confidence": sum(
+                            symbol.get("confidence", 0) for symbol in symbols
+                        )
+                        / len(symbols),
+                        "boundingBox": get_bounding_box(paragraph),
+                        "page_number": page_num,
+                    }
+                )
+
+    return page_features
@@ -0,0 +1,277 @@
+import copy
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Type
+
+from config import Config
+from app.utils.cache_store import CACHE_DIR, CacheStore, load_cached_texts
+from app.utils.ocr_client import OCRRequestError, get_vision_client
+
+RECORD_DIR = os.path.join(CACHE_DIR, "ocr_recordings")
+
+
+class OCRBackend:
+    """Answers Vision images:annotate payloads.
+
+    annotate() takes the request body ({"requests": [...]}) and returns the
+    response body ({"responses": [...]}, one entry per image), so every
+    backend is a drop-in for the live service.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._counters: Dict[str, int] = {"calls": 0, "images": 0}
+
+    def _record(self, **counts: int) -> None:
+        with self._stats_lock:
+            for name, value in counts.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def annotate(self, payload: Dict, api_key: Optional[str] = None) -> Dict:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {"backend": self.name, **self._counters}
+
+
+class VisionOCRBackend(OCRBackend):
+    """The live Google Vision service through the pooled VisionClient"""
+
+    name = "vision"
+
+    def __init__(self, client=None):
+        super().__init__()
+        self.client = client or get_vision_client()
+
+    def annotate(self, payload: Dict, api_key: Optional[str] = None) -> Dict:
+        self._record(calls=1, images=len(payload.get("requests", [])))
+        return self.client.annotate(payload, api_key=api_key)
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "client": self.client.stats()}
+
+
+def image_key(entry: Dict) -> str:
+    """Recording key of one request entry: a hash of the uploaded image"""
+    content = entry.get("image", {}).get("content", "")
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class RecordingOCRBackend(OCRBackend):
+    """Passes calls through to another backend and saves each raw response"""
+
+    name = "record"
+
+    def __init__(self, inner: OCRBackend, record_dir: str):
+        super().__init__()
+        self.inner = inner
+        self.record_dir = record_dir
+        os.makedirs(record_dir, exist_ok=True)
+
+    def annotate(self, payload: Dict, api_key: Optional[str] = None) -> Dict:
+        result = self.inner.annotate(payload, api_key=api_key)
+        entries = payload.get("requests", [])
+        self._record(calls=1, images=len(entries))
+        for entry, response in zip(entries, result.get("responses", [])):
+            if "error" not in response:
+                self._save(image_key(entry), response)
+        return result
+
+    def _save(self, key: str, response: Dict) -> None:
+        path = os.path.join(self.record_dir, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(response, file, separators=(",", ":"))
+            os.replace(tmp_path, path)
+            self._record(recorded=1)
+        except Exception as e:
+            print(f"Error saving OCR recording {key}: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "inner": self.inner.stats()}
+
+
+def annotation_from_text(text: str) -> Dict:
+    """Minimal fullTextAnnotation for text, one paragraph per line.
+
+    Lets extracted texts in cached_data stand in for real OCR responses;
+    the layout is synthetic but has the structure feature extraction reads.
+    """
+    paragraphs = []
+    lines = [line for line in text.splitlines() if line.strip()]
+    for line_num, line in enumerate(lines):
+        top = 100 + line_num * 40
+        right = 100 + 14 * len(line)
+        words = []
+        for word in line.split():
+            symbols = [{"text": char, "confidence": 0.9} for char in word]
+            symbols[-1]["property"] = {"detectedBreak": {"type": "SPACE"}}
+            words.append({"confidence": 0.9, "symbols": symbols})
+        paragraphs.append(
+            {
+                "confidence": 0.9,
+                "boundingBox": {
+                    "vertices": [
+                        {"x": 100, "y": top},
+                        {"x": right, "y": top},
+                        {"x": right, "y": top + 32},
+                        {"x": 100, "y": top + 32},
+                    ]
+                },
+                "words": words,
+            }
+        )
+    return {
+        "text": text,
+        "pages": [
+            {
+                "width": 1700,
+                "height": max(2200, 200 + 40 * len(lines)),
+                "blocks": [{"paragraphs": paragraphs}] if paragraphs else [],
+            }
+        ],
+    }
+
+
+def responses_from_cached_texts(store: Optional[CacheStore] = None) -> List[Dict]:
+    """images:annotate responses built from the extracted texts in the cache"""
+    responses = []
+    for text in load_cached_texts(store).values():
+        # extract_text_from_pdf joins page texts with blank lines
+        for page_text in text.split("\n\n"):
+            if page_text.strip():
+                responses.append(
+                    {"fullTextAnnotation": annotation_from_text(page_text)}
+                )
+    return responses
+
+
+class ReplayOCRBackend(OCRBackend):
+    """Serves recorded responses offline, with optional latency and errors.
+
+    An image recorded by RecordingOCRBackend gets its own response back.
+    Any other image gets one of the fallback responses (by default the
+    recordings plus responses built from cached_data texts), chosen by its
+    hash so repeated runs see the same text. Injected errors raise
+    OCRRequestError with a 429 or 503 status, like the live service.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        record_dir: Optional[str] = None,
+        fallback: Optional[List[Dict]] = None,
+        latency: float = 0.0,
+        per_image_latency: float = 0.0,
+        error_rate: float = 0.0,
+    ):
+        super().__init__()
+        self.record_dir = record_dir
+        self.latency = latency
+        self.per_image_latency = per_image_latency
+        self.error_rate = error_rate
+        self._fallback = fallback
+        self._fallback_lock = threading.Lock()
+
+    def _load_recording(self, key: str) -> Optional[Dict]:
+        if not self.record_dir:
+            return None
+        try:
+            with open(
+                os.path.join(self.record_dir, f"{key}.json"), "r", encoding="utf-8"
+            ) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def fallback_responses(self) -> List[Dict]:
+        with self._fallback_lock:
+            if self._fallback is None:
+                self._fallback = self._load_fallback()
+                print(f"Replay OCR loaded {len(self._fallback)} fallback responses")
+            return self._fallback
+
+    def _load_fallback(self) -> List[Dict]:
+        responses = []
+        if self.record_dir and os.path.isdir(self.record_dir):
+            for filename in sorted(os.listdir(self.record_dir)):
+                if filename.endswith(".json"):
+                    response = self._load_recording(filename[: -len(".json")])
+                    if response is not None:
+                        responses.append(response)
+        return responses + responses_from_cached_texts()
+
+    def response_for(self, entry: Dict) -> Dict:
+        key = image_key(entry)
+        response = self._load_recording(key)
+        if response is not None:
+            self._record(replayed=1)
+            return response
+        fallback = self.fallback_responses()
+        if not fallback:
+            self._record(missing=1)
+            return {"error": {"code": 5, "message": "No recorded OCR response"}}
+        self._record(fallback=1)
+        # Callers rescale annotations in place; keep the shared one intact
+        return copy.deepcopy(fallback[int(key, 16) % len(fallback)])
+
+    def annotate(self, payload: Dict, api_key: Optional[str] = None) -> Dict:
+        entries = payload.get("requests", [])
+        self._record(calls=1, images=len(entries))
+        delay = self.latency + self.per_image_latency * len(entries)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self._record(injected_errors=1)
+            status_code = random.choice([429, 503])
+            raise OCRRequestError(f"Error {status_code}: injected", status_code)
+        return {"responses": [self.response_for(entry) for entry in entries]}
+
+
+OCR_BACKENDS: Dict[str, Type[OCRBackend]] = {
+    backend.name: backend
+    for backend in (VisionOCRBackend, RecordingOCRBackend, ReplayOCRBackend)
+}
+
+
+def get_record_dir() -> str:
+    return Config.OCR_RECORD_DIR or RECORD_DIR
+
+
+def create_ocr_backend(name: str) -> OCRBackend:
+    """Backend named by OCR_BACKEND, configured from Config"""
+    if name == "vision":
+        return VisionOCRBackend()
+    if name == "record":
+        return RecordingOCRBackend(VisionOCRBackend(), get_record_dir())
+    if name == "replay":
+        return ReplayOCRBackend(
+            get_record_dir(),
+            latency=Config.OCR_REPLAY_LATENCY,
+            error_rate=Config.OCR_REPLAY_ERROR_RATE,
+        )
+    raise ValueError(
+        f"Unknown OCR backend: {name} (expected one of {', '.join(OCR_BACKENDS)})"
+    )
+
+
+_backend: Optional[OCRBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend() -> OCRBackend:
+    """Process-wide OCR backend selected by OCR_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_ocr_backend(Config.OCR_BACKEND)
+        return _backend
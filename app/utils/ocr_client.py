@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+VISION_URL = "https://vision.googleapis.com/v1/images:annotate"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OCRRequestError(Exception):
+    """The OCR service did not return a usable response"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, sleeping as needed; returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class VisionClient:
+    """Shared HTTP client for Vision images:annotate.
+
+    Keeps TLS connections alive in a pooled session, spaces calls with a
+    token bucket, retries 429/5xx and network errors with jittered
+    exponential backoff, and records per-call latency.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        url: str = VISION_URL,
+        timeout: float = 120,
+        pool_size: int = 16,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        rate_limiter: Optional[TokenBucket] = None,
+        latency_window: int = 1000,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._counters = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "failures": 0,
+            "rate_limit_wait_seconds": 0.0,
+        }
+
+    def _record(self, latency: Optional[float] = None, **counts) -> None:
+        with self._metrics_lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            for name, value in counts.items():
+                self._counters[name] += value
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter keeps retrying workers from synchronising
+        ceiling = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def annotate(self, payload: Dict, api_key: Optional[str] = None) -> Dict:
+        """POST one images:annotate payload and return the decoded response"""
+        api_key = api_key or self.api_key
+        params = {"key": api_key} if api_key else None
+        self._record(calls=1)
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self._record(rate_limit_wait_seconds=self.rate_limiter.acquire())
+
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                response = self.session.post(
+                    self.url, params=params, json=payload, timeout=self.timeout
+                )
+                self._record(time.perf_counter() - start, attempts=1)
+                if response.status_code == 200:
+                    return response.json()
+                error = OCRRequestError(
+                    f"Error {response.status_code}: {response.text[:500]}",
+                    response.status_code,
+                )
+                retryable = response.status_code in RETRY_STATUS_CODES
+                retry_after = response.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(time.perf_counter() - start, attempts=1)
+                error = OCRRequestError(f"OCR request failed: {str(e)}")
+                retryable = True
+
+            if not retryable or attempt == self.max_retries:
+                self._record(failures=1)
+                raise error
+
+            delay = self._backoff_delay(attempt, retry_after)
+            print(f"{error}; retrying in {delay:.2f}s")
+            self._record(retries=1)
+            time.sleep(delay)
+
+    def stats(self) -> Dict:
+        with self._metrics_lock:
+            latencies = np.array(self._latencies)
+            stats = dict(self._counters)
+        if len(latencies):
+            stats["latency_seconds"] = {
+                "count": int(len(latencies)),
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max()),
+            }
+        return stats
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_shared_client: Optional[VisionClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_vision_client() -> VisionClient:
+    """Process-wide Vision client configured from Config"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            rate_limiter = (
+                TokenBucket(Config.OCR_RATE_PER_SECOND, Config.OCR_BURST)
+                if Config.OCR_RATE_PER_SECOND > 0
+                else None
+            )
+            _shared_client = VisionClient(
+                url=Config.OCR_URL,
+                timeout=Config.OCR_TIMEOUT,
+                pool_size=Config.OCR_POOL_SIZE,
+                max_retries=Config.OCR_MAX_RETRIES,
+                rate_limiter=rate_limiter,
+            )
+        return _shared_client
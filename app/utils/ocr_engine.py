@@ -0,0 +1,130 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Optional
+
+from config import Config
+
+
+class OCREngine:
+    """Process-wide asyncio scheduler for OCR calls.
+
+    One event loop per worker process runs on a background thread. A global
+    asyncio.Semaphore caps the OCR calls in flight across every request in
+    the process, and waiting calls are dispatched round-robin between
+    requests ("tenants") so a 30-page upload cannot starve a 2-page one.
+    The blocking HTTP client runs in a thread pool sized to the cap.
+    """
+
+    def __init__(self, max_in_flight: int = 8):
+        self.max_in_flight = max_in_flight
+        self.pid = os.getpid()
+        self._loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="ocr-io"
+        )
+        self._queues: "OrderedDict[str, Deque]" = OrderedDict()
+        self._ready = threading.Event()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "max_queue_wait_seconds": 0.0,
+        }
+        self._thread = threading.Thread(
+            target=self._run_loop, name="ocr-engine", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._has_work = asyncio.Event()
+        self._loop.create_task(self._dispatch())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(self, tenant: str, fn: Callable, *args) -> Future:
+        """Queue fn(*args) for tenant; safe to call from any thread"""
+        future: Future = Future()
+        job = (fn, args, future, time.monotonic())
+        self._loop.call_soon_threadsafe(self._enqueue, tenant, job)
+        return future
+
+    def _enqueue(self, tenant: str, job) -> None:
+        self._queues.setdefault(tenant, deque()).append(job)
+        self._stats["submitted"] += 1
+        self._has_work.set()
+
+    def _next_job(self):
+        """Take the oldest job of the next tenant in round-robin order"""
+        tenant, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        # Rotate: the tenant goes to the back of the line, or leaves if done
+        del self._queues[tenant]
+        if queue:
+            self._queues[tenant] = queue
+        return job
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._semaphore.acquire()
+            while not self._queues:
+                self._has_work.clear()
+                await self._has_work.wait()
+            fn, args, future, queued_at = self._next_job()
+            if not future.set_running_or_notify_cancel():
+                self._semaphore.release()
+                continue
+            self._stats["max_queue_wait_seconds"] = max(
+                self._stats["max_queue_wait_seconds"], time.monotonic() - queued_at
+            )
+            self._loop.create_task(self._run_job(fn, args, future))
+
+    async def _run_job(self, fn: Callable, args, future: Future) -> None:
+        self._stats["in_flight"] += 1
+        self._stats["peak_in_flight"] = max(
+            self._stats["peak_in_flight"], self._stats["in_flight"]
+        )
+        try:
+            result = await self._loop.run_in_executor(self._executor, fn, *args)
+            future.set_result(result)
+            self._stats["completed"] += 1
+        except Exception as e:
+            future.set_exception(e)
+            self._stats["failed"] += 1
+        finally:
+            self._stats["in_flight"] -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["max_in_flight"] = self.max_in_flight
+        stats["waiting_tenants"] = len(self._queues)
+        stats["queued"] = sum(len(queue) for queue in list(self._queues.values()))
+        return stats
+
+    def shutdown(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+
+_engine: Optional[OCREngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine() -> OCREngine:
+    """The OCR engine of this worker process, started on first use"""
+    global _engine
+    with _engine_lock:
+        # A forked gunicorn worker must not reuse its parent's loop thread
+        if _engine is None or _engine.pid != os.getpid():
+            _engine = OCREngine(max_in_flight=Config.OCR_MAX_IN_FLIGHT)
+        return _engine
@@ -0,0 +1,97 @@
+"""Local HTTP stand-in for Vision images:annotate.
+
+Serves an OCRBackend (normally ReplayOCRBackend) over HTTP so the whole
+pipeline, including VisionClient retries and connection pooling, can run
+without network access:
+
+    python -m app.utils.ocr_standin --port 8090 --latency 0.2 --error-rate 0.05
+    OCR_URL=http://127.0.0.1:8090/v1/images:annotate python run.py
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+from app.utils.ocr_backends import OCRBackend, ReplayOCRBackend, get_record_dir
+from app.utils.ocr_client import OCRRequestError
+
+
+def start_standin_server(
+    backend: OCRBackend, host: str = "127.0.0.1", port: int = 0
+) -> Tuple[ThreadingHTTPServer, Dict[str, int]]:
+    """Serve backend on a background thread; returns (server, counters)"""
+    counters = {"connections": 0, "requests": 0, "images": 0}
+    counters_lock = threading.Lock()
+
+    class StandinHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; avoid Nagle stalls
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with counters_lock:
+                counters["connections"] += 1
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                error = {"code": 400, "message": "Invalid JSON"}
+                self._reply(400, {"error": error})
+                return
+            with counters_lock:
+                counters["requests"] += 1
+                counters["images"] += len(payload.get("requests", []))
+            try:
+                self._reply(200, backend.annotate(payload))
+            except OCRRequestError as e:
+                status_code = e.status_code or 500
+                error = {"code": status_code, "message": str(e)}
+                self._reply(status_code, {"error": error})
+
+        def _reply(self, status: int, data: Dict) -> None:
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--record-dir", default=get_record_dir())
+    parser.add_argument("--latency", type=float, default=0.0, help="per call")
+    parser.add_argument("--per-image-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    backend = ReplayOCRBackend(
+        args.record_dir,
+        latency=args.latency,
+        per_image_latency=args.per_image_latency,
+        error_rate=args.error_rate,
+    )
+    server, _ = start_standin_server(backend, args.host, args.port)
+    url = f"http://{args.host}:{server.server_port}/v1/images:annotate"
+    print(f"OCR stand-in serving {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import base64
+import io
+import math
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from config import Config
+
+# pdf2image's own default, used when no DPI is configured
+DEFAULT_DPI = 200
+IMAGE_FORMATS = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+PAGE_SIZE_PATTERN = re.compile(r"([\d.]+)\s*x\s*([\d.]+)\s*pts")
+
+
+class PageEncoding:
+    """How a rendered page is turned into the image uploaded for OCR"""
+
+    def __init__(
+        self,
+        grayscale: bool = True,
+        image_format: str = "png",
+        quality: int = 85,
+        max_pixels: int = 0,
+    ):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"Unknown image format {image_format!r}; "
+                f"choose one of {', '.join(IMAGE_FORMATS)}"
+            )
+        self.grayscale = grayscale
+        self.image_format = image_format
+        self.quality = quality
+        # 0 keeps the rendered resolution
+        self.max_pixels = max_pixels
+
+    def __repr__(self) -> str:
+        return (
+            f"PageEncoding(grayscale={self.grayscale}, "
+            f"image_format={self.image_format!r}, quality={self.quality}, "
+            f"max_pixels={self.max_pixels})"
+        )
+
+    @classmethod
+    def from_config(cls) -> "PageEncoding":
+        return cls(
+            grayscale=Config.OCR_GRAYSCALE,
+            image_format=Config.OCR_IMAGE_FORMAT,
+            quality=Config.OCR_IMAGE_QUALITY,
+            max_pixels=Config.OCR_MAX_PIXELS,
+        )
+
+
+def page_size_inches(pdf_info: dict) -> Optional[Tuple[float, float]]:
+    """Width and height of the first page from pdfinfo's "Page size" line"""
+    match = PAGE_SIZE_PATTERN.search(str(pdf_info.get("Page size", "")))
+    if not match:
+        return None
+    return float(match.group(1)) / 72, float(match.group(2)) / 72
+
+
+def render_dpi(pdf_info: Optional[dict] = None) -> int:
+    """DPI to rasterize at: OCR_RENDER_DPI, lowered so pages fit OCR_MAX_PIXELS.
+
+    Rendering more pixels than will be uploaded only costs time and memory,
+    so when a pixel budget is set the DPI adapts to the page size.
+    """
+    dpi = Config.OCR_RENDER_DPI or DEFAULT_DPI
+    size = page_size_inches(pdf_info) if pdf_info else None
+    if size and Config.OCR_MAX_PIXELS:
+        fitted = int(math.sqrt(Config.OCR_MAX_PIXELS / (size[0] * size[1])))
+        dpi = max(72, min(dpi, fitted))
+    return dpi
+
+
+def prepare_page(image, encoding: PageEncoding):
+    """Grayscale and downscale a page; returns (image, scale to the original)"""
+    scale = 1.0
+    if encoding.grayscale and image.mode != "L":
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    pixels = image.width * image.height
+    if encoding.max_pixels and pixels > encoding.max_pixels:
+        scale = math.sqrt(encoding.max_pixels / pixels)
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        scale = size[0] / image.width
+        image = image.resize(size, resample=Image.Resampling.BICUBIC)
+    return image, scale
+
+
+def save_page(image, encoding: PageEncoding) -> bytes:
+    """Compress a prepared page in the configured format"""
+    buffer = io.BytesIO()
+    image_format = IMAGE_FORMATS[encoding.image_format]
+    if image_format == "PNG":
+        image.save(buffer, format=image_format, compress_level=6)
+    else:
+        image.save(buffer, format=image_format, quality=encoding.quality)
+    return buffer.getvalue()
+
+
+_encode_pool: Optional[ProcessPoolExecutor] = None
+_encode_pool_pid: Optional[int] = None
+_encode_pool_lock = threading.Lock()
+
+
+def get_encode_pool() -> Optional[ProcessPoolExecutor]:
+    """Worker processes for image compression, or None to encode inline"""
+    global _encode_pool, _encode_pool_pid
+    if Config.OCR_ENCODE_WORKERS <= 0:
+        return None
+    with _encode_pool_lock:
+        if _encode_pool is None or _encode_pool_pid != os.getpid():
+            _encode_pool = ProcessPoolExecutor(max_workers=Config.OCR_ENCODE_WORKERS)
+            _encode_pool_pid = os.getpid()
+        return _encode_pool
+
+
+def encode_page(
+    image, encoding: Optional[PageEncoding] = None
+) -> Tuple[str, float]:
+    """Base64 upload payload for a page and the scale it was sent at.
+
+    Compression (the CPU-heavy part, which holds the GIL in this process)
+    runs in the encode worker pool when OCR_ENCODE_WORKERS > 0, so OCR I/O
+    and other requests keep running meanwhile.
+    """
+    encoding = encoding or PageEncoding.from_config()
+    prepared, scale = prepare_page(image, encoding)
+    pool = get_encode_pool()
+    if pool is None:
+        data = save_page(prepared, encoding)
+    else:
+        data = pool.submit(save_page, prepared, encoding).result()
+    return base64.b64encode(data).decode(), scale
@@ -1,37 +1,29 @@
-import requests
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-import os
-import base64
-from pdf2image import convert_from_path
-import io
-import hashlib
-import json
-from typing import Dict, List, Optional, Tuple
-
-CACHE_DIR = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cached_data"
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf2image import convert_from_path, pdfinfo_from_path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from app.utils.cache_store import get_cache_store
+from app.utils.document import PDFDocument, as_document, file_fingerprint
+from app.utils.page_image import render_dpi
+from app.utils.ocr import (
+    annotate_image,
+    annotate_pages,
+    encode_page_image,
+    text_from_annotation,
 )
-os.makedirs(CACHE_DIR, exist_ok=True)
+
 MAX_WORKERS = 4
 
 
 def get_cache_key(file_path: str) -> str:
-    with open(file_path, "rb") as file:
-        return hashlib.md5(file.read()).hexdigest()
+    return file_fingerprint(file_path)
 
 
 def load_from_cache(cache_key: str) -> Optional[str]:
-    cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
-    if os.path.exists(cache_file):
-        with open(cache_file, "r") as file:
-            return json.load(file)
-    return None
+    return get_cache_store().get("text", cache_key)
 
 
 def save_to_cache(cache_key: str, data: str) -> None:
-    cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
-    with open(cache_file, "w") as file:
-        json.dump(data, file)
+    get_cache_store().set("text", cache_key, data)
 
 
 def validate_pdf(file_path: str) -> bool:
@@ -44,66 +36,41 @@ def validate_pdf(file_path: str) -> bool:
 
 
 def prepare_page_image(image) -> str:
-    img_byte_arr = io.BytesIO()
-    image.save(img_byte_arr, format="PNG")
-    return base64.b64encode(img_byte_arr.getvalue()).decode()
+    return encode_page_image(image)
 
 
 def process_page(args: Tuple) -> Optional[str]:
     image, page_num = args
-    try:
-        base64_image = prepare_page_image(image)
-        url = f"https://vision.googleapis.com/v1/images:annotate?key={os.environ.get('GOOGLE_CLOUD_API_KEY')}"
-
-        payload = {
-            "requests": [
-                {
-                    "image": {"content": base64_image},
-                    "features": [{"type": "DOCUMENT_TEXT_DETECTION"}],
-                }
-            ]
-        }
-
-        print(f"Processing page {page_num+1}")
-
-        response = requests.post(url, json=payload, timeout=60)
-
-        if response.status_code != 200:
-            print(f"Error {response.status_code}: {response.text}")
-            return None
-
-        result = response.json()
-        if not result.get("responses"):
-            print(f"No text detected on page {page_num+1}")
-            return None
-
-        text_annotation = result["responses"][0].get("fullTextAnnotation")
-        if not text_annotation:
-            return None
-
-        return text_annotation.get("text", "")
-
-    except Exception as e:
-        print(f"Error processing page {page_num+1}: {str(e)}")
-        return None
+    return text_from_annotation(annotate_image(image, page_num))
 
 
 def convert_pdf_to_images(file_path: str) -> List:
     with ProcessPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(convert_from_path, file_path)
+        dpi = render_dpi(pdfinfo_from_path(file_path))
+        future = executor.submit(convert_from_path, file_path, dpi=dpi)
         return future.result()
 
 
+def iter_pdf_pages(file_path: str) -> Iterator:
+    """Render a PDF one page at a time instead of all pages up front"""
+    pdf_info = pdfinfo_from_path(file_path)
+    dpi = render_dpi(pdf_info)
+    for page_number in range(1, pdf_info["Pages"] + 1):
+        yield convert_from_path(
+            file_path, dpi=dpi, first_page=page_number, last_page=page_number
+        )[0]
+
+
 def process_pdf_pages(file_path: str, images: List) -> List[str]:
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [
-            executor.submit(process_page, (image, i)) for i, image in enumerate(images)
-        ]
-        return [
-            result
-            for future in as_completed(futures)
-            if (result := future.result()) is not None
-        ]
+    return texts_from_annotations(annotate_pages(images))
+
+
+def texts_from_annotations(annotations: List[Optional[Dict]]) -> List[str]:
+    return [
+        text
+        for annotation in annotations
+        if (text := text_from_annotation(annotation)) is not None
+    ]
 
 
 def process_multiple_pdfs(pdf_files: List[str]) -> Dict[str, str]:
@@ -120,15 +87,17 @@ def process_multiple_pdfs(pdf_files: List[str]) -> Dict[str, str]:
         }
 
 
-def extract_text_from_pdf(file_path: str) -> str:
+def extract_text_from_pdf(document: Union[str, PDFDocument]) -> str:
+    # A bare path has no other consumers, so pages can go once OCR'd
+    document = as_document(document, keep_images=False)
+    file_path = document.file_path
     try:
-        cache_key = get_cache_key(file_path)
+        cache_key = document.fingerprint
         if cached := load_from_cache(cache_key):
             print(f"Using cached response for {file_path}")
             return cached
 
-        images = convert_pdf_to_images(file_path)
-        texts = process_pdf_pages(file_path, images)
+        texts = texts_from_annotations(document.annotations)
 
         if not texts:
             return ""
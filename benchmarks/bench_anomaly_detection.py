@@ -0,0 +1,128 @@
+"""Per-page Python loops vs one grouped NumPy pass for handwriting anomalies.
+
+Builds synthetic documents with many paragraphs per page, runs the original
+per-page, per-paragraph anomaly and page-variation loops and the vectorized
+detect_internal_anomalies, and checks that both report the same paragraphs
+and page changes.
+
+Usage: python -m benchmarks.bench_anomaly_detection [--pages N] [--paragraphs N]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.similarity.feature_table import FeatureTable
+from app.similarity.handwriting_similarity import (
+    ANOMALY_FEATURES,
+    detect_internal_anomalies,
+)
+from benchmarks.bench_region_similarity import synthetic_features
+from benchmarks.common import print_table
+
+
+def python_anomalies(features):
+    """The per-page, per-paragraph loops detect_internal_anomalies used to run"""
+    anomalies = []
+    page_means = []
+    for page_num, page_features in enumerate(features):
+        if not page_features:
+            continue
+        stats = {}
+        for name in ANOMALY_FEATURES:
+            values = [feature[name] for feature in page_features]
+            stats[name] = (np.mean(values), np.std(values))
+        page_means.append(
+            (page_num + 1, {name: stats[name][0] for name in ANOMALY_FEATURES})
+        )
+        for i, feature in enumerate(page_features):
+            flagged = [
+                name
+                for name in ANOMALY_FEATURES
+                if abs(feature[name] - stats[name][0]) > 2.0 * stats[name][1]
+            ]
+            if flagged:
+                anomalies.append((page_num + 1, i, tuple(flagged)))
+
+    variations = []
+    for (prev_page, prev), (curr_page, curr) in zip(page_means, page_means[1:]):
+        changed = tuple(
+            name for name in ANOMALY_FEATURES if abs(curr[name] - prev[name]) > 0.15
+        )
+        if changed:
+            variations.append((prev_page, curr_page, changed))
+    return anomalies, variations
+
+
+def summarize(anomalies, variations):
+    """The same (page, paragraph, features) tuples python_anomalies returns"""
+    return (
+        [
+            (
+                anomaly["page_number"],
+                anomaly["paragraph_index"],
+                tuple(name for name in ANOMALY_FEATURES if name in anomaly),
+            )
+            for anomaly in anomalies
+        ],
+        [
+            (
+                variation["from_page"],
+                variation["to_page"],
+                tuple(change["type"] for change in variation["changes"]),
+            )
+            for variation in variations
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=200, help="per page")
+    args = parser.parse_args()
+
+    features = synthetic_features(args.pages, args.paragraphs, 1)
+    rng = np.random.default_rng(2)
+    for page_num, page_features in enumerate(features):
+        # Outlier paragraphs and a drifting page mean
+        for feature in page_features:
+            if rng.random() < 0.02:
+                feature["confidence"] = 0.05
+            if page_num % 5 == 4:
+                feature["symbol_density"] += 0.3
+    table = FeatureTable.from_pages(features)
+
+    start = time.perf_counter()
+    expected = python_anomalies(features)
+    python_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    anomalies, variations = detect_internal_anomalies(table)
+    numpy_seconds = time.perf_counter() - start
+
+    paragraphs = len(table)
+    print_table(
+        [
+            {
+                "engine": "python loops",
+                "paragraphs": paragraphs,
+                "anomalies": len(expected[0]),
+                "variations": len(expected[1]),
+                "seconds": python_seconds,
+            },
+            {
+                "engine": "grouped numpy",
+                "paragraphs": paragraphs,
+                "anomalies": len(anomalies),
+                "variations": len(variations),
+                "seconds": numpy_seconds,
+            },
+        ]
+    )
+    print("Identical results:", summarize(anomalies, variations) == expected)
+    print(f"Speedup: {python_seconds / numpy_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
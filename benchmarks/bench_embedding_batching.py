@@ -0,0 +1,92 @@
+"""Compare fixed-size and length-bucketed embedding batches on the cached corpus.
+
+Usage: python -m benchmarks.bench_embedding_batching [--model NAME] [--repeat N]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.similarity.text_similarity import (
+    DEFAULT_MODEL_NAME,
+    OptimizedSemanticAnalyzer,
+    plan_token_budget_batches,
+)
+from benchmarks.common import load_cached_texts, print_table
+
+
+def padding_stats(batches, lengths):
+    real_tokens = sum(lengths)
+    padded_tokens = sum(
+        len(batch) * max(lengths[i] for i in batch) for batch in batches
+    )
+    return {
+        "batches": len(batches),
+        "padded_tokens": padded_tokens,
+        "padding_ratio": 1 - real_tokens / padded_tokens if padded_tokens else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-batch-tokens", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    segments = [
+        segment
+        for text in load_cached_texts().values()
+        for segment in OptimizedSemanticAnalyzer.preprocess_text(text)
+    ]
+    print(f"{len(segments)} segments from the cached corpus")
+
+    analyzer = OptimizedSemanticAnalyzer(
+        batch_size=args.batch_size,
+        model_name=args.model,
+        max_batch_tokens=args.max_batch_tokens,
+    )
+    lengths = [
+        len(ids)
+        for ids in analyzer.tokenizer(
+            segments, truncation=True, max_length=analyzer.max_length
+        )["input_ids"]
+    ]
+    plans = {
+        "fixed": [
+            list(range(i, min(i + args.batch_size, len(segments))))
+            for i in range(0, len(segments), args.batch_size)
+        ],
+        "bucketed": plan_token_budget_batches(
+            lengths, args.max_batch_tokens, analyzer.max_batch_size
+        ),
+    }
+
+    rows = []
+    outputs = {}
+    for mode, batches in plans.items():
+        analyzer.batching = mode
+        analyzer._embed_segments(segments[: args.batch_size])  # warm up
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            outputs[mode] = analyzer._embed_segments(segments)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        rows.append(
+            {
+                "mode": mode,
+                **padding_stats(batches, lengths),
+                "seconds": best,
+                "segments_per_s": len(segments) / best,
+            }
+        )
+
+    print_table(rows)
+    drift = np.abs(outputs["fixed"] - outputs["bucketed"]).max()
+    print(f"max abs difference between modes: {drift:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Cold-start time and throughput of the embedding engines on the cached corpus.
+
+Usage: python -m benchmarks.bench_embedding_engines [--model NAME] [--precision P]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.similarity.embedding_backends import EMBEDDING_BACKENDS, PRECISIONS
+from app.similarity.text_similarity import (
+    DEFAULT_MODEL_NAME,
+    OptimizedSemanticAnalyzer,
+)
+from benchmarks.common import load_cached_texts, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--precision", default="fp32", choices=PRECISIONS)
+    parser.add_argument(
+        "--batching", default="bucketed", choices=("fixed", "bucketed")
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", default=list(EMBEDDING_BACKENDS))
+    args = parser.parse_args()
+
+    segments = [
+        segment
+        for text in load_cached_texts().values()
+        for segment in OptimizedSemanticAnalyzer.preprocess_text(text)
+    ]
+    print(f"{len(segments)} segments from the cached corpus")
+
+    rows = []
+    reference = None
+    for engine in args.engines:
+        start = time.perf_counter()
+        analyzer = OptimizedSemanticAnalyzer(
+            model_name=args.model,
+            precision=args.precision,
+            batching=args.batching,
+            engine=engine,
+        )
+        analyzer.get_embeddings_batched(segments[:1])
+        cold_start = time.perf_counter() - start
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            embeddings = analyzer.get_embeddings_batched(segments)
+            timings.append(time.perf_counter() - start)
+        if reference is None:
+            reference = embeddings
+        best = min(timings)
+        rows.append(
+            {
+                "engine": engine,
+                "cold_start_s": cold_start,
+                "seconds": best,
+                "sentences_per_s": len(segments) / best,
+                "max_abs_diff": float(np.abs(embeddings - reference).max()),
+            }
+        )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
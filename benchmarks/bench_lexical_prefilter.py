@@ -0,0 +1,123 @@
+"""Recall and cost of the MinHash/LSH pre-filter against full semantic comparison.
+
+Computes the all-pairs text similarity matrix of the cached documents with
+every pair embedded and compared, then again comparing only the pairs LSH
+finds above each MinHash threshold. A pair counts as similar when its
+semantic similarity (mean of both directions) reaches --similar; recall is
+the share of those pairs the pre-filter kept. --copies adds reworded
+copies of random cached documents so the corpus has known similar pairs;
+copy_recall is the share of (source, copy) pairs kept, which needs no
+model. --lexical-only skips the semantic runs and reports just that.
+
+Usage: python -m benchmarks.bench_lexical_prefilter [--copies N] [--lexical-only]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from config import Config
+from app.similarity.minhash import minhash_signature
+from app.similarity.text_similarity import DEFAULT_MODEL_NAME, OptimizedSemanticAnalyzer
+from app.utils.batch_comparison import lexical_candidates, text_similarity_matrix
+from benchmarks.common import load_cached_texts, print_table
+
+
+def reworded(text: str, noise: float, rng: np.random.Generator) -> str:
+    """text with about noise of its words dropped or repeated, paragraph by
+    paragraph so segmentation stays comparable"""
+    paragraphs = []
+    for paragraph in text.split("\n\n"):
+        words = []
+        for word in paragraph.split():
+            draw = rng.random()
+            if draw < noise / 2:
+                continue
+            words.append(word)
+            if draw > 1 - noise / 2:
+                words.append(word)
+        paragraphs.append(" ".join(words))
+    return "\n\n".join(paragraphs)
+
+
+def symmetric(matrix: np.ndarray) -> np.ndarray:
+    return (matrix + matrix.T) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--similar", type=float, default=0.8)
+    parser.add_argument(
+        "--lexical-only", action="store_true", help="skip the semantic model"
+    )
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0.05, 0.1, 0.2, 0.3]
+    )
+    args = parser.parse_args()
+
+    texts = list(load_cached_texts().values())
+    rng = np.random.default_rng(0)
+    copies = set()
+    if texts:
+        for source in rng.choice(len(texts), args.copies):
+            copies.add((int(source), len(texts)))
+            texts.append(reworded(texts[source], args.noise, rng))
+    count = len(texts)
+    total_pairs = count * (count - 1) // 2
+    print(f"{count} documents, {total_pairs} pairs")
+    if count < 2:
+        return
+
+    analyzer = None
+    similar = set()
+    rows = []
+    if not args.lexical_only:
+        # No embedding cache, so neither run reuses the other's embeddings
+        analyzer = OptimizedSemanticAnalyzer(model_name=args.model)
+        start = time.perf_counter()
+        full = symmetric(text_similarity_matrix(texts, analyzer))
+        full_seconds = time.perf_counter() - start
+        first, second = np.triu_indices(count, k=1)
+        keep = full[first, second] >= args.similar
+        similar = set(zip(first[keep].tolist(), second[keep].tolist()))
+        rows.append(
+            {
+                "threshold": "none",
+                "compared_pairs": total_pairs,
+                "similar_pairs": len(similar),
+                "recall": 1.0,
+                "copy_recall": 1.0,
+                "seconds": full_seconds,
+            }
+        )
+    for threshold in args.thresholds:
+        start = time.perf_counter()
+        signatures = [
+            minhash_signature(
+                text, Config.MINHASH_PERMUTATIONS, Config.MINHASH_SHINGLE_SIZE
+            )
+            for text in texts
+        ]
+        candidates, pairs = lexical_candidates(signatures, threshold)
+        if analyzer is not None:
+            text_similarity_matrix(texts, analyzer, candidates=candidates)
+        seconds = time.perf_counter() - start
+        found = len(similar & set(pairs))
+        rows.append(
+            {
+                "threshold": threshold,
+                "compared_pairs": len(pairs),
+                "similar_pairs": None if analyzer is None else found,
+                "recall": None if analyzer is None else found / max(1, len(similar)),
+                "copy_recall": len(copies & set(pairs)) / max(1, len(copies)),
+                "seconds": seconds,
+            }
+        )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Per-page vs multi-page images:annotate calls against a local stub server.
+
+Synthetic pages go through annotate_pages() with OCR_BATCH_MAX_PAGES set to
+each requested size; the stub (benchmarks.stub_vision) charges a fixed
+per-call latency plus a per-image cost, like the real service. Page OCR
+results go to a temporary cache store that is cleared before every run.
+
+Usage: python -m benchmarks.bench_ocr_batching [--pages N] [--batch-sizes 1,4,8]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from config import Config
+from app.utils import ocr
+from app.utils.cache_store import get_cache_store
+from benchmarks.common import print_table
+from benchmarks.stub_vision import reset_counters, start_stub_server
+
+
+def make_pages(count: int, size: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [
+        Image.fromarray(rng.integers(0, 256, (size, size), dtype=np.uint8), "L")
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=32)
+    parser.add_argument("--page-size", type=int, default=256)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--latency", type=float, default=0.15, help="per call")
+    parser.add_argument("--per-image", type=float, default=0.02)
+    parser.add_argument(
+        "--rate", type=float, default=Config.OCR_RATE_PER_SECOND, help="calls/s"
+    )
+    args = parser.parse_args()
+
+    server, counters = start_stub_server(
+        args.latency, per_image_latency=args.per_image
+    )
+    # Keep page OCR results out of the real cache
+    Config.CACHE_STORE_DIR = tempfile.mkdtemp(prefix="bench-cache-")
+    Config.OCR_URL = f"http://127.0.0.1:{server.server_port}/v1/images:annotate"
+    Config.OCR_RATE_PER_SECOND = args.rate
+
+    rows = []
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    for seed, batch_size in enumerate(batch_sizes):
+        Config.OCR_BATCH_MAX_PAGES = batch_size
+        # Start every run with a full rate-limit burst
+        time.sleep(Config.OCR_BURST / args.rate if args.rate > 0 else 0)
+        get_cache_store().clear()
+        pages = make_pages(args.pages, args.page_size, seed)
+        reset_counters(counters)
+
+        start = time.perf_counter()
+        annotations = ocr.annotate_pages(iter(pages))
+        elapsed = time.perf_counter() - start
+        rows.append(
+            {
+                "batch_pages": batch_size,
+                "pages": len(pages),
+                "failed_pages": sum(annotation is None for annotation in annotations),
+                "http_requests": counters["requests"],
+                "seconds": elapsed,
+                "pages_per_s": len(pages) / elapsed,
+            }
+        )
+
+    print_table(rows)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Pooled VisionClient vs bare requests.post against a local stub OCR server.
+
+The stub (benchmarks.stub_vision) answers images:annotate with a canned
+response after a fixed delay and injects 429/503 errors at a configurable
+rate, so retries, rate limiting and connection reuse can be measured without
+network access.
+
+Usage: python -m benchmarks.bench_ocr_client [--calls N] [--error-rate R]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app.utils.ocr_client import OCRRequestError, TokenBucket, VisionClient
+from benchmarks.common import print_table
+from benchmarks.stub_vision import reset_counters, start_stub_server
+
+
+def run(label, call, calls, workers, counters):
+    reset_counters(counters)
+    failures = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for ok in executor.map(lambda _: call(), range(calls)):
+            failures += not ok
+    elapsed = time.perf_counter() - start
+    return {
+        "client": label,
+        "calls": calls,
+        "failures": failures,
+        "tcp_connections": counters["connections"],
+        "seconds": elapsed,
+        "calls_per_s": calls / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=0, help="calls/s limit")
+    args = parser.parse_args()
+
+    server, counters = start_stub_server(args.latency, args.error_rate)
+    url = f"http://127.0.0.1:{server.server_port}/v1/images:annotate"
+    payload = {"requests": [{"image": {"content": "AAAA"}, "features": []}]}
+
+    def bare_call():
+        response = requests.post(url, json=payload, timeout=10)
+        return response.status_code == 200
+
+    client = VisionClient(
+        url=url,
+        timeout=10,
+        backoff_base=0.01,
+        rate_limiter=TokenBucket(args.rate) if args.rate > 0 else None,
+    )
+
+    def client_call():
+        try:
+            client.annotate(payload)
+            return True
+        except OCRRequestError:
+            return False
+
+    rows = [
+        run("requests.post", bare_call, args.calls, args.workers, counters),
+        run("VisionClient", client_call, args.calls, args.workers, counters),
+    ]
+    print_table(rows)
+    print("VisionClient stats:", json.dumps(client.stats(), indent=2))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""End-to-end OCR pipeline throughput without network access.
+
+Runs several documents of synthetic pages concurrently through the same
+path as a comparison request (page cache, engine, batching, VisionClient
+retries, text and handwriting feature extraction) against the local OCR
+stand-in. The stand-in replays recorded responses and cached_data texts
+with configurable latency and injected 429/503 errors.
+
+Usage: python -m benchmarks.bench_ocr_pipeline [--documents N] [--error-rate R]
+"""
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from app.utils import ocr
+from app.utils.cache_store import CacheStore
+from app.utils.ocr_backends import (
+    ReplayOCRBackend,
+    get_ocr_backend,
+    get_record_dir,
+    responses_from_cached_texts,
+)
+from app.utils.ocr_standin import start_standin_server
+from app.utils.pdf_processor import texts_from_annotations
+from benchmarks.bench_ocr_batching import make_pages
+from benchmarks.common import print_table
+
+
+def process_document(pages):
+    annotations = ocr.annotate_pages(iter(pages))
+    texts = texts_from_annotations(annotations)
+    features = [
+        ocr.paragraph_features_from_annotation(annotation, page_num)
+        for page_num, annotation in enumerate(annotations)
+    ]
+    return {
+        "failed_pages": sum(annotation is None for annotation in annotations),
+        "characters": sum(len(text) for text in texts),
+        "paragraphs": sum(len(page) for page in features),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=12, help="per document")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.15, help="per call")
+    parser.add_argument("--per-image", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    # Built from the real cache before page OCR is redirected to a scratch one
+    fallback = responses_from_cached_texts(CacheStore())
+    backend = ReplayOCRBackend(
+        get_record_dir(),
+        fallback=fallback,
+        latency=args.latency,
+        per_image_latency=args.per_image,
+        error_rate=args.error_rate,
+    )
+    server, counters = start_standin_server(backend)
+    Config.OCR_BACKEND = "vision"
+    # Keep page OCR results out of the real cache
+    Config.CACHE_STORE_DIR = tempfile.mkdtemp(prefix="bench-cache-")
+    Config.OCR_URL = f"http://127.0.0.1:{server.server_port}/v1/images:annotate"
+
+    documents = [
+        make_pages(args.pages, 256, seed) for seed in range(args.documents)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(process_document, documents))
+    elapsed = time.perf_counter() - start
+
+    pages = args.documents * args.pages
+    client_stats = get_ocr_backend().stats()["client"]
+    print_table(
+        [
+            {
+                "documents": args.documents,
+                "pages": pages,
+                "failed_pages": sum(result["failed_pages"] for result in results),
+                "paragraphs": sum(result["paragraphs"] for result in results),
+                "http_requests": counters["requests"],
+                "retries": client_stats["retries"],
+                "seconds": elapsed,
+                "pages_per_s": pages / elapsed,
+            }
+        ]
+    )
+    print("Replay stats:", json.dumps(backend.stats()))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Upload size, encode time and OCR agreement of page encoding settings.
+
+Each setting (grayscale, pixel budget, format) is applied to the same pages
+and compared with the original color PNG upload. Pages come from --pdf, or
+are synthetic scan-like text pages when no PDF is given. Text agreement
+(difflib ratio against the baseline's OCR text) needs GOOGLE_CLOUD_API_KEY;
+without it only size and time are reported. A second table compares
+encoding pages from several threads inline vs in the encode worker pool.
+
+Usage: python -m benchmarks.bench_page_encoding [--pdf FILE] [--pages N]
+"""
+import argparse
+import base64
+import difflib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from config import Config
+from app.utils import page_image
+from app.utils.ocr import annotate_encoded_pages, text_from_annotation
+from app.utils.page_image import PageEncoding, encode_page, prepare_page, save_page
+from benchmarks.common import print_table
+
+SETTINGS = {
+    "color png (baseline)": PageEncoding(grayscale=False),
+    "gray png": PageEncoding(),
+    "gray png 2MP": PageEncoding(max_pixels=2_000_000),
+    "gray jpeg q85": PageEncoding(image_format="jpeg"),
+    "gray jpeg q85 2MP": PageEncoding(image_format="jpeg", max_pixels=2_000_000),
+    "gray webp q80": PageEncoding(image_format="webp", quality=80),
+}
+WORDS = "the quick brown fox jumps over a lazy dog while ink dries".split()
+
+
+def synthetic_pages(count: int, seed: int = 0):
+    """Letter pages at 200 DPI with text lines and scanner noise"""
+    rng = np.random.default_rng(seed)
+    font = ImageFont.load_default(size=28)
+    pages = []
+    for _ in range(count):
+        page = Image.new("RGB", (1700, 2200), (250, 248, 240))
+        draw = ImageDraw.Draw(page)
+        for line in range(40):
+            text = " ".join(rng.choice(WORDS, size=10))
+            draw.text((120, 120 + line * 48), text, fill=(20, 20, 60), font=font)
+        noise = rng.normal(0, 6, (2200, 1700, 1))
+        pixels = np.clip(np.asarray(page, dtype=np.float32) + noise, 0, 255)
+        pages.append(Image.fromarray(pixels.astype(np.uint8), "RGB"))
+    return pages
+
+
+def load_pages(args):
+    if not args.pdf:
+        return synthetic_pages(args.pages)
+    from pdf2image import convert_from_path
+
+    return convert_from_path(args.pdf, last_page=args.pages)
+
+
+def encode_inline(image, encoding: PageEncoding):
+    prepared, scale = prepare_page(image, encoding)
+    return save_page(prepared, encoding), scale
+
+
+def ocr_texts(encoded):
+    annotations = annotate_encoded_pages(
+        [(page_num, base64.b64encode(data).decode()) for page_num, data in encoded]
+    )
+    return [text_from_annotation(annotation) or "" for annotation in annotations]
+
+
+def compare_settings(pages, with_ocr: bool):
+    rows = []
+    baseline_texts = None
+    for name, encoding in SETTINGS.items():
+        start = time.perf_counter()
+        encoded = [encode_inline(page, encoding) for page in pages]
+        elapsed = time.perf_counter() - start
+        sizes = [len(data) for data, _ in encoded]
+        row = {
+            "setting": name,
+            "kb_per_page": sum(sizes) / len(sizes) / 1024,
+            "encode_ms_per_page": elapsed / len(pages) * 1000,
+            "text_agreement": "n/a",
+        }
+        if with_ocr:
+            texts = ocr_texts(list(enumerate(data for data, _ in encoded)))
+            if baseline_texts is None:
+                baseline_texts = texts
+            row["text_agreement"] = float(
+                np.mean(
+                    [
+                        difflib.SequenceMatcher(None, base, text).ratio()
+                        for base, text in zip(baseline_texts, texts)
+                    ]
+                )
+            )
+        rows.append(row)
+    print_table(rows)
+
+
+def compare_pool(pages, threads: int, workers: int):
+    encoding = PageEncoding()
+    rows = []
+    for label, pool_workers in (("inline", 0), (f"{workers} workers", workers)):
+        Config.OCR_ENCODE_WORKERS = pool_workers
+        if pool_workers:
+            # Start the worker processes outside the timed region
+            encode_page(pages[0], encoding)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda page: encode_page(page, encoding), pages))
+        elapsed = time.perf_counter() - start
+        rows.append(
+            {
+                "encoder": label,
+                "threads": threads,
+                "pages": len(pages),
+                "seconds": elapsed,
+                "pages_per_s": len(pages) / elapsed,
+            }
+        )
+    print_table(rows)
+    if page_image._encode_pool is not None:
+        page_image._encode_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", help="PDF to take pages from")
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=Config.OCR_ENCODE_WORKERS or 2)
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    with_ocr = bool(os.environ.get("GOOGLE_CLOUD_API_KEY"))
+    if not with_ocr:
+        print("GOOGLE_CLOUD_API_KEY not set; skipping OCR text agreement")
+    compare_settings(pages, with_ocr)
+    compare_pool(pages * 2, args.threads, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Accuracy drift and throughput of reduced-precision embedding against fp32.
+
+For every segment in the cached corpus the fp32 embedding is compared with
+the int8/bf16 one (cosine agreement), and for document pairs the text
+similarity score is recomputed to report the score delta.
+
+Usage: python -m benchmarks.bench_precision_drift [--model NAME] [--pairs N]
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from app.similarity.text_similarity import (
+    DEFAULT_MODEL_NAME,
+    PRECISIONS,
+    OptimizedSemanticAnalyzer,
+)
+from benchmarks.common import load_cached_texts, print_table
+
+
+def document_score(analyzer, embeddings1, embeddings2):
+    """Same aggregate as analyze_semantic_consistency"""
+    similarity_matrix = analyzer.compute_similarity_matrix(embeddings1, embeddings2)
+    return float(np.mean(np.max(similarity_matrix, axis=1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument(
+        "--precisions", nargs="+", default=[p for p in PRECISIONS if p != "fp32"]
+    )
+    args = parser.parse_args()
+
+    texts = list(load_cached_texts().values())
+    documents = [OptimizedSemanticAnalyzer.preprocess_text(t) for t in texts]
+    documents = [segments for segments in documents if segments]
+    all_segments = [segment for segments in documents for segment in segments]
+    offsets = np.cumsum([0] + [len(segments) for segments in documents])
+    pairs = list(itertools.combinations(range(len(documents)), 2))[: args.pairs]
+    print(
+        f"{len(documents)} documents, {len(all_segments)} segments, "
+        f"{len(pairs)} pairs"
+    )
+
+    def embed_all(precision):
+        analyzer = OptimizedSemanticAnalyzer(model_name=args.model, precision=precision)
+        analyzer.get_embeddings_batched(all_segments[:8])  # warm up
+        start = time.perf_counter()
+        embeddings = analyzer.get_embeddings_batched(all_segments)
+        elapsed = time.perf_counter() - start
+        per_doc = [
+            embeddings[offsets[i] : offsets[i + 1]] for i in range(len(documents))
+        ]
+        scores = np.array(
+            [document_score(analyzer, per_doc[i], per_doc[j]) for i, j in pairs]
+        )
+        return analyzer, embeddings, scores, elapsed
+
+    _, reference, reference_scores, reference_seconds = embed_all("fp32")
+    rows = [
+        {
+            "precision": "fp32",
+            "segments_per_s": len(all_segments) / reference_seconds,
+            "speedup": 1.0,
+            "mean_cosine": 1.0,
+            "min_cosine": 1.0,
+            "mean_score_delta": 0.0,
+            "max_score_delta": 0.0,
+        }
+    ]
+    reference_unit = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+
+    for precision in args.precisions:
+        analyzer, embeddings, scores, seconds = embed_all(precision)
+        if analyzer.precision != precision:
+            print(f"Skipping {precision}: not available on {analyzer.device}")
+            continue
+        unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        cosines = np.sum(reference_unit * unit, axis=1)
+        deltas = np.abs(scores - reference_scores)
+        rows.append(
+            {
+                "precision": precision,
+                "segments_per_s": len(all_segments) / seconds,
+                "speedup": reference_seconds / seconds,
+                "mean_cosine": float(cosines.mean()),
+                "min_cosine": float(cosines.min()),
+                "mean_score_delta": float(deltas.mean()) if len(deltas) else 0.0,
+                "max_score_delta": float(deltas.max()) if len(deltas) else 0.0,
+            }
+        )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Corpus nearest-neighbour search: IVF lists vs a full scan of every segment.
+
+Builds a persistent vector index over a synthetic corpus of clustered
+segment embeddings, then queries it with perturbed copies of corpus
+documents. Reports build time, search latency with and without the
+inverted lists, how often the copied document ranks first, and recall@k
+of the IVF results against the exact scan.
+
+Usage: python -m benchmarks.bench_vector_index [--documents N] [--segments N]
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.similarity.vector_index import VectorIndex
+from benchmarks.common import print_table
+
+
+def synthetic_corpus(
+    documents: int, segments: int, dim: int, topics: int, seed: int
+):
+    """Segment embeddings scattered around shared topic directions, so that
+    unrelated documents still share some near neighbours"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    for _ in range(documents):
+        count = int(rng.integers(segments // 2, segments * 3 // 2 + 1))
+        picked = centers[rng.integers(0, topics, count)]
+        yield picked + 0.6 * rng.normal(size=picked.shape).astype(np.float32)
+
+
+def run_queries(index, queries, k, exact, nprobe=None):
+    results, seconds = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(
+            index.search(query, "synthetic", k=k, exact=exact, nprobe=nprobe)
+        )
+        seconds.append(time.perf_counter() - start)
+    return results, np.array(seconds)
+
+
+def fingerprints(results):
+    return {result["fingerprint"] for result in results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--segments", type=int, default=10, help="mean per document")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    index_dir = tempfile.mkdtemp(prefix="vector_index_")
+    try:
+        # One build at the end rather than background ones during the load
+        index = VectorIndex(index_dir, background_rebuild=False)
+        embeddings = {}
+        rng = np.random.default_rng(1)
+        query_docs = set(rng.choice(args.documents, args.queries, replace=False))
+
+        start = time.perf_counter()
+        batch = []
+        corpus = synthetic_corpus(
+            args.documents, args.segments, args.dim, args.topics, seed=0
+        )
+        for doc_id, vectors in enumerate(corpus):
+            if doc_id in query_docs:
+                embeddings[doc_id] = vectors
+            segments = [f"{doc_id}:{i}" for i in range(len(vectors))]
+            batch.append((f"doc{doc_id}", f"doc{doc_id}", segments, vectors))
+            if len(batch) == 1000:
+                index.add_documents(batch, "synthetic")
+                batch = []
+        if batch:
+            index.add_documents(batch, "synthetic")
+        index.rebuild()
+        build_seconds = time.perf_counter() - start
+        stats = index.stats()
+        print(
+            f"Indexed {stats['documents']} documents, {stats['rows']} segments "
+            f"into {stats['lists']} lists in {build_seconds:.1f}s"
+        )
+
+        # A lightly reworded copy of part of each query document
+        queries = [
+            vectors[: max(2, len(vectors) // 2)]
+            + 0.2 * rng.normal(size=(max(2, len(vectors) // 2), args.dim))
+            for vectors in embeddings.values()
+        ]
+        sources = [f"doc{doc_id}" for doc_id in embeddings]
+
+        exact, exact_seconds = run_queries(index, queries, args.k, exact=True)
+        runs = [("exact scan", exact, exact_seconds)]
+        for nprobe in args.nprobe:
+            results, seconds = run_queries(index, queries, args.k, False, nprobe)
+            runs.append((f"ivf nprobe={nprobe}", results, seconds))
+
+        rows = []
+        for name, results, seconds in runs:
+            recall = np.mean(
+                [
+                    len(fingerprints(found) & fingerprints(expected))
+                    / max(1, len(expected))
+                    for found, expected in zip(results, exact)
+                ]
+            )
+            top1 = np.mean(
+                [
+                    bool(found) and found[0]["fingerprint"] == source
+                    for found, source in zip(results, sources)
+                ]
+            )
+            rows.append(
+                {
+                    "search": name,
+                    "median_ms": 1000 * float(np.median(seconds)),
+                    "p95_ms": 1000 * float(np.percentile(seconds, 95)),
+                    "source_top1": float(top1),
+                    f"recall@{args.k}": float(recall),
+                }
+            )
+        print_table(rows)
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Extracted document texts stored by pdf_processor, keyed by file hash
+from app.utils.cache_store import load_cached_texts  # noqa: F401
+
+
+@contextmanager
+def timer(results: Dict, name: str):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+
+def print_table(rows: List[Dict]) -> None:
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = {
+        c: max(len(c), *(len(format_value(r.get(c))) for r in rows)) for c in columns
+    }
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(format_value(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def format_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
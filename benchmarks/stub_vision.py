@@ -0,0 +1,31 @@
+"""Local stand-in for the Vision images:annotate endpoint used by benchmarks.
+
+A thin wrapper around app.utils.ocr_standin: every image gets a canned
+fullTextAnnotation after a delay of latency + per_image_latency * images,
+and 429/503 errors are injected at error_rate.
+"""
+from app.utils.ocr_backends import ReplayOCRBackend
+from app.utils.ocr_standin import start_standin_server
+
+PAGE_RESPONSE = {"fullTextAnnotation": {"text": "stub page", "pages": []}}
+
+
+def start_stub_server(
+    latency: float,
+    error_rate: float = 0.0,
+    per_image_latency: float = 0.0,
+    responses=None,
+):
+    """Start the stub on a free port; returns (server, counters)"""
+    backend = ReplayOCRBackend(
+        fallback=responses or [PAGE_RESPONSE],
+        latency=latency,
+        per_image_latency=per_image_latency,
+        error_rate=error_rate,
+    )
+    return start_standin_server(backend)
+
+
+def reset_counters(counters) -> None:
+    for name in counters:
+        counters[name] = 0
@@ -18,4 +18,96 @@ class Config:
     # API Keys
     MATHPIX_APP_ID = os.environ.get('MATHPIX_APP_ID')
     MATHPIX_APP_KEY = os.environ.get('MATHPIX_APP_KEY')
-    GOOGLE_CLOUD_API_KEY = os.environ.get('GOOGLE_CLOUD_API_KEY')
\ No newline at end of file
+    GOOGLE_CLOUD_API_KEY = os.environ.get('GOOGLE_CLOUD_API_KEY')
+
+    # Semantic model loading
+    WARMUP_MODELS = os.environ.get('WARMUP_MODELS', 'false').lower() in ('1', 'true', 'yes')
+
+    # Persistent sentence embedding cache
+    EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    EMBEDDING_CACHE_MAX_MB = int(os.environ.get('EMBEDDING_CACHE_MAX_MB', 256))
+    EMBEDDING_CACHE_DTYPE = os.environ.get('EMBEDDING_CACHE_DTYPE', 'float16')
+
+    # Embedding batching: "bucketed" sorts segments by token length and fills
+    # batches up to a padded-token budget, "fixed" keeps document-order groups
+    EMBEDDING_BATCHING = os.environ.get('EMBEDDING_BATCHING', 'bucketed')
+    EMBEDDING_MAX_BATCH_TOKENS = int(os.environ.get('EMBEDDING_MAX_BATCH_TOKENS', 2048))
+
+    # Embedding inference precision: fp32 (default), int8 (dynamic quantization,
+    # CPU only) or bf16. See benchmarks/bench_precision_drift.py before switching.
+    EMBEDDING_PRECISION = os.environ.get('EMBEDDING_PRECISION', 'fp32')
+
+    # Embedding execution engine: "eager" (Hugging Face model as-is) or
+    # "torchscript" (traced, frozen graph with pooling fused in)
+    EMBEDDING_ENGINE = os.environ.get('EMBEDDING_ENGINE', 'eager')
+
+    # Vision OCR client: pooled connections, per-process rate limit and retries
+    OCR_URL = os.environ.get('OCR_URL', 'https://vision.googleapis.com/v1/images:annotate')
+    OCR_TIMEOUT = float(os.environ.get('OCR_TIMEOUT', 120))
+    OCR_POOL_SIZE = int(os.environ.get('OCR_POOL_SIZE', 16))
+    OCR_MAX_RETRIES = int(os.environ.get('OCR_MAX_RETRIES', 3))
+    OCR_RATE_PER_SECOND = float(os.environ.get('OCR_RATE_PER_SECOND', 10))
+    OCR_BURST = float(os.environ.get('OCR_BURST', 10))
+    # Maximum OCR calls in flight per worker process, shared by all requests
+    OCR_MAX_IN_FLIGHT = int(os.environ.get('OCR_MAX_IN_FLIGHT', 8))
+    # Pages packed into one images:annotate call, capped by base64 payload size
+    OCR_BATCH_MAX_PAGES = int(os.environ.get('OCR_BATCH_MAX_PAGES', 4))
+    OCR_BATCH_MAX_BYTES = int(os.environ.get('OCR_BATCH_MAX_BYTES', 8 * 1024 * 1024))
+    # Page images sent to OCR: render DPI (lowered to fit OCR_MAX_PIXELS when
+    # set), grayscale (off until OCR agreement is measured), upload format
+    # (png, jpeg, webp) and its quality
+    OCR_RENDER_DPI = int(os.environ.get('OCR_RENDER_DPI', 200))
+    OCR_MAX_PIXELS = int(os.environ.get('OCR_MAX_PIXELS', 0))
+    OCR_GRAYSCALE = os.environ.get('OCR_GRAYSCALE', 'false').lower() in ('1', 'true', 'yes')
+    OCR_IMAGE_FORMAT = os.environ.get('OCR_IMAGE_FORMAT', 'png').lower()
+    OCR_IMAGE_QUALITY = int(os.environ.get('OCR_IMAGE_QUALITY', 85))
+    # Processes compressing page images; 0 encodes in the calling thread.
+    # Opt-in only: the pool is forked from a multithreaded worker process.
+    OCR_ENCODE_WORKERS = int(os.environ.get('OCR_ENCODE_WORKERS', 0))
+    # OCR backend: vision (live service), record (live, saving raw responses
+    # to OCR_RECORD_DIR) or replay (recorded/cached responses, no network)
+    OCR_BACKEND = os.environ.get('OCR_BACKEND', 'vision').lower()
+    # Defaults to cached_data/ocr_recordings
+    OCR_RECORD_DIR = os.environ.get('OCR_RECORD_DIR')
+    OCR_REPLAY_LATENCY = float(os.environ.get('OCR_REPLAY_LATENCY', 0))
+    OCR_REPLAY_ERROR_RATE = float(os.environ.get('OCR_REPLAY_ERROR_RATE', 0))
+    # Shared result cache (extracted text, handwriting results, page OCR);
+    # defaults to cached_data/store. TTL 0 keeps entries until evicted.
+    CACHE_STORE_DIR = os.environ.get('CACHE_STORE_DIR')
+    CACHE_MAX_MB = int(os.environ.get('CACHE_MAX_MB', 512))
+    CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', 0))
+    CACHE_COMPRESS = os.environ.get('CACHE_COMPRESS', 'true').lower() in ('1', 'true', 'yes')
+    # Matched regions kept per paragraph in the report; 0 keeps all
+    HANDWRITING_MATCH_TOP_K = int(os.environ.get('HANDWRITING_MATCH_TOP_K', 0))
+    # Background /jobs comparisons: worker threads and queued-or-running jobs
+    # per process, where job state lives (defaults to cached_data/jobs) and
+    # how long finished jobs are kept; 0 keeps them
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 16))
+    JOBS_DIR = os.environ.get('JOBS_DIR')
+    JOB_TTL_SECONDS = float(os.environ.get('JOB_TTL_SECONDS', 24 * 3600))
+    # Seconds one /jobs/<id>/events response stays open before the browser
+    # reconnects, so progress streams do not pin sync workers for a whole job
+    JOB_EVENTS_STREAM_SECONDS = float(os.environ.get('JOB_EVENTS_STREAM_SECONDS', 25))
+    # All-pairs batch comparison: documents ingested in parallel per batch
+    # and the most files one /jobs/batch request may upload
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+    BATCH_MAX_DOCUMENTS = int(os.environ.get('BATCH_MAX_DOCUMENTS', 50))
+    # Corpus index of every processed document's segment embeddings for
+    # /search; defaults to cached_data/vector_index. Inverted lists are built
+    # once it holds VECTOR_INDEX_MIN_TRAIN_ROWS segments, and a query scans
+    # the VECTOR_INDEX_NPROBE lists nearest to each of its segments.
+    VECTOR_INDEX_ENABLED = os.environ.get('VECTOR_INDEX_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    VECTOR_INDEX_DIR = os.environ.get('VECTOR_INDEX_DIR')
+    VECTOR_INDEX_DTYPE = os.environ.get('VECTOR_INDEX_DTYPE', 'float16')
+    VECTOR_INDEX_NPROBE = int(os.environ.get('VECTOR_INDEX_NPROBE', 8))
+    VECTOR_INDEX_MIN_TRAIN_ROWS = int(os.environ.get('VECTOR_INDEX_MIN_TRAIN_ROWS', 4096))
+    # Batch comparisons only run the semantic analyzer on document pairs
+    # whose word-shingle MinHash signatures estimate a Jaccard similarity of
+    # at least MINHASH_THRESHOLD; other pairs get no text similarity, which
+    # counts as 0 in their ranking. Off until bench_lexical_prefilter shows
+    # acceptable recall against the semantic model.
+    LEXICAL_PREFILTER_ENABLED = os.environ.get('LEXICAL_PREFILTER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    MINHASH_THRESHOLD = float(os.environ.get('MINHASH_THRESHOLD', 0.1))
+    MINHASH_PERMUTATIONS = int(os.environ.get('MINHASH_PERMUTATIONS', 128))
+    MINHASH_SHINGLE_SIZE = int(os.environ.get('MINHASH_SHINGLE_SIZE', 3))
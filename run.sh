@@ -1,4 +1,6 @@
 #!/bin/bash
 export FLASK_APP=run.py
 export FLASK_ENV=production
-gunicorn --bind 0.0.0.0:${PORT:-5001} --workers 4 "app:create_app()"   --timeout 2000
\ No newline at end of file
+export WARMUP_MODELS=${WARMUP_MODELS:-true}
+# Threaded workers: an open /jobs/<id>/events stream holds a thread, not a whole worker
+gunicorn --bind 0.0.0.0:${PORT:-5001} --workers 4 --worker-class gthread --threads ${GUNICORN_THREADS:-8} "app:create_app()"   --timeout 2000
\ No newline at end of file
@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.utils.batch_comparison import ranked_pairs
+
+NAMES = ["a", "b", "c"]
+
+
+def test_filtered_pair_never_outranks_compared_pair_with_equal_handwriting():
+    # (a, b) was compared with a low text score; (a, c) was pre-filtered
+    text = np.array(
+        [[1.0, 0.1, np.nan], [0.1, 1.0, np.nan], [np.nan, np.nan, 1.0]]
+    )
+    handwriting = np.array([[1.0, 0.9, 0.9], [0.9, 1.0, 0.2], [0.9, 0.2, 1.0]])
+
+    pairs = ranked_pairs(NAMES, text, handwriting, weight_text=0.5)
+
+    order = [(pair["document1"], pair["document2"]) for pair in pairs]
+    assert order.index(("a", "b")) < order.index(("a", "c"))
+    filtered = pairs[order.index(("a", "c"))]
+    assert filtered["text_compared"] is False
+    assert filtered["text_similarity"] is None
+    assert filtered["similarity_index"] == 0.45
+
+
+def test_every_pair_is_ranked_by_blended_similarity():
+    text = np.array([[1.0, 0.2, 0.8], [0.2, 1.0, 0.5], [0.8, 0.5, 1.0]])
+    handwriting = np.array([[1.0, 0.4, 0.6], [0.4, 1.0, 0.5], [0.6, 0.5, 1.0]])
+
+    pairs = ranked_pairs(NAMES, text, handwriting, weight_text=0.25)
+
+    assert [(pair["document1"], pair["document2"]) for pair in pairs] == [
+        ("a", "c"),
+        ("b", "c"),
+        ("a", "b"),
+    ]
+    assert all(pair["text_compared"] for pair in pairs)
+    np.testing.assert_allclose(
+        [pair["similarity_index"] for pair in pairs], [0.65, 0.5, 0.35]
+    )
@@ -0,0 +1,56 @@
+import multiprocessing
+
+import numpy as np
+
+from app.similarity.embedding_cache import EmbeddingCache
+
+DIM = 4
+# Room for 8 float16 vectors, so writes keep evicting
+MAX_BYTES = 8 * DIM * 2
+
+
+def vector(key: str) -> np.ndarray:
+    return np.full(DIM, int(key), dtype=np.float32)
+
+
+def write_keys(cache_dir: str, rounds: int) -> None:
+    cache = EmbeddingCache(cache_dir, max_bytes=MAX_BYTES)
+    for round_number in range(rounds):
+        keys = [str(round_number * 3 + offset) for offset in range(3)]
+        cache.put_many({key: vector(key) for key in keys})
+
+
+def test_evicted_slot_is_not_served_for_old_key(tmp_path):
+    reader = EmbeddingCache(str(tmp_path), max_bytes=MAX_BYTES)
+    reader.put_many({str(key): vector(str(key)) for key in range(8)})
+    assert set(reader.get_many(["0"])) == {"0"}
+
+    process = multiprocessing.get_context("fork").Process(
+        target=write_keys, args=(str(tmp_path), 40)
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    # Read through the index as it was before the other process evicted
+    stale_index = reader._index
+    reader._reload_index = lambda: None
+    reader._index = stale_index
+    found = reader.get_many([str(key) for key in range(8)])
+    for key, value in found.items():
+        np.testing.assert_array_equal(value, vector(key))
+
+
+def test_concurrent_reader_never_sees_another_keys_vector(tmp_path):
+    writer = multiprocessing.get_context("fork").Process(
+        target=write_keys, args=(str(tmp_path), 400)
+    )
+    writer.start()
+    reader = EmbeddingCache(str(tmp_path), max_bytes=MAX_BYTES)
+    keys = [str(key) for key in range(1200)]
+    while writer.is_alive():
+        for key, value in reader.get_many(keys).items():
+            np.testing.assert_array_equal(value, vector(key))
+    writer.join()
+    assert writer.exitcode == 0
+    assert reader.get_many(keys)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from app.similarity.vector_index import VectorIndex
+
+DIM = 16
+
+
+def documents(count: int, segments: int = 10, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(count):
+        texts = [f"{i}:{j}" for j in range(segments)]
+        items.append((f"fp{i}", f"doc{i}", texts, rng.normal(size=(segments, DIM))))
+    return items
+
+
+def test_add_documents_only_appends(tmp_path):
+    index = VectorIndex(str(tmp_path), min_train_rows=100, background_rebuild=False)
+    items = documents(20)
+    assert index.add_documents(items, "model") == 20
+
+    stats = index.stats()
+    assert (stats["rows"], stats["indexed_rows"], stats["rebuilds"]) == (200, 0, 0)
+    # Rows not in the lists yet are scanned in full
+    results = index.search(items[3][3], "model", k=1)
+    assert results[0]["fingerprint"] == "fp3"
+
+    assert index.rebuild(only_if_needed=True)
+    assert index.stats()["indexed_rows"] == 200
+    assert not index.rebuild(only_if_needed=True)
+
+
+def test_lists_are_rebuilt_in_the_background(tmp_path):
+    index = VectorIndex(str(tmp_path), min_train_rows=100)
+    index.add_documents(documents(20), "model")
+    index._rebuild_thread.join(timeout=30)
+
+    stats = index.stats()
+    assert stats["indexed_rows"] == stats["rows"] == 200
+    assert stats["rebuilds"] == 1
+
+
+def test_add_documents_does_not_wait_for_a_running_build(tmp_path):
+    index = VectorIndex(str(tmp_path), min_train_rows=100)
+    other_worker = VectorIndex(str(tmp_path), min_train_rows=100)
+    with other_worker._rebuild_lock(wait=True):
+        assert index.add_documents(documents(20), "model") == 20
+        index._rebuild_thread.join(timeout=30)
+    # The other worker owns the build, so this one skipped it
+    assert index.stats()["indexed_rows"] == 0
+    assert index.stats()["documents"] == 20